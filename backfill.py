@@ -0,0 +1,174 @@
+import logging
+import math
+import re
+import time
+
+from ddl_validator import blank_string_literals, parse_random_stream
+
+db_logger = logging.getLogger("database")
+
+# Column holding the event time of every backfilled row
+EVENT_TIME_COLUMN = "_backfill_time"
+
+# Wall clock functions of random stream defaults -> replacement based on the event time
+WALL_CLOCK_FUNCTIONS = (
+    (re.compile(r"\bnow64\s*\([^()]*\)", re.IGNORECASE), EVENT_TIME_COLUMN),
+    (re.compile(r"\bnow\s*\([^()]*\)", re.IGNORECASE), f"to_datetime({EVENT_TIME_COLUMN})"),
+    (re.compile(r"\btoday\s*\(\s*\)", re.IGNORECASE), f"to_date({EVENT_TIME_COLUMN})"),
+)
+
+
+class BackfillError(RuntimeError):
+    """A failed backfill, with the number of rows that were written before it failed"""
+
+    def __init__(self, message, rows_written):
+        super().__init__(message)
+        self.rows_written = rows_written
+
+
+def event_time_expression(expression):
+    """
+    Rewrite a column default so it is computed from the row's event time instead of the wall clock.
+
+    Offsets around now64() like random latencies are kept.
+
+    Returns:
+        str: The rewritten expression, or None if the default does not use the wall clock
+    """
+    rewritten = expression
+    for pattern, replacement in WALL_CLOCK_FUNCTIONS:
+        rewritten = pattern.sub(replacement, rewritten)
+    return rewritten if rewritten != expression else None
+
+
+def backfill_columns(random_stream_ddl):
+    """
+    Columns of a random stream with the defaults that are recomputed for a backfill.
+
+    Every default calling now64(), now() or today() is rewritten to use the
+    event time. Defaults derived from such a column, like
+    `shipped_at DEFAULT order_time + interval 2 day`, are recomputed as well,
+    so they follow the historical value instead of keeping the wall clock one.
+
+    Returns:
+        list: {"name", "expression"} per column; expression is None for columns
+              copied as generated and the expression to compute for event time columns
+    """
+    columns = [
+        {"name": name, "default": expression, "expression": event_time_expression(expression) if expression else None}
+        for name, _, expression in parse_random_stream(random_stream_ddl)["columns"]
+    ]
+    changed = True
+    while changed:
+        changed = False
+        event_time_names = {column["name"] for column in columns if column["expression"] is not None}
+        for column in columns:
+            if column["expression"] is None and column["default"] and any(
+                re.search(rf"(?<![\w.]){re.escape(name)}(?!\w)", blank_string_literals(column["default"])) for name in event_time_names
+            ):
+                # Within the backfill select, the name refers to the recomputed column
+                column["expression"] = column["default"]
+                changed = True
+    return [{"name": column["name"], "expression": column["expression"]} for column in columns]
+
+
+def backfill_query(stream_name, sink_name, columns, select_list, rows, start_ms, end_ms):
+    """
+    INSERT ... SELECT writing rows generated by a random stream into a sink, with
+    event times spread uniformly over [start_ms, end_ms).
+
+    Rows are generated by table(), which is not limited by eps. The innermost
+    query draws one event time per row, so every event time column of a row
+    is computed from the same instant; the outer select list is the one of the
+    pipeline's materialized view, so rows are encoded like live events.
+    """
+    span_ms = max(1, end_ms - start_ms)
+    column_list = ", ".join(
+        f"`{column['name']}`" if column["expression"] is None else f"{column['expression']} AS `{column['name']}`"
+        for column in columns
+    )
+    return (
+        f"INSERT INTO {sink_name} SELECT {select_list} FROM ("
+        f"SELECT {column_list} FROM ("
+        f"SELECT *, from_unix_timestamp64_milli(to_int64({int(start_ms)} + rand64() % {span_ms})) AS {EVENT_TIME_COLUMN} "
+        f"FROM table({stream_name}) LIMIT {int(rows)}))"
+    )
+
+
+def backfill_chunks(rows, start_ms, end_ms, chunk_rows):
+    """
+    Split a backfill into consecutive chunks, each covering the share of the
+    time range that matches its share of the rows.
+
+    Returns:
+        list: (rows, start_ms, end_ms) per chunk, oldest first
+    """
+    count = max(1, math.ceil(rows / chunk_rows))
+    span_ms = end_ms - start_ms
+    chunks = []
+    for index in range(count):
+        first_row = index * rows // count
+        last_row = (index + 1) * rows // count
+        chunks.append((
+            last_row - first_row,
+            start_ms + span_ms * first_row // rows,
+            start_ms + span_ms * last_row // rows,
+        ))
+    return chunks
+
+
+def run_backfill(timeplus_client, stream_name, sink_name, random_stream_ddl, select_list, rows, start_ms, end_ms,
+                 chunk_rows=1000000, on_progress=None):
+    """
+    Write rows with historical event times into a pipeline's sink, one chunk at a time.
+
+    Chunks are written in event time order, so consumers of the topic see
+    time moving forward apart from the jitter within a chunk.
+
+    Args:
+        timeplus_client: proton_driver client, used exclusively for the backfill
+        stream_name (str): Random stream generating the rows
+        sink_name (str): Kafka external stream to write to
+        random_stream_ddl (str): DDL of stream_name
+        select_list (str): Select list of the pipeline's materialized view
+        rows (int): Number of rows to write
+        start_ms (int): First event time, in milliseconds since the epoch
+        end_ms (int): End of the event time range, exclusive
+        chunk_rows (int): Rows per INSERT
+        on_progress (callable): Called with rows written, seconds elapsed and the
+            event time reached (ms) after each chunk
+
+    Returns:
+        dict: {"rows", "seconds", "chunks", "event_time_columns"}
+
+    Raises:
+        BackfillError: If a chunk could not be written
+    """
+    columns = backfill_columns(random_stream_ddl)
+    event_time_columns = [column["name"] for column in columns if column["expression"] is not None]
+    if not event_time_columns:
+        db_logger.warning(f"{stream_name} has no column derived from the wall clock, event times are not backfilled")
+
+    start_time = time.time()
+    written = 0
+    chunks = backfill_chunks(rows, start_ms, end_ms, chunk_rows)
+    for chunk_rows_count, chunk_start_ms, chunk_end_ms in chunks:
+        query = backfill_query(
+            stream_name, sink_name, columns, select_list, chunk_rows_count, chunk_start_ms, chunk_end_ms
+        )
+        db_logger.debug("Backfill query: %s", query)
+        try:
+            timeplus_client.execute(query)
+        except Exception as e:
+            db_logger.error(f"Backfill of {sink_name} failed after {written} rows: {e}")
+            raise BackfillError(f"Backfill failed after {written} rows: {e}", written)
+        written += chunk_rows_count
+        if on_progress:
+            on_progress(written, time.time() - start_time, chunk_end_ms)
+
+    return {
+        "rows": written,
+        "seconds": round(time.time() - start_time, 3),
+        "chunks": len(chunks),
+        "event_time_columns": event_time_columns,
+    }
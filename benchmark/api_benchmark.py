@@ -0,0 +1,511 @@
+"""
+Load benchmark for the pipeline API with stubbed LLM and Timeplus backends.
+
+agno's Agent, proton_driver's Client and confluent-kafka's AdminClient are
+replaced by local fakes with configurable latency and failure injection
+before main.py is imported, so no OpenAI endpoint, Timeplus server or Kafka
+broker is needed. Requests are sent in-process
+through httpx's ASGI transport, so the event loop measured for blocking is
+the one serving the app.
+
+With --workers N, the app is served instead by N uvicorn worker processes
+sharing one port and one pipelines.db, each with its own fakes, and requests
+go over HTTP. Job polls then land on any worker, not only the one running
+the job.
+
+Phases:
+    create  POST /pipelines, then GET /jobs/{id} until every job finished
+    read    GET /pipelines, GET /pipelines/{id} and GET /pipelines/stats
+    delete  DELETE /pipelines/{id} for every created pipeline
+
+Reports p50/p95/p99 latency and requests/s per endpoint, job durations and
+event loop lag, optionally as JSON for comparing runs.
+
+Usage:
+    python benchmark/api_benchmark.py --pipelines 50 --concurrency 16 --output api_bench.json
+    python benchmark/api_benchmark.py --pipelines 50 --concurrency 16 --workers 4
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, ".."))
+
+FAKE_DDL = """```sql
+CREATE RANDOM STREAM {name} (
+    id uint64 DEFAULT rand(),
+    user_name string DEFAULT ['alice', 'bob', 'carol'][rand() % 3 + 1],
+    amount float64 DEFAULT round(rand_uniform(1, 500), 2),
+    created_at datetime64(3) DEFAULT now64()
+) SETTINGS eps = 10
+```"""
+
+
+class Backend:
+    """Latency and failure settings shared by the fakes"""
+    llm_latency = 0.5
+    timeplus_latency = 0.005
+    jitter = 0.2
+    llm_failure_rate = 0.0
+    timeplus_failure_rate = 0.0
+    rng = random.Random(42)
+
+    @classmethod
+    def sleep(cls, latency):
+        time.sleep(max(0.0, latency * (1 + cls.rng.uniform(-cls.jitter, cls.jitter))))
+
+    @classmethod
+    def maybe_fail(cls, rate, what):
+        if rate and cls.rng.random() < rate:
+            raise RuntimeError(f"Injected {what} failure")
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeContentEvent:
+    event = "RunResponseContent"
+
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeAgent:
+    """Stands in for agno.agent.Agent; answers like the real prompts would"""
+
+    # Streamed responses arrive in this many chunks spread over the LLM latency,
+    # with prose after the code block
+    stream_chunks = 20
+    trailing_text = "\n\nThis stream generates benchmark events with ids, users and amounts."
+
+    def __init__(self, instructions=None, response_model=None, **kwargs):
+        self.instructions = instructions or ""
+        self.response_model = response_model
+        self.run_response = None
+
+    def run(self, message, stream=False, **kwargs):
+        if stream:
+            return self._stream(message)
+        Backend.sleep(Backend.llm_latency)
+        Backend.maybe_fail(Backend.llm_failure_rate, "LLM")
+        self.run_response = FakeResponse(self._answer(message))
+        return self.run_response
+
+    def _answer(self, message):
+        match = re.search(r"stream name is (\w+)", str(message))
+        name = match.group(1) if match else "bench_events"
+        if self.response_model is not None:
+            return self.response_model(name="Bench Events", ddl=FAKE_DDL.format(name="bench_events"))
+        if "three words" in self.instructions:
+            return "bench_events"
+        return FAKE_DDL.format(name=name)
+
+    def _stream(self, message):
+        Backend.maybe_fail(Backend.llm_failure_rate, "LLM")
+        content = self._answer(message) + self.trailing_text
+        self.run_response = FakeResponse(content)
+        chunk_size = -(-len(content) // (self.stream_chunks * 2))
+        for start in range(0, len(content), chunk_size):
+            Backend.sleep(Backend.llm_latency / self.stream_chunks)
+            yield FakeContentEvent(content[start:start + chunk_size])
+
+
+class FakeTimeplusClient:
+    """Stands in for proton_driver.client.Client"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def execute(self, query, params=None, **kwargs):
+        Backend.sleep(Backend.timeplus_latency)
+        if query.strip() == "SELECT 1":
+            return [(1,)]
+        Backend.maybe_fail(Backend.timeplus_failure_rate, "Timeplus")
+        if "count()" in query:
+            now_ms = int(time.time() * 1000)
+            return [(mv_name, Backend.rng.randint(0, 1000), now_ms) for mv_name in re.findall(r"SELECT '(\w+)'", query)]
+        return []
+
+    def execute_iter(self, query, params=None, **kwargs):
+        yield from self.execute(query, params, **kwargs)
+
+    def disconnect(self):
+        pass
+
+
+class FakeAdminClient:
+    """Stands in for confluent_kafka.admin.AdminClient; topics are created and deleted instantly"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def _done(self, topics):
+        futures = {}
+        for topic in topics:
+            futures[topic] = concurrent.futures.Future()
+            futures[topic].set_result(None)
+        return futures
+
+    def create_topics(self, new_topics, **kwargs):
+        return self._done(new_topic.topic for new_topic in new_topics)
+
+    def delete_topics(self, topics, **kwargs):
+        return self._done(topics)
+
+
+def install_fakes():
+    import agno.agent
+    import confluent_kafka.admin
+    import proton_driver.client
+
+    agno.agent.Agent = FakeAgent
+    confluent_kafka.admin.AdminClient = FakeAdminClient
+    proton_driver.client.Client = FakeTimeplusClient
+
+
+def start_fake_kafka():
+    """A listening socket so the Kafka readiness probe succeeds"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(128)
+    return server
+
+
+def prepare_workdir(workdir):
+    for entry in ("prompt", "samples", "static", "templates"):
+        os.symlink(os.path.join(REPO_DIR, entry), os.path.join(workdir, entry))
+
+
+def import_app(workdir, log_level, prepare=True):
+    """Import main.py inside a scratch directory so pipelines.db and the log file are throwaway"""
+    if prepare:
+        prepare_workdir(workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    import main
+
+    root = logging.getLogger()
+    root.setLevel(log_level)
+    # Keep the file handler (its cost is part of what is measured) but not console output
+    main.log_listener.handlers = tuple(
+        handler for handler in main.log_listener.handlers if type(handler) is not logging.StreamHandler
+    )
+    return main
+
+
+def configure_backend(args):
+    Backend.llm_latency = args.llm_latency
+    Backend.timeplus_latency = args.timeplus_latency
+    Backend.llm_failure_rate = args.llm_failure_rate
+    Backend.timeplus_failure_rate = args.timeplus_failure_rate
+
+
+def worker_app():
+    """App factory run by every uvicorn worker with --workers; settings come from BENCH_ARGS"""
+    args = argparse.Namespace(**json.loads(os.environ["BENCH_ARGS"]))
+    configure_backend(args)
+    install_fakes()
+    return import_app(os.getcwd(), args.log_level.upper(), prepare=False).app
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_workers(workdir, args):
+    """Serve the app with args.workers uvicorn workers; returns the process and the base URL"""
+    port = free_port()
+    env = dict(os.environ, BENCH_ARGS=json.dumps(vars(args)), WEB_CONCURRENCY=str(args.workers))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_benchmark:worker_app", "--factory", "--app-dir", BENCHMARK_DIR,
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic timer fires, i.e. how long the event loop was blocked"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def summary(self, blocked_threshold=0.005):
+        if not self.lags:
+            return {}
+        return {
+            "samples": len(self.lags),
+            "mean_lag_ms": statistics.fmean(self.lags) * 1000,
+            "p99_lag_ms": percentile(self.lags, 99) * 1000,
+            "max_lag_ms": max(self.lags) * 1000,
+            "blocked_ms": sum(lag for lag in self.lags if lag > blocked_threshold) * 1000,
+        }
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+
+    async def request(self, client, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        end = time.perf_counter()
+        self.samples.setdefault(endpoint, []).append((start, end, response.status_code))
+        return response
+
+    def summary(self):
+        results = {}
+        for endpoint, samples in self.samples.items():
+            latencies = [end - start for start, end, _ in samples]
+            wall = max(end for _, end, _ in samples) - min(start for start, _, _ in samples)
+            results[endpoint] = {
+                "requests": len(samples),
+                "errors": sum(1 for _, _, status in samples if status >= 400),
+                "rps": len(samples) / wall if wall > 0 else 0.0,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "max_ms": max(latencies) * 1000,
+            }
+        return results
+
+
+async def run_limited(concurrency, coroutines):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def limited(coroutine):
+        async with limit:
+            return await coroutine
+
+    return await asyncio.gather(*(limited(coroutine) for coroutine in coroutines))
+
+
+async def create_phase(client, recorder, args):
+    async def create(index):
+        response = await recorder.request(
+            client, "POST /pipelines", "POST", "/pipelines",
+            json={"question": f"benchmark events {index}", "use_cache": args.use_cache},
+        )
+        return response.json().get("job_id") if response.status_code == 202 else None
+
+    job_ids = [job_id for job_id in await run_limited(args.concurrency, [create(i) for i in range(args.pipelines)]) if job_id]
+
+    async def wait(job_id):
+        while True:
+            response = await recorder.request(client, "GET /jobs/{id}", "GET", f"/jobs/{job_id}")
+            job = response.json()
+            if job.get("status") in ("completed", "failed"):
+                return job
+            await asyncio.sleep(args.poll_interval)
+
+    jobs = await asyncio.gather(*(wait(job_id) for job_id in job_ids))
+    durations = [job["finished_at"] - job["created_at"] for job in jobs]
+    summary = {
+        "completed": sum(1 for job in jobs if job["status"] == "completed"),
+        "failed": sum(1 for job in jobs if job["status"] == "failed"),
+    }
+    if durations:
+        summary.update({
+            "p50_s": percentile(durations, 50),
+            "p95_s": percentile(durations, 95),
+            "max_s": max(durations),
+        })
+    pipeline_ids = [job["result"]["id"] for job in jobs if job["status"] == "completed"]
+    return pipeline_ids, summary
+
+
+async def read_phase(client, recorder, args, pipeline_ids):
+    rng = random.Random(7)
+    requests = []
+    for _ in range(args.reads):
+        choice = rng.random()
+        if choice < 0.4 and pipeline_ids:
+            pipeline_id = rng.choice(pipeline_ids)
+            requests.append(recorder.request(client, "GET /pipelines/{id}", "GET", f"/pipelines/{pipeline_id}"))
+        elif choice < 0.7:
+            requests.append(recorder.request(client, "GET /pipelines", "GET", "/pipelines"))
+        else:
+            requests.append(recorder.request(client, "GET /pipelines/stats", "GET", "/pipelines/stats"))
+    await run_limited(args.concurrency, requests)
+
+
+async def delete_phase(client, recorder, args, pipeline_ids):
+    await run_limited(args.concurrency, [
+        recorder.request(client, "DELETE /pipelines/{id}", "DELETE", f"/pipelines/{pipeline_id}")
+        for pipeline_id in pipeline_ids
+    ])
+
+
+async def run_phases(client, recorder, args):
+    pipeline_ids, jobs = await create_phase(client, recorder, args)
+    await read_phase(client, recorder, args, pipeline_ids)
+    await delete_phase(client, recorder, args, pipeline_ids)
+    return jobs
+
+
+async def run_benchmark(app, args):
+    import httpx
+
+    recorder = Recorder()
+    monitor = LoopLagMonitor()
+    monitor.start()
+    start = time.perf_counter()
+    transport = httpx.ASGITransport(app=app)
+    # ASGITransport does not send lifespan events, so run the app's lifespan directly
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        while (await client.get("/readyz")).status_code != 200:
+            await asyncio.sleep(0.01)
+        ready_seconds = time.perf_counter() - start
+        jobs = await run_phases(client, recorder, args)
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+    return {
+        "ready_s": ready_seconds,
+        "elapsed_s": elapsed,
+        "jobs": jobs,
+        "endpoints": recorder.summary(),
+        "event_loop": monitor.summary(),
+    }
+
+
+async def run_worker_benchmark(base_url, args):
+    import httpx
+
+    recorder = Recorder()
+    start = time.perf_counter()
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        # Every worker gets ready on its own; wait until a run of probes only finds ready ones
+        ready_in_a_row = 0
+        while ready_in_a_row < args.workers * 4:
+            try:
+                ready = (await client.get("/readyz")).status_code == 200
+            except httpx.TransportError:
+                ready = False
+            ready_in_a_row = ready_in_a_row + 1 if ready else 0
+            if not ready:
+                await asyncio.sleep(0.05)
+        ready_seconds = time.perf_counter() - start
+        jobs = await run_phases(client, recorder, args)
+    return {
+        "ready_s": ready_seconds,
+        "elapsed_s": time.perf_counter() - start,
+        "jobs": jobs,
+        "endpoints": recorder.summary(),
+        # The event loops serving requests are in the worker processes
+        "event_loop": {},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the pipeline API with fake backends")
+    parser.add_argument("--pipelines", type=int, default=50, help="Pipelines to create (and delete)")
+    parser.add_argument("--reads", type=int, default=500, help="GET requests in the read phase")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent requests per phase")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per fake LLM call")
+    parser.add_argument("--timeplus-latency", type=float, default=0.005, help="Seconds per fake Timeplus query")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="Fraction of LLM calls that fail")
+    parser.add_argument("--timeplus-failure-rate", type=float, default=0.0,
+                        help="Fraction of Timeplus queries that fail")
+    parser.add_argument("--use-cache", action="store_true", help="Allow generation cache hits")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="Seconds between job polls")
+    parser.add_argument("--log-level", default="INFO", help="Level of the app's file logging")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Serve the app with this many uvicorn workers over HTTP instead of in-process")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    configure_backend(args)
+
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    kafka = start_fake_kafka()
+    os.environ["KAFKA_BROKERS"] = f"127.0.0.1:{kafka.getsockname()[1]}"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    install_fakes()
+
+    with tempfile.TemporaryDirectory(prefix="api_bench_") as workdir:
+        if args.workers:
+            prepare_workdir(workdir)
+            import_seconds = 0.0
+            process, base_url = start_workers(workdir, args)
+            try:
+                results = asyncio.run(run_worker_benchmark(base_url, args))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+        else:
+            import_start = time.perf_counter()
+            app_module = import_app(workdir, args.log_level.upper())
+            import_seconds = time.perf_counter() - import_start
+
+            results = asyncio.run(run_benchmark(app_module.app, args))
+    kafka.close()
+
+    results["import_s"] = import_seconds
+    results["config"] = vars(args)
+
+    jobs = results["jobs"]
+    print(f"app import: {import_seconds:.2f}s, ready after: {results['ready_s']:.2f}s, "
+          f"total: {results['elapsed_s']:.2f}s")
+    print(f"jobs: {jobs['completed']} completed, {jobs['failed']} failed"
+          + (f", p50 {jobs['p50_s']:.2f}s, p95 {jobs['p95_s']:.2f}s" if "p50_s" in jobs else ""))
+    print(f"{'endpoint':<24} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, row in results["endpoints"].items():
+        print(f"{endpoint:<24} {row['requests']:>8} {row['errors']:>6} {row['rps']:>9.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+    loop = results["event_loop"]
+    if loop:
+        print(f"event loop lag: p99 {loop['p99_lag_ms']:.1f}ms, max {loop['max_lag_ms']:.1f}ms, "
+              f"blocked {loop['blocked_ms']:.0f}ms in total")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
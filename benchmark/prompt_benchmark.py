@@ -0,0 +1,150 @@
+"""
+Prompt retrieval benchmark.
+
+For every question, compares the full generation prompt with the core
+prompt plus the reference sections and examples that prompt retrieval
+selects, and reports:
+
+    - estimated prompt tokens of both variants and the retrieval time
+    - with --live, the measured input tokens and latency of a real DDL
+      generation with each variant (needs OPENAI_API_KEY; OPENAI_MODEL and
+      OPENAI_BASE_URL are honoured like in the app)
+
+Examples come from samples/ and, if it exists, from the pipelines in
+pipelines.db, like at app startup.
+
+Usage:
+    python benchmark/prompt_benchmark.py --output prompt.json
+    python benchmark/prompt_benchmark.py --live --runs 3 "IoT temperature sensors"
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, REPO_DIR)
+
+from llm_streaming import stream_code_block  # noqa: E402
+from metrics import token_count  # noqa: E402
+from prompt_index import PromptIndex  # noqa: E402
+
+DEFAULT_QUESTIONS = [
+    "ecommerce orders with customer emails and shipping cities",
+    "stock trades with bid and ask prices and order sizes",
+    "network flows with source and destination ip addresses and ports",
+    "IoT temperature and humidity sensor readings",
+    "user signups with name, phone number and country",
+    "website clickstream with page views and sessions",
+    "credit card payments with currency and fraud flag",
+    "ride sharing trips with pickup and dropoff coordinates",
+]
+
+
+def build_index(db_path):
+    with open(os.path.join(REPO_DIR, "prompt", "prompt.txt"), "r") as f:
+        index = PromptIndex(f.read())
+    index.add_samples(os.path.join(REPO_DIR, "samples"))
+    if os.path.exists(db_path):
+        from sqlite_pipeline_manager import SQLitePipelineManager
+
+        for question, ddl in reversed(SQLitePipelineManager(db_path).list_examples(index.max_indexed)):
+            index.add_example("pipeline", question, ddl)
+    return index
+
+
+def generate(instructions, message, runs):
+    """Median latency, time to first token and input tokens of streamed DDL generations"""
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+
+    agent = Agent(
+        model=OpenAIChat(
+            id=os.getenv("OPENAI_MODEL", "gpt-4o"),
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+        ),
+        instructions=instructions,
+        markdown=False,
+    )
+    latencies, first_tokens, input_tokens = [], [], []
+    for _ in range(runs):
+        start_time = time.time()
+        _, first_delta_seconds = stream_code_block(agent, message)
+        latencies.append(time.time() - start_time)
+        first_tokens.append(first_delta_seconds or 0)
+        run_metrics = getattr(agent.run_response, "metrics", None) or {}
+        input_tokens.append(token_count(run_metrics.get("input_tokens")))
+    return {
+        "seconds": statistics.median(latencies),
+        "first_token_seconds": statistics.median(first_tokens),
+        "input_tokens": statistics.median(input_tokens),
+    }
+
+
+def benchmark_question(index, question, args):
+    start_time = time.perf_counter()
+    selection = index.select(question)
+    row = {
+        "question": question,
+        "select_ms": round((time.perf_counter() - start_time) * 1000, 2),
+        "full_tokens": selection["full_tokens"],
+        "prompt_tokens": selection["prompt_tokens"],
+        "sections": selection["sections"],
+        "examples": selection["examples"],
+    }
+    if args.live:
+        message = f"{question}, ONLY return the random stream DDL, and the stream name is bench_stream"
+        context_message = f"{selection['context']}\n\n{message}" if selection["context"] else message
+        row["full"] = generate(index.full_prompt, message, args.runs)
+        row["retrieved"] = generate(index.core_prompt, context_message, args.runs)
+    return row
+
+
+def print_report(rows, live):
+    print(f"{'question':<48} {'full':>6} {'sent':>6} {'saved':>6} {'ms':>6}")
+    for row in rows:
+        saved = 1 - row["prompt_tokens"] / row["full_tokens"]
+        print(f"{row['question'][:48]:<48} {row['full_tokens']:>6} {row['prompt_tokens']:>6} {saved:>6.0%} "
+              f"{row['select_ms']:>6.2f}")
+    saved = 1 - sum(row["prompt_tokens"] for row in rows) / sum(row["full_tokens"] for row in rows)
+    print(f"estimated prompt tokens saved overall: {saved:.0%}")
+
+    if live:
+        print()
+        print(f"{'question':<48} {'in tok':>13} {'first tok s':>13} {'total s':>13}")
+        for row in rows:
+            full, retrieved = row["full"], row["retrieved"]
+            print(f"{row['question'][:48]:<48} {full['input_tokens']:>6.0f}/{retrieved['input_tokens']:<6.0f} "
+                  f"{full['first_token_seconds']:>6.2f}/{retrieved['first_token_seconds']:<6.2f} "
+                  f"{full['seconds']:>6.2f}/{retrieved['seconds']:<6.2f}")
+        print("(full prompt / retrieved prompt, medians)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the full generation prompt with prompt retrieval")
+    parser.add_argument("questions", nargs="*", help="Questions (default: a built-in set)")
+    parser.add_argument("--db-path", default=os.path.join(REPO_DIR, "pipelines.db"))
+    parser.add_argument("--live", action="store_true", help="Also generate DDLs with both prompts")
+    parser.add_argument("--runs", type=int, default=3, help="Generations per question and prompt with --live")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.live and not os.getenv("OPENAI_API_KEY"):
+        parser.error("--live needs OPENAI_API_KEY")
+
+    index = build_index(args.db_path)
+    print(f"{len(index.sections)} reference sections, {index.example_count} example DDLs")
+    rows = [benchmark_question(index, question, args) for question in args.questions or DEFAULT_QUESTIONS]
+    print_report(rows, args.live)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"live": args.live, "runs": args.runs, "results": rows}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+End-to-end throughput benchmark for random stream DDLs.
+
+Runs each DDL against a live Timeplus and Redpanda (e.g. `docker compose up
+timeplus kafka`) through the same random stream -> MV -> Kafka external
+stream path that pipelines use, and reports:
+
+    - requested eps vs the rate achieved by the MV and the rate that
+      actually landed in Kafka, plus Kafka bytes/s and message size
+    - the cost of every column's DEFAULT expression, measured by projecting
+      the column on its own from a bounded table() query
+
+DDLs come from files (by default every random stream in samples/) or from
+existing pipelines in pipelines.db. All benchmark objects are dropped
+afterwards; the Kafka topics are left for Redpanda's retention.
+
+Usage:
+    python benchmark/throughput_benchmark.py --duration 30 --output throughput.json
+    python benchmark/throughput_benchmark.py --pipeline-id <id> --eps 5000
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import uuid
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, REPO_DIR)
+
+from ddl_validator import CREATE_RANDOM_STREAM, parse_random_stream, strip_sql_comments  # noqa: E402
+from sharding import find_eps_setting, set_eps  # noqa: E402
+from timeplus_pool import TimeplusConnectionPool  # noqa: E402
+
+
+def load_catalog(paths):
+    """(label, ddl) for every file that defines a random stream"""
+    catalog = []
+    for path in paths:
+        with open(path, "r") as f:
+            ddl = strip_sql_comments(f.read())
+        if CREATE_RANDOM_STREAM.search(ddl):
+            catalog.append((os.path.splitext(os.path.basename(path))[0], ddl.strip().rstrip(";")))
+    return catalog
+
+
+def load_pipelines(pipeline_ids, db_path):
+    from sqlite_pipeline_manager import SQLitePipelineManager
+
+    metadata = SQLitePipelineManager(db_path)
+    catalog = []
+    for pipeline_id in pipeline_ids:
+        pipeline_info = metadata.get(pipeline_id)
+        catalog.append((pipeline_info["name"], pipeline_info["pipeline"]["random_stream"]["ddl"]))
+    return catalog
+
+
+def requested_eps(ddl):
+    match, _ = find_eps_setting(ddl)
+    return int(match.group(0).split("=")[1]) if match else None
+
+
+class ThroughputRun:
+    """The benchmark copy of one DDL: random stream, Kafka external stream and MV"""
+
+    def __init__(self, pool, ddl, brokers, eps=None):
+        self.pool = pool
+        suffix = uuid.uuid4().hex[:8]
+        self.stream = f"bench_{suffix}"
+        self.external = f"bench_kafka_{suffix}"
+        self.mv = f"bench_mv_{suffix}"
+        self.topic = f"bench_{suffix}_topic"
+        self.brokers = brokers
+
+        renamed = CREATE_RANDOM_STREAM.sub(f"CREATE RANDOM STREAM {self.stream}", ddl, count=1)
+        self.ddl = set_eps(renamed, eps) if eps else renamed
+        self.eps = requested_eps(self.ddl)
+        self.columns = parse_random_stream(self.ddl)["columns"]
+
+    def create(self):
+        self.pool.execute(self.ddl, retry=False)
+        self.pool.execute(
+            f"CREATE EXTERNAL STREAM {self.external} (value string) "
+            f"SETTINGS type = 'kafka', brokers = '{self.brokers}', topic = '{self.topic}'",
+            retry=False,
+        )
+        self.pool.execute(
+            f"CREATE MATERIALIZED VIEW {self.mv} INTO {self.external} AS "
+            f"SELECT json_encode(*) AS value FROM {self.stream}",
+            retry=False,
+        )
+
+    def drop(self):
+        for statement in (
+            f"DROP VIEW IF EXISTS {self.mv}",
+            f"DROP STREAM IF EXISTS {self.external}",
+            f"DROP STREAM IF EXISTS {self.stream}",
+        ):
+            try:
+                self.pool.execute(statement)
+            except Exception as e:
+                print(f"  warning: {statement} failed: {e}")
+
+    def counters(self):
+        """(rows written by the MV, messages in Kafka, payload bytes in Kafka)"""
+        mv_rows = self.pool.execute(f"SELECT count() FROM table({self.mv})")[0][0]
+        kafka_rows, kafka_bytes = self.pool.execute(
+            f"SELECT count(), sum(length(value)) FROM table({self.external})"
+        )[0]
+        return mv_rows, kafka_rows, kafka_bytes or 0
+
+    def measure_rate(self, warmup, duration):
+        time.sleep(warmup)
+        start_counts, start_time = self.counters(), time.perf_counter()
+        time.sleep(duration)
+        end_counts, end_time = self.counters(), time.perf_counter()
+        elapsed = end_time - start_time
+        mv_rows, kafka_rows, kafka_bytes = (end - start for start, end in zip(start_counts, end_counts))
+        return {
+            "requested_eps": self.eps,
+            "mv_eps": mv_rows / elapsed,
+            "kafka_eps": kafka_rows / elapsed,
+            "kafka_bytes_per_s": kafka_bytes / elapsed,
+            "avg_message_bytes": kafka_bytes / kafka_rows if kafka_rows else 0.0,
+        }
+
+    def column_costs(self, rows):
+        """Rows/s when generating each column alone, slowest first"""
+        def timed(select_list):
+            start = time.perf_counter()
+            self.pool.execute(f"SELECT count() FROM (SELECT {select_list} FROM table({self.stream}) LIMIT {rows})")
+            return time.perf_counter() - start
+
+        all_columns = ", ".join(f"`{name}`" for name, _, _ in self.columns)
+        baseline = timed(all_columns)
+        costs = []
+        for name, column_type, _ in self.columns:
+            seconds = timed(f"`{name}`")
+            costs.append({
+                "column": name,
+                "type": column_type,
+                "rows_per_s": rows / seconds,
+                "share_of_row": seconds / baseline if baseline else 0.0,
+            })
+        costs.sort(key=lambda cost: cost["rows_per_s"])
+        return {"all_columns_rows_per_s": rows / baseline, "columns": costs}
+
+
+def benchmark_ddl(pool, label, ddl, args):
+    run = ThroughputRun(pool, ddl, args.brokers, args.eps)
+    print(f"{label}: {len(run.columns)} columns, requested {run.eps} eps")
+    run.create()
+    try:
+        result = {"ddl": label, **run.measure_rate(args.warmup, args.duration)}
+        if not args.skip_columns:
+            result.update(run.column_costs(args.column_rows))
+    finally:
+        run.drop()
+    return result
+
+
+def print_report(results):
+    print()
+    print(f"{'ddl':<24} {'requested':>10} {'mv eps':>10} {'kafka eps':>10} {'kafka KB/s':>11} "
+          f"{'msg bytes':>10} {'slowest column':>24}")
+    for row in results:
+        slowest = row["columns"][0]["column"] if row.get("columns") else "-"
+        print(f"{row['ddl']:<24} {row['requested_eps'] or 0:>10} {row['mv_eps']:>10.0f} {row['kafka_eps']:>10.0f} "
+              f"{row['kafka_bytes_per_s'] / 1024:>11.1f} {row['avg_message_bytes']:>10.0f} {slowest:>24}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure achieved throughput of random stream DDLs")
+    parser.add_argument("ddl_files", nargs="*", help="DDL files (default: samples/*.sql)")
+    parser.add_argument("--pipeline-id", action="append", default=[], help="Benchmark an existing pipeline's DDL")
+    parser.add_argument("--db-path", default=os.path.join(REPO_DIR, "pipelines.db"))
+    parser.add_argument("--eps", type=int, help="Override the requested eps of every DDL")
+    parser.add_argument("--duration", type=float, default=20, help="Measurement window in seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds to run before measuring")
+    parser.add_argument("--column-rows", type=int, default=200000, help="Rows per column cost query")
+    parser.add_argument("--skip-columns", action="store_true", help="Do not measure per-column cost")
+    parser.add_argument("--brokers", default=os.getenv("KAFKA_BROKERS", "kafka:9092"),
+                        help="Kafka brokers as seen from Timeplus")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.pipeline_id:
+        catalog = load_pipelines(args.pipeline_id, args.db_path)
+    else:
+        catalog = load_catalog(args.ddl_files or sorted(glob.glob(os.path.join(REPO_DIR, "samples", "*.sql"))))
+
+    pool = TimeplusConnectionPool(
+        host=os.getenv("TIMEPLUS_HOST") or "localhost",
+        user=os.getenv("TIMEPLUS_USER") or "proton",
+        password=os.getenv("TIMEPLUS_PASSWORD") or "timeplus@t+",
+        port=int(os.getenv("TIMEPLUS_PORT", "8463")),
+        size=2,
+    )
+
+    results = []
+    try:
+        for label, ddl in catalog:
+            try:
+                results.append(benchmark_ddl(pool, label, ddl, args))
+            except Exception as e:
+                print(f"  {label} failed: {e}")
+                results.append({"ddl": label, "error": str(e)})
+    finally:
+        pool.close()
+
+    print_report([row for row in results if "error" not in row])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "duration": args.duration,
+                "warmup": args.warmup,
+                "eps_override": args.eps,
+                "brokers": args.brokers,
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Micro-benchmark for the generate() Python UDF in script/udf.sql.
+
+Runs the UDF body locally (outside Timeplus) on blocks of provider names and
+seeds, the way Timeplus calls it, and reports rows/s per provider for the
+current implementation and for the original row-by-row implementation.
+
+Usage:
+    python benchmark/udf_benchmark.py --block-size 8192 --blocks 20
+"""
+import argparse
+import json
+import os
+import random
+import re
+import time
+
+ORIGINAL_UDF = """
+from faker import Faker
+fake = Faker()
+
+def generate(data, seed):
+  result = []
+  for d , s in zip(data, seed):
+    try:
+      r = fake.format(d)
+      result.append(r)
+    except:
+      result.append('')
+  return result
+"""
+
+DEFAULT_PROVIDERS = [
+    "name", "first_name", "email", "phone_number", "address", "city", "country",
+    "company", "job", "url", "domain_name", "sentence", "credit_card_number",
+    "iban", "license_plate", "color_name",
+]
+
+UDF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "script", "udf.sql")
+
+
+def load_udf(source):
+    namespace = {}
+    exec(source, namespace)
+    return namespace["generate"]
+
+
+def load_current_udf(path=UDF_PATH):
+    with open(path, "r") as f:
+        sql = f.read()
+    match = re.search(r"\$\$(.*?)\$\$", sql, re.DOTALL)
+    if not match:
+        raise RuntimeError(f"No Python UDF body found in {path}")
+    return load_udf(match.group(1))
+
+
+def rows_per_second(generate, data, seeds, blocks):
+    # Warm up pools and caches outside the timed section
+    generate(data[:16], seeds[:16])
+    start = time.perf_counter()
+    for _ in range(blocks):
+        generate(data, seeds)
+    elapsed = time.perf_counter() - start
+    return len(data) * blocks / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generate() Faker UDF")
+    parser.add_argument("--block-size", type=int, default=8192, help="Rows per UDF call")
+    parser.add_argument("--blocks", type=int, default=20, help="UDF calls per measurement")
+    parser.add_argument("--providers", nargs="*", default=DEFAULT_PROVIDERS)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    implementations = {
+        "original": load_udf(ORIGINAL_UDF),
+        "current": load_current_udf(),
+    }
+
+    rng = random.Random(42)
+    seeds = [rng.getrandbits(32) for _ in range(args.block_size)]
+
+    cases = [(provider, [provider] * args.block_size) for provider in args.providers]
+    cases.append(("mixed", [args.providers[i % len(args.providers)] for i in range(args.block_size)]))
+
+    results = []
+    print(f"{'provider':<20} {'original rows/s':>16} {'current rows/s':>16} {'speedup':>9}")
+    for provider, data in cases:
+        row = {"provider": provider}
+        for impl_name, generate in implementations.items():
+            row[impl_name] = rows_per_second(generate, data, seeds, args.blocks)
+        row["speedup"] = row["current"] / row["original"]
+        results.append(row)
+        print(f"{provider:<20} {row['original']:>16,.0f} {row['current']:>16,.0f} {row['speedup']:>8.1f}x")
+
+    # The same seeds must give the same values
+    current = implementations["current"]
+    data = [args.providers[0]] * 64
+    deterministic = current(data, seeds[:64]) == current(data, seeds[:64])
+    print(f"deterministic for equal seeds: {deterministic}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "block_size": args.block_size,
+                "blocks": args.blocks,
+                "deterministic": deterministic,
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
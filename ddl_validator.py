@@ -0,0 +1,246 @@
+import logging
+import re
+import uuid
+
+ai_logger = logging.getLogger("ai_generator")
+
+# Random distribution functions whose parameters must be constants
+RANDOM_DISTRIBUTION_FUNCTIONS = {
+    "rand_uniform", "rand_normal", "rand_log_normal", "rand_exponential", "rand_poisson",
+    "rand_bernoulli", "rand_student_t", "rand_chi_squared",
+}
+
+SUPPORTED_TYPES = {
+    "int8", "int16", "int32", "int64", "int128", "int256", "int",
+    "uint8", "uint16", "uint32", "uint64", "uint128", "uint256", "uint",
+    "float32", "float64", "float", "double", "decimal", "decimal32", "decimal64", "decimal128",
+    "string", "fixed_string", "date", "date32", "datetime", "datetime64", "bool", "boolean",
+    "array", "map", "tuple", "json", "uuid", "enum", "enum8", "enum16", "ipv4", "ipv6",
+    "nullable", "low_cardinality",
+}
+
+# Type aliases -> the type they stand for, shared by the Kafka and export type mappings
+TYPE_ALIASES = {"int": "int32", "uint": "uint32", "float": "float32", "double": "float64", "boolean": "bool"}
+
+CONSTANT_EXPRESSION = re.compile(r"^[\s\d.eE+\-*/()]+$")
+CAMEL_CASE_CALL = re.compile(r"\b([a-z]+[A-Z]\w*|[A-Z][a-z0-9]+[A-Z]\w*)\s*\(")
+FUNCTION_CALL = re.compile(r"\b([a-z_][a-z0-9_]*)\s*\(", re.IGNORECASE)
+EPS_SETTING = re.compile(r"\bSETTINGS\b.*\beps\s*=\s*\d+", re.IGNORECASE | re.DOTALL)
+CREATE_RANDOM_STREAM = re.compile(
+    r"CREATE\s+RANDOM\s+STREAM\s+(?:IF\s+NOT\s+EXISTS\s+)?`?([\w.]+)`?", re.IGNORECASE
+)
+COLUMN_DEFINITION = re.compile(r"^\s*`?(\w+)`?\s+(.*?)(?:\s+DEFAULT\s+(.*))?$", re.IGNORECASE | re.DOTALL)
+
+
+def strip_sql_comments(sql):
+    """Remove -- comments that are not inside string literals"""
+    result = []
+    in_string = False
+    i = 0
+    while i < len(sql):
+        ch = sql[i]
+        if ch == "'" and (i == 0 or sql[i - 1] != "\\"):
+            in_string = not in_string
+        elif not in_string and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end == -1 else end
+            continue
+        result.append(ch)
+        i += 1
+    return "".join(result)
+
+
+def find_closing_paren(text, open_index):
+    """Index of the parenthesis closing the one at open_index, skipping string literals"""
+    depth = 0
+    in_string = False
+    for i in range(open_index, len(text)):
+        ch = text[i]
+        if ch == "'" and (i == 0 or text[i - 1] != "\\"):
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def split_top_level(text, separator=","):
+    """Split on separators that are not nested in parentheses, brackets or strings"""
+    parts = []
+    depth = 0
+    in_string = False
+    current = []
+    for i, ch in enumerate(text):
+        if ch == "'" and (i == 0 or text[i - 1] != "\\"):
+            in_string = not in_string
+        elif not in_string:
+            if ch in "([":
+                depth += 1
+            elif ch in ")]":
+                depth -= 1
+            elif ch == separator and depth == 0:
+                parts.append("".join(current))
+                current = []
+                continue
+        current.append(ch)
+    if "".join(current).strip():
+        parts.append("".join(current))
+    return parts
+
+
+def blank_string_literals(text):
+    """Replace string literal contents with spaces so that they are not linted as code"""
+    return re.sub(r"'(?:[^'\\]|\\.)*'", lambda m: "'" + " " * (len(m.group(0)) - 2) + "'", text)
+
+
+def parse_random_stream(ddl):
+    """
+    Parse a CREATE RANDOM STREAM statement.
+
+    Returns:
+        dict: {"name": stream name, "columns": [(name, type, default_expression)],
+               "settings": text after the column list}
+
+    Raises:
+        ValueError: If the DDL is not a parseable random stream definition
+    """
+    sql = strip_sql_comments(ddl)
+    match = CREATE_RANDOM_STREAM.search(sql)
+    if not match:
+        raise ValueError("DDL does not contain a CREATE RANDOM STREAM statement")
+
+    open_index = sql.find("(", match.end())
+    close_index = find_closing_paren(sql, open_index) if open_index != -1 else -1
+    if close_index == -1:
+        raise ValueError("Column list of the random stream is missing or has unbalanced parentheses")
+
+    columns = []
+    for definition in split_top_level(sql[open_index + 1:close_index]):
+        column = COLUMN_DEFINITION.match(definition.strip())
+        if not column:
+            raise ValueError(f"Cannot parse column definition: {definition.strip()[:80]}")
+        columns.append((column.group(1), column.group(2).strip(), (column.group(3) or "").strip()))
+
+    return {"name": match.group(1), "columns": columns, "settings": sql[close_index + 1:]}
+
+
+def canonical_type(base_type):
+    """Resolve a lower case type alias like 'float' to the type it stands for"""
+    return TYPE_ALIASES.get(base_type, base_type)
+
+
+def to_snake_case_function(name):
+    return re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name).lower()
+
+
+def lint_random_stream_ddl(ddl):
+    """
+    Check a random stream DDL against the function and type rules of the prompt.
+
+    Returns:
+        tuple: (errors, warnings), lists of human readable messages. Errors
+               make Timeplus reject or misinterpret the DDL; warnings are
+               style rules of the prompt.
+    """
+    errors = []
+    warnings = []
+
+    try:
+        stream = parse_random_stream(ddl)
+    except ValueError as e:
+        return [str(e)], warnings
+
+    if not stream["columns"]:
+        errors.append("Random stream has no columns")
+
+    if not EPS_SETTING.search(stream["settings"]):
+        errors.append("Missing 'SETTINGS eps = <events per second>' after the column list")
+
+    for column_name, column_type, default in stream["columns"]:
+        base_type = re.match(r"\w+", column_type)
+        if not base_type or base_type.group(0).lower() not in SUPPORTED_TYPES:
+            errors.append(f"Column '{column_name}' has unsupported type '{column_type}'")
+
+        if not default:
+            warnings.append(f"Column '{column_name}' has no DEFAULT expression")
+            continue
+
+        code = blank_string_literals(default)
+
+        for function_name in CAMEL_CASE_CALL.findall(code):
+            errors.append(
+                f"Column '{column_name}' calls camelCase function '{function_name}'; "
+                f"Timeplus functions are snake_case, e.g. '{to_snake_case_function(function_name)}'"
+            )
+
+        for call in FUNCTION_CALL.finditer(code):
+            function_name = call.group(1).lower()
+            if function_name not in RANDOM_DISTRIBUTION_FUNCTIONS:
+                continue
+            open_index = code.find("(", call.start())
+            close_index = find_closing_paren(code, open_index)
+            arguments = split_top_level(code[open_index + 1:close_index]) if close_index != -1 else []
+            for argument in arguments:
+                if not CONSTANT_EXPRESSION.match(argument):
+                    errors.append(
+                        f"Column '{column_name}' passes non-constant parameter '{argument.strip()}' "
+                        f"to {function_name}(); all parameters of random functions must be constants"
+                    )
+
+        if re.search(r"\bCASE\b", code, re.IGNORECASE):
+            warnings.append(f"Column '{column_name}' uses CASE; prefer multi_if()")
+
+    return errors, warnings
+
+
+class DDLValidator:
+    """
+    Validate generated random stream DDLs before they are used for a pipeline.
+
+    Validation first lints the DDL locally and then, if a Timeplus connection
+    pool is given, creates the stream under a temporary name and drops it
+    again so that type and function errors are reported by the server.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool
+
+    def server_check(self, ddl):
+        """
+        Returns:
+            str: The Timeplus error message, or None if the DDL was accepted
+        """
+        temp_name = f"validate_{uuid.uuid4().hex[:12]}"
+        temp_ddl = CREATE_RANDOM_STREAM.sub(lambda m: f"CREATE RANDOM STREAM {temp_name}", ddl, count=1)
+        try:
+            self.pool.execute(temp_ddl, retry=False)
+        except Exception as e:
+            return str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+        finally:
+            try:
+                self.pool.execute(f"DROP STREAM IF EXISTS {temp_name}")
+            except Exception as e:
+                ai_logger.warning(f"Failed to drop validation stream {temp_name}: {e}")
+        return None
+
+    def validate(self, ddl):
+        """
+        Returns:
+            list: Error messages; empty if the DDL is valid
+        """
+        errors, warnings = lint_random_stream_ddl(ddl)
+        for warning in warnings:
+            ai_logger.info(f"DDL lint warning: {warning}")
+        if errors:
+            return errors
+
+        if self.pool is not None:
+            server_error = self.server_check(ddl)
+            if server_error:
+                return [f"Timeplus rejected the DDL: {server_error}"]
+        return []
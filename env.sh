@@ -6,3 +6,4 @@ export TIMEPLUS_HOST=localhost
 export TIMEPLUS_USER=proton
 export TIMEPLUS_PASSWORD=timeplus@t+
 export KAFKA_BROKERS=kafka:9092
+export SCHEMA_REGISTRY_URL=http://localhost:8081
@@ -0,0 +1,169 @@
+import csv
+import importlib.util
+import itertools
+import logging
+import os
+import re
+import time
+
+from ddl_validator import canonical_type, parse_random_stream
+from kafka_formats import LOW_CARDINALITY
+
+db_logger = logging.getLogger("database")
+
+# Export format -> file extension
+EXPORT_FORMATS = {"parquet": ".parquet", "csv": ".csv"}
+
+# Timeplus type -> Arrow type alias; other types are exported as strings. Aliases are resolved by canonical_type().
+ARROW_TYPES = {
+    "int8": "int8",
+    "int16": "int16",
+    "int32": "int32",
+    "int64": "int64",
+    "uint8": "uint8",
+    "uint16": "uint16",
+    "uint32": "uint32",
+    "uint64": "uint64",
+    "float32": "float32",
+    "float64": "float64",
+    "bool": "bool",
+    "string": "string",
+    "date": "date32",
+    "datetime": "timestamp[s]",
+}
+
+NULLABLE = re.compile(r"^nullable\s*\((.*)\)$", re.IGNORECASE | re.DOTALL)
+DATETIME64 = re.compile(r"^datetime64\s*(?:\(\s*(\d+)?)?", re.IGNORECASE)
+TIMESTAMP_UNITS = {0: "s", 3: "ms", 6: "us", 9: "ns"}
+
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def export_column(name, column_type):
+    """
+    Map a random stream column to an exported column.
+
+    Returns:
+        dict: {"name", "arrow_type", "expression"} where expression is the
+              select expression producing the column
+    """
+    column_type = column_type.strip()
+    for wrapper in (LOW_CARDINALITY, NULLABLE):
+        inner = wrapper.match(column_type)
+        if inner:
+            column_type = inner.group(1).strip()
+
+    base = canonical_type(column_type.lower())
+    datetime64 = DATETIME64.match(base)
+    if base in ARROW_TYPES:
+        return {"name": name, "arrow_type": ARROW_TYPES[base], "expression": f"`{name}`"}
+    if datetime64:
+        precision = int(datetime64.group(1) or 3)
+        unit = TIMESTAMP_UNITS.get(precision, "us")
+        return {"name": name, "arrow_type": f"timestamp[{unit}]", "expression": f"`{name}`"}
+    if base.startswith("decimal"):
+        return {"name": name, "arrow_type": "float64", "expression": f"cast(`{name}`, 'float64')"}
+    return {"name": name, "arrow_type": "string", "expression": f"to_string(`{name}`)"}
+
+
+def export_columns(random_stream_ddl):
+    return [export_column(name, column_type) for name, column_type, _ in parse_random_stream(random_stream_ddl)["columns"]]
+
+
+class CsvSink:
+    def __init__(self, path, columns):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([column["name"] for column in columns])
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """Writes every batch of rows as one row group"""
+
+    def __init__(self, path, columns, compression="zstd"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([(column["name"], pa.type_for_alias(column["arrow_type"])) for column in columns])
+        self.writer = pq.ParquetWriter(path, self.schema, compression=compression)
+
+    def write(self, rows):
+        # Transpose the row batch into column buffers
+        arrays = [
+            self.pa.array(values, type=field.type) for values, field in zip(zip(*rows), self.schema)
+        ]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema), row_group_size=len(rows))
+
+    def close(self):
+        self.writer.close()
+
+
+def export_rows(timeplus_client, stream_name, columns, rows, path, file_format="parquet", row_group_size=100000,
+                on_progress=None):
+    """
+    Read rows of a random stream through table() and write them to a file.
+
+    table() generates rows as fast as the server can, regardless of the eps
+    setting. Results are iterated block by block and buffered one row group
+    at a time, so memory stays bounded by row_group_size. The file is written
+    under a temporary name and only renamed to path once it is complete.
+
+    Args:
+        timeplus_client: proton_driver client, used exclusively for the export
+        stream_name (str): Random stream to read
+        columns (list): Exported columns from export_columns()
+        rows (int): Number of rows to export
+        path (str): Output file
+        file_format (str): "parquet" or "csv"
+        row_group_size (int): Rows per Parquet row group (and per CSV write)
+        on_progress (callable): Called with the number of rows written after each row group
+
+    Returns:
+        dict: {"rows", "bytes", "seconds"}
+
+    Raises:
+        RuntimeError: If the file could not be written
+    """
+    select_list = ", ".join(column["expression"] for column in columns)
+    query = f"SELECT {select_list} FROM table({stream_name}) LIMIT {int(rows)}"
+    db_logger.debug("Export query: %s", query)
+
+    start_time = time.time()
+    part_path = path + ".part"
+    sink = ParquetSink(part_path, columns) if file_format == "parquet" else CsvSink(part_path, columns)
+    written = 0
+    sink_open = True
+    try:
+        result = timeplus_client.execute_iter(query, settings={"max_block_size": min(row_group_size, 65536)})
+        while True:
+            batch = list(itertools.islice(result, row_group_size))
+            if not batch:
+                break
+            sink.write(batch)
+            written += len(batch)
+            if on_progress:
+                on_progress(written)
+        sink_open = False
+        sink.close()
+        os.replace(part_path, path)
+    except Exception as e:
+        if sink_open:
+            try:
+                sink.close()
+            except Exception as close_error:
+                db_logger.warning("Failed to close export file %s: %s", part_path, close_error)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        db_logger.error(f"Export of {stream_name} failed after {written} rows: {e}")
+        raise RuntimeError(f"Export failed after {written} rows: {e}")
+
+    return {"rows": written, "bytes": os.path.getsize(path), "seconds": round(time.time() - start_time, 3)}
@@ -0,0 +1,202 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from sqlite_pipeline_manager import connect, enable_wal
+
+cache_logger = logging.getLogger("generation_cache")
+
+
+class GenerationCache:
+    """
+    Cache of generated random stream DDLs, keyed on the normalized question and
+    the prompt version.
+
+    Entries live in an in-memory LRU backed by a SQLite table, both with TTL
+    and size eviction. Concurrent lookups for the same key while it is being
+    generated share a single in-flight generation. Memory entries are checked
+    against SQLite again after revalidate_seconds, so entries that another
+    worker invalidated stop being served.
+
+    Each entry is a dict with the generated base name and the DDL, e.g.
+    {"name": "ecommerce_click_events", "ddl": "CREATE RANDOM STREAM ..."}.
+    """
+
+    def __init__(self, db_path="pipelines.db", max_entries=256, max_db_entries=5000, ttl_seconds=7 * 24 * 3600,
+                 revalidate_seconds=30):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_db_entries = max_db_entries
+        self.ttl_seconds = ttl_seconds
+        self.revalidate_seconds = revalidate_seconds
+
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self._init_db()
+        cache_logger.info(f"GenerationCache initialized (memory: {max_entries}, db: {max_db_entries}, ttl: {ttl_seconds}s)")
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def _init_db(self):
+        enable_wal(self.db_path)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS generation_cache (
+                    key TEXT PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    ddl TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_generation_cache_last_used ON generation_cache(last_used_at)")
+
+    @staticmethod
+    def normalize_question(question):
+        """Lowercase, drop punctuation and collapse whitespace"""
+        return " ".join(re.sub(r"[^\w]+", " ", question.lower()).split())
+
+    def make_key(self, question, prompt_version):
+        normalized = self.normalize_question(question)
+        return hashlib.sha256(f"{prompt_version}\n{normalized}".encode()).hexdigest()
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _memory_get(self, key, now):
+        """The in-memory entry if it is fresh; called with the lock held"""
+        cached = self._memory.get(key)
+        if cached is None:
+            return None
+        entry, created_at, checked_at = cached
+        if not self._expired(created_at, now) and now - checked_at < self.revalidate_seconds:
+            self._memory.move_to_end(key)
+            return dict(entry)
+        del self._memory[key]
+        return None
+
+    def get(self, key):
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory_get(key, now)
+        if entry is not None:
+            return entry
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT name, ddl, created_at FROM generation_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                # Gone, possibly invalidated by another worker
+                return None
+            if self._expired(row[2], now):
+                conn.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+                return None
+            conn.execute(
+                "UPDATE generation_cache SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+
+        entry = {"name": row[0], "ddl": row[1]}
+        self._remember(key, entry, row[2])
+        return dict(entry)
+
+    def put(self, key, question, prompt_version, entry):
+        now = time.time()
+        self._remember(key, entry, now)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO generation_cache
+                    (key, question, prompt_version, name, ddl, created_at, last_used_at, hits)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+                """,
+                (key, question, prompt_version, entry["name"], entry["ddl"], now, now),
+            )
+            if self.ttl_seconds > 0:
+                conn.execute("DELETE FROM generation_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                """
+                DELETE FROM generation_cache WHERE key IN (
+                    SELECT key FROM generation_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_db_entries,),
+            )
+
+    def _remember(self, key, entry, created_at):
+        with self._lock:
+            self._memory[key] = (dict(entry), created_at, time.time())
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+        cache_logger.info(f"Invalidated generation cache entry: {key[:12]}")
+
+    def get_or_generate(self, question, prompt_version, generate):
+        """
+        Return the cached entry for a question, or call generate() to produce it.
+
+        Concurrent calls for the same key wait on the first caller's generation
+        instead of starting their own.
+
+        Returns:
+            tuple: (key, entry, cached) where cached is True when no new
+                   generation was needed by this caller
+        """
+        key = self.make_key(question, prompt_version)
+
+        entry = self.get(key)
+        if entry is not None:
+            cache_logger.info(f"Generation cache hit: {key[:12]}")
+            return key, entry, True
+
+        with self._lock:
+            # A leader that finished since get() stored its entry before leaving _inflight
+            entry = self._memory_get(key, time.time())
+            future = self._inflight.get(key)
+            leader = entry is None and future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if entry is not None:
+            cache_logger.info(f"Generation cache hit: {key[:12]}")
+            return key, entry, True
+
+        if not leader:
+            cache_logger.info(f"Waiting for in-flight generation: {key[:12]}")
+            return key, dict(future.result()), True
+
+        cache_logger.info(f"Generation cache miss: {key[:12]}")
+        try:
+            entry = generate()
+            try:
+                self.put(key, question, prompt_version, entry)
+            except Exception as e:
+                # Losing the cache entry must not fail a generation that succeeded
+                cache_logger.warning(f"Failed to store generation cache entry {key[:12]}: {e}")
+            future.set_result(entry)
+            return key, dict(entry), False
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
@@ -0,0 +1,341 @@
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlite_pipeline_manager import connect, enable_wal
+
+job_logger = logging.getLogger("jobs")
+
+# Events after which a job publishes nothing more
+FINAL_EVENTS = ("completed", "failed")
+
+
+class JobStore:
+    """
+    Jobs saved to SQLite, so that every worker sharing the database can report
+    the status and events of a job that another worker runs.
+    """
+
+    def __init__(self, db_path="pipelines.db", max_finished_jobs=500):
+        self.db_path = db_path
+        self.max_finished_jobs = max_finished_jobs
+        self._init_db()
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def _init_db(self):
+        enable_wal(self.db_path)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    job TEXT NOT NULL,
+                    finished_at REAL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs(finished_at)")
+
+    def save(self, job_id, job_json, finished_at):
+        """Save a job serialized with its events"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, job, finished_at, updated_at) VALUES (?, ?, ?, ?)",
+                (job_id, job_json, finished_at, time.time()),
+            )
+            if finished_at is not None:
+                conn.execute(
+                    """
+                    DELETE FROM jobs WHERE finished_at IS NOT NULL AND id NOT IN (
+                        SELECT id FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?
+                    )
+                    """,
+                    (self.max_finished_jobs,),
+                )
+
+    def load(self, job_id):
+        """
+        Returns:
+            dict: The job with its events, or None if there is no such job
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT job FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class JobProgress:
+    """
+    Handed to job functions: progress(stage) starts a new stage and
+    progress.emit(event_type, **data) publishes an event to subscribers.
+    """
+
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+
+    def __call__(self, stage):
+        self.manager._set_stage(self.job_id, stage)
+
+    def emit(self, event_type, **data):
+        self.manager._emit(self.job_id, event_type, data)
+
+
+class NullProgress:
+    """Progress for pipeline work that runs outside of a job"""
+
+    def __call__(self, stage):
+        pass
+
+    def emit(self, event_type, **data):
+        pass
+
+
+class JobManager:
+    """
+    Run long pipeline operations (LLM generation, DDL execution) on a bounded
+    worker pool so that they never block the FastAPI event loop.
+
+    Each job records the stages it goes through, so clients can poll
+    GET /jobs/{id} for stage-by-stage progress. Stage changes and the events
+    a job emits are also kept as an ordered event log that subscribers
+    receive as it grows.
+
+    With a store, jobs are also saved to SQLite: on every stage change and at
+    most every persist_interval seconds for other events. Jobs of other
+    workers are then read from the store, and their subscribers poll it.
+    """
+
+    def __init__(self, max_workers=4, max_finished_jobs=500, store=None, persist_interval=0.2, poll_interval=0.5):
+        self.max_workers = max_workers
+        self.max_finished_jobs = max_finished_jobs
+        self.store = store
+        self.persist_interval = persist_interval
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline-job")
+        self._jobs = {}
+        self._subscribers = {}
+        self._followers = {}
+        self._persisted_at = {}
+        self._lock = threading.Lock()
+        job_logger.info(f"JobManager initialized with {max_workers} workers")
+
+    def submit(self, kind, func, *args, **kwargs):
+        """
+        Queue a job for execution on the worker pool.
+
+        Args:
+            kind (str): Job type, e.g. 'create_pipeline'
+            func (callable): Called as func(progress, *args, **kwargs) with a
+                JobProgress for reporting stages and events
+
+        Returns:
+            str: The job ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "stage": "queued",
+            "stages": [{"name": "queued", "started_at": now, "finished_at": None}],
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "finished_at": None,
+            "events": [{"seq": 0, "type": "stage", "ts": now, "stage": "queued"}],
+        }
+
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+        # Saved before the ID is handed out, so any worker can answer for it right away
+        self._persist(job_id, force=True)
+
+        job_logger.info(f"Queued {kind} job: {job_id}")
+        # Run in a copy of the caller's context so job logs keep the request id
+        context = contextvars.copy_context()
+        self.executor.submit(context.run, self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs):
+        self._set_stage(job_id, "running", status="running")
+
+        try:
+            result = func(JobProgress(self, job_id), *args, **kwargs)
+        except Exception as e:
+            job_logger.error(f"Job {job_id} failed: {e}")
+            self._finish(job_id, "failed", error=str(e))
+        else:
+            job_logger.info(f"Job {job_id} completed")
+            self._finish(job_id, "completed", result=result)
+
+    def _set_stage(self, job_id, stage, status=None):
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            self._close_stage(job, now)
+            job["stages"].append({"name": stage, "started_at": now, "finished_at": None})
+            job["stage"] = stage
+            if status:
+                job["status"] = status
+            self._publish(job, "stage", {"stage": stage})
+        self._persist(job_id, force=True)
+        job_logger.debug(f"Job {job_id} entered stage: {stage}")
+
+    def _finish(self, job_id, status, result=None, error=None):
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            self._close_stage(job, now)
+            job["status"] = status
+            job["stage"] = status
+            job["result"] = result
+            job["error"] = error
+            job["finished_at"] = now
+            self._publish(job, status, {"result": result} if error is None else {"error": error})
+        self._persist(job_id, force=True)
+
+    def _emit(self, job_id, event_type, data):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._publish(job, event_type, data)
+        self._persist(job_id)
+
+    def _persist(self, job_id, force=False):
+        """Save a job to the store; events other than stage changes are saved at most every persist_interval"""
+        if self.store is None:
+            return
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (not force and now - self._persisted_at.get(job_id, 0) < self.persist_interval):
+                return
+            self._persisted_at[job_id] = now
+            job_json = json.dumps(job, default=str)
+            finished_at = job["finished_at"]
+        try:
+            self.store.save(job_id, job_json, finished_at)
+        except Exception as e:
+            job_logger.error(f"Failed to save job {job_id}: {e}")
+
+    def _publish(self, job, event_type, data):
+        """Append an event to the job's log and hand it to subscribers; called with the lock held"""
+        event = {"seq": len(job["events"]), "type": event_type, "ts": time.time(), **data}
+        job["events"].append(event)
+        for loop, queue in self._subscribers.get(job["id"], ()):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's event loop is already closed
+                pass
+
+    @staticmethod
+    def _close_stage(job, now):
+        current = job["stages"][-1]
+        if current["finished_at"] is None:
+            current["finished_at"] = now
+            current["duration"] = round(now - current["started_at"], 3)
+
+    def _prune(self):
+        """Drop the oldest finished jobs once more than max_finished_jobs are kept"""
+        finished = [job for job in self._jobs.values() if job["finished_at"] is not None]
+        if len(finished) <= self.max_finished_jobs:
+            return
+        finished.sort(key=lambda job: job["finished_at"])
+        for job in finished[:len(finished) - self.max_finished_jobs]:
+            del self._jobs[job["id"]]
+            self._subscribers.pop(job["id"], None)
+            self._persisted_at.pop(job["id"], None)
+
+    def get(self, job_id):
+        """
+        Raises:
+            ValueError: If the job does not exist, in this worker or in the store
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                snapshot = {key: value for key, value in job.items() if key != "events"}
+                snapshot["stages"] = [dict(stage) for stage in job["stages"]]
+                return snapshot
+        job = self.store.load(job_id) if self.store is not None else None
+        if job is None:
+            raise ValueError(f"Job with ID {job_id} not found")
+        job.pop("events", None)
+        return job
+
+    async def subscribe(self, job_id):
+        """
+        Subscribe the running event loop to a job's events.
+
+        Returns:
+            tuple: (events so far, asyncio.Queue that receives every later event)
+
+        Raises:
+            ValueError: If the job does not exist
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._subscribers.setdefault(job_id, set()).add((loop, queue))
+                return list(job["events"]), queue
+
+        # A job of another worker: follow it in the store
+        job = await asyncio.to_thread(self.store.load, job_id) if self.store is not None else None
+        if job is None:
+            raise ValueError(f"Job with ID {job_id} not found")
+        events = job["events"]
+        if events[-1]["type"] not in FINAL_EVENTS:
+            self._followers[queue] = asyncio.create_task(self._follow(job_id, queue, len(events)))
+        return events, queue
+
+    async def _follow(self, job_id, queue, next_seq):
+        """Put the events a job of another worker publishes after next_seq into queue"""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                job = await asyncio.to_thread(self.store.load, job_id)
+            except Exception as e:
+                job_logger.warning(f"Failed to poll job {job_id}: {e}")
+                continue
+            if job is None:
+                return
+            for event in job["events"][next_seq:]:
+                queue.put_nowait(event)
+                next_seq = event["seq"] + 1
+                if event["type"] in FINAL_EVENTS:
+                    return
+
+    def unsubscribe(self, job_id, queue):
+        follower = self._followers.pop(queue, None)
+        if follower is not None:
+            follower.cancel()
+        with self._lock:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is None:
+                return
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["finished_at"] is None)
+
+    def shutdown(self, wait=False):
+        job_logger.info("Shutting down JobManager")
+        self.executor.shutdown(wait=wait, cancel_futures=True)
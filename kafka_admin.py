@@ -0,0 +1,180 @@
+import concurrent.futures
+import logging
+import socket
+import threading
+import time
+
+db_logger = logging.getLogger("database")
+
+
+def parse_brokers(brokers):
+    """Split a 'host1:9092,host2:9092' broker list into (host, port) tuples"""
+    addresses = []
+    for broker in brokers.split(","):
+        broker = broker.strip()
+        if not broker:
+            continue
+        host, _, port = broker.rpartition(":")
+        if not host:
+            host, port = port, "9092"
+        addresses.append((host, int(port)))
+    return addresses
+
+
+def broker_reachable(brokers, connect_timeout=1.0):
+    """
+    Check whether at least one broker accepts TCP connections
+
+    Returns:
+        bool: True if a broker of the list is reachable
+    """
+    for host, port in parse_brokers(brokers):
+        try:
+            with socket.create_connection((host, port), timeout=connect_timeout):
+                return True
+        except OSError as e:
+            db_logger.debug(f"Kafka broker {host}:{port} not reachable: {e}")
+    return False
+
+
+def retry_with_backoff(func, description, max_wait=15.0, initial_delay=0.2, max_delay=3.0):
+    """
+    Call func until it succeeds, doubling the delay between attempts.
+
+    Args:
+        func: Callable without arguments
+        description: What is being attempted, for log messages
+        max_wait: Give up once this many seconds have passed
+
+    Returns:
+        The return value of func
+
+    Raises:
+        The last exception raised by func once max_wait is exceeded
+    """
+    deadline = time.time() + max_wait
+    delay = initial_delay
+    attempt = 1
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if time.time() + delay > deadline:
+                db_logger.error(f"{description} failed after {attempt} attempts: {e}")
+                raise
+            db_logger.warning(f"{description} failed (attempt {attempt}), retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+            attempt += 1
+
+
+def wait_for_kafka(brokers, max_wait=15.0, initial_delay=0.2, max_delay=3.0):
+    """
+    Wait until a Kafka broker is reachable, with exponential backoff.
+
+    Returns immediately when the broker is already up, which is the common case.
+
+    Raises:
+        RuntimeError: If no broker became reachable within max_wait seconds
+    """
+    def probe():
+        if not broker_reachable(brokers):
+            raise RuntimeError(f"No Kafka broker reachable at {brokers}")
+
+    retry_with_backoff(probe, "Kafka readiness check", max_wait, initial_delay, max_delay)
+
+
+# Output compression option -> topic compression.type
+TOPIC_COMPRESSION = {"none": "uncompressed", "gzip": "gzip", "snappy": "snappy", "lz4": "lz4", "zstd": "zstd"}
+
+
+def topic_config(compression=None, retention_ms=None):
+    """
+    Topic-level configuration of a pipeline topic.
+
+    Returns:
+        dict: compression.type and retention.ms where set; the broker defaults apply otherwise
+    """
+    config = {}
+    if compression:
+        config["compression.type"] = TOPIC_COMPRESSION[compression]
+    if retention_ms is not None:
+        config["retention.ms"] = str(int(retention_ms))
+    return config
+
+
+class KafkaTopicAdmin:
+    """
+    Creates and deletes pipeline topics through the Kafka admin API, so that
+    topics get an explicit partition count and configuration instead of the
+    broker's auto-create defaults. Needs confluent-kafka.
+    """
+
+    def __init__(self, timeout=15.0):
+        self.timeout = timeout
+        # One client per broker list, shared by the creation and deletion jobs
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, brokers):
+        from confluent_kafka.admin import AdminClient
+
+        with self._lock:
+            client = self._clients.get(brokers)
+            if client is None:
+                client = AdminClient({"bootstrap.servers": brokers, "socket.timeout.ms": int(self.timeout * 1000)})
+                self._clients[brokers] = client
+            return client
+
+    def create_topic(self, brokers, topic, partitions, replication_factor=1, config=None):
+        """
+        Returns:
+            bool: True if the topic was created, False if it already existed
+
+        Raises:
+            RuntimeError: If the topic could not be created
+        """
+        from confluent_kafka import KafkaError, KafkaException
+        from confluent_kafka.admin import NewTopic
+
+        new_topic = NewTopic(
+            topic, num_partitions=partitions, replication_factor=replication_factor, config=config or {}
+        )
+        futures = self._client(brokers).create_topics(
+            [new_topic], operation_timeout=self.timeout, request_timeout=self.timeout
+        )
+        try:
+            futures[topic].result(timeout=self.timeout)
+        except KafkaException as e:
+            if e.args[0].code() == KafkaError.TOPIC_ALREADY_EXISTS:
+                db_logger.warning(f"Kafka topic {topic} already exists, keeping its configuration")
+                return False
+            raise RuntimeError(f"Failed to create Kafka topic {topic}: {e}")
+        except concurrent.futures.TimeoutError:
+            raise RuntimeError(f"Failed to create Kafka topic {topic}: no answer within {self.timeout}s")
+        db_logger.info(f"Created Kafka topic {topic} with {partitions} partitions {config or ''}")
+        return True
+
+    def delete_topic(self, brokers, topic):
+        """
+        Returns:
+            bool: True if the topic was deleted, False if it did not exist
+
+        Raises:
+            RuntimeError: If the topic could not be deleted
+        """
+        from confluent_kafka import KafkaError, KafkaException
+
+        futures = self._client(brokers).delete_topics(
+            [topic], operation_timeout=self.timeout, request_timeout=self.timeout
+        )
+        try:
+            futures[topic].result(timeout=self.timeout)
+        except KafkaException as e:
+            if e.args[0].code() == KafkaError.UNKNOWN_TOPIC_OR_PART:
+                return False
+            raise RuntimeError(f"Failed to delete Kafka topic {topic}: {e}")
+        except concurrent.futures.TimeoutError:
+            raise RuntimeError(f"Failed to delete Kafka topic {topic}: no answer within {self.timeout}s")
+        db_logger.info(f"Deleted Kafka topic {topic}")
+        return True
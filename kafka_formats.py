@@ -0,0 +1,155 @@
+import json
+import logging
+import re
+
+import httpx
+
+from ddl_validator import canonical_type, parse_random_stream
+
+app_logger = logging.getLogger("pipeline_app")
+
+# Output format option -> Timeplus data_format of the Kafka external stream.
+# "json" keeps the original single `value string` column filled by json_encode(*).
+OUTPUT_FORMATS = {
+    "json": None,
+    "avro": "Avro",
+    "protobuf": "ProtobufSingle",
+    "csv": "CSV",
+    "rowbinary": "RowBinary",
+}
+
+# Formats whose schema is created in Timeplus and registered in the schema registry:
+# output format -> (Timeplus FORMAT SCHEMA type, schema registry schemaType)
+SCHEMA_FORMATS = {"avro": ("Avro", "AVRO"), "protobuf": ("Protobuf", "PROTOBUF")}
+
+COMPRESSION_CODECS = ("none", "gzip", "snappy", "lz4", "zstd")
+
+# Timeplus type -> (external stream type, Avro type, Protobuf type); aliases are resolved by canonical_type().
+# uint64 is left out: values above the int64 range would overflow, so it is written as a string.
+SCALAR_TYPES = {
+    "int8": ("int32", "int", "int32"),
+    "int16": ("int32", "int", "int32"),
+    "int32": ("int32", "int", "int32"),
+    "uint8": ("int32", "int", "int32"),
+    "uint16": ("int32", "int", "int32"),
+    "int64": ("int64", "long", "int64"),
+    "uint32": ("int64", "long", "int64"),
+    "float32": ("float32", "float", "float"),
+    "float64": ("float64", "double", "double"),
+    "bool": ("bool", "boolean", "bool"),
+    "string": ("string", "string", "string"),
+}
+
+LOW_CARDINALITY = re.compile(r"^low_cardinality\s*\((.*)\)$", re.IGNORECASE | re.DOTALL)
+
+
+def map_column(name, column_type):
+    """
+    Map a random stream column to an encodable column of the Kafka external stream.
+
+    Types without a direct Avro/Protobuf counterpart (dates, decimals, arrays,
+    enums, ...) are written as strings.
+
+    Returns:
+        dict: {"name", "type", "avro", "proto", "expression"} where expression
+              is the MV select expression producing the column
+    """
+    column_type = column_type.strip()
+    inner = LOW_CARDINALITY.match(column_type)
+    if inner:
+        column_type = inner.group(1).strip()
+
+    base = canonical_type(column_type.lower())
+    if base in SCALAR_TYPES:
+        external, avro, proto = SCALAR_TYPES[base]
+        expression = name if base == external else f"cast({name}, '{external}')"
+    elif base.startswith("decimal"):
+        external, avro, proto = SCALAR_TYPES["float64"]
+        expression = f"cast({name}, 'float64')"
+    else:
+        external, avro, proto = SCALAR_TYPES["string"]
+        expression = f"to_string({name})"
+    return {"name": name, "type": external, "avro": avro, "proto": proto, "expression": expression}
+
+
+def kafka_columns(random_stream_ddl):
+    """Encodable Kafka columns for every column of a random stream DDL"""
+    stream = parse_random_stream(random_stream_ddl)
+    return [map_column(name, column_type) for name, column_type, _ in stream["columns"]]
+
+
+def avro_schema(record_name, columns):
+    return json.dumps({
+        "type": "record",
+        "name": record_name,
+        "fields": [{"name": column["name"], "type": column["avro"]} for column in columns],
+    })
+
+
+def protobuf_message_name(stream_name):
+    return "".join(part.capitalize() for part in stream_name.split("_") if part)
+
+
+def protobuf_schema(message_name, columns):
+    fields = "\n".join(
+        f"  {column['proto']} {column['name']} = {number};" for number, column in enumerate(columns, start=1)
+    )
+    return f'syntax = "proto3";\n\nmessage {message_name} {{\n{fields}\n}}\n'
+
+
+def producer_properties(compression=None, batch_size=None, linger_ms=None):
+    """
+    librdkafka producer properties for the `properties` setting of a Kafka external stream
+
+    Returns:
+        str: 'key=value;key=value', empty if nothing is tuned
+
+    Raises:
+        ValueError: If compression is not one of COMPRESSION_CODECS
+    """
+    if compression and compression not in COMPRESSION_CODECS:
+        raise ValueError(f"Unsupported compression codec '{compression}', expected one of {', '.join(COMPRESSION_CODECS)}")
+    properties = {}
+    if compression:
+        properties["compression.codec"] = compression
+    if batch_size:
+        properties["batch.size"] = batch_size
+    if linger_ms is not None:
+        properties["linger.ms"] = linger_ms
+    return ";".join(f"{key}={value}" for key, value in properties.items())
+
+
+def register_schema(registry_url, subject, schema, schema_type, timeout=10):
+    """
+    Register a schema in a Confluent-compatible schema registry (the bundled Redpanda one)
+
+    Returns:
+        int: The schema ID
+
+    Raises:
+        RuntimeError: If the registry rejects the schema or is unreachable
+    """
+    url = f"{registry_url.rstrip('/')}/subjects/{subject}/versions"
+    payload = {"schema": schema}
+    if schema_type != "AVRO":
+        payload["schemaType"] = schema_type
+    try:
+        response = httpx.post(
+            url, json=payload, headers={"Content-Type": "application/vnd.schemaregistry.v1+json"}, timeout=timeout
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        raise RuntimeError(f"Failed to register schema for subject {subject}: {e}")
+    schema_id = response.json().get("id")
+    app_logger.info(f"Registered {schema_type} schema for subject {subject} with ID {schema_id}")
+    return schema_id
+
+
+def delete_schema_subject(registry_url, subject, timeout=10):
+    """Delete a subject from the schema registry; a missing subject is not an error"""
+    try:
+        response = httpx.delete(f"{registry_url.rstrip('/')}/subjects/{subject}", timeout=timeout)
+        if response.status_code not in (200, 404):
+            response.raise_for_status()
+    except httpx.HTTPError as e:
+        raise RuntimeError(f"Failed to delete schema subject {subject}: {e}")
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import logging
+import time
+
+api_logger = logging.getLogger("api")
+
+
+class LiveStatsSampler:
+    """
+    One shared server-side sampler that pushes pipeline write counts and rates
+    to every subscribed browser.
+
+    The sampler only queries Timeplus while at least one client is subscribed,
+    and all subscribers receive the same sample, so the query load does not
+    grow with the number of open browsers.
+    """
+
+    def __init__(self, fetch_stats, interval_seconds=3.0, queue_size=10):
+        self.fetch_stats = fetch_stats
+        self.interval_seconds = interval_seconds
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._task = None
+        self._latest = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if self._latest is not None:
+            queue.put_nowait(self._latest)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        api_logger.info(f"Live stats subscriber added ({len(self._subscribers)} total)")
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+        api_logger.info(f"Live stats subscriber removed ({len(self._subscribers)} total)")
+
+    async def _run(self):
+        while self._subscribers:
+            try:
+                stats = await asyncio.to_thread(self.fetch_stats)
+                self._latest = {"timestamp": time.time(), "pipelines": stats}
+                self._broadcast(self._latest)
+            except Exception as e:
+                api_logger.error(f"Live stats sampling failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+        api_logger.info("Live stats sampler stopped, no subscribers left")
+
+    def _broadcast(self, sample):
+        for queue in list(self._subscribers):
+            if queue.full():
+                # Drop the oldest sample for slow clients rather than blocking everyone
+                queue.get_nowait()
+            queue.put_nowait(sample)
+
+    async def stream(self, request):
+        """Server-sent events generator for a StreamingResponse"""
+        queue = self.subscribe()
+        try:
+            while not await request.is_disconnected():
+                try:
+                    sample = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(sample)}\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+    async def stop(self):
+        self._subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
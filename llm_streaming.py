@@ -0,0 +1,124 @@
+import re
+import time
+
+# agno RunEvent values; compared as strings so agno is not imported here
+CONTENT_EVENT = "RunResponseContent"
+ERROR_EVENT = "RunError"
+
+OPEN_FENCE = re.compile(r"```(\w+)?\n")
+FENCE = "```"
+
+
+class CodeBlockStream:
+    """
+    Find the first fenced code block of a markdown response while it streams.
+
+    feed() takes response deltas as they arrive and returns the part of the
+    code block that became known. Once the closing fence has arrived, done is
+    set and code holds the block, stripped like extract_code_blocks_with_type().
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.code_type = None
+        self.code = None
+        self.done = False
+        self._code_start = None
+        self._emitted = 0
+
+    def feed(self, delta):
+        """
+        Returns:
+            str: New code block text; backticks that may start the closing
+                 fence are held back until the next delta
+        """
+        if self.done:
+            return ""
+        scanned = len(self.text)
+        self.text += delta
+
+        if self._code_start is None:
+            match = OPEN_FENCE.search(self.text)
+            if not match:
+                return ""
+            self.code_type = match.group(1) or ""
+            self._code_start = self._emitted = match.end()
+            scanned = self._code_start
+
+        # A fence split across deltas starts at most two characters before the new text
+        close = self.text.find(FENCE, max(self._code_start, scanned - len(FENCE) + 1))
+        if close != -1:
+            self.done = True
+            self.code = self.text[self._code_start:close].strip()
+            return self._emit(close)
+
+        end = len(self.text)
+        while end > self._emitted and self.text[end - 1] == "`":
+            end -= 1
+        return self._emit(end)
+
+    def _emit(self, end):
+        new_text = self.text[self._emitted:end]
+        self._emitted = max(self._emitted, end)
+        return new_text
+
+
+def stream_code_block(agent, prompt, on_delta=None, flush_interval=0.1, on_code=None):
+    """
+    Run an agent in streaming mode and hand off the first code block as soon as it is complete.
+
+    At the closing fence, the remaining code block text is flushed and
+    on_code is called, so the caller can act on the code without waiting for
+    any text the model writes after it. The rest of the response is then
+    read to its end, because agno only fills run_response.metrics (token
+    usage, sent in the final chunk) once the model stream is finished.
+
+    Args:
+        agent: agno Agent
+        prompt (str): User message
+        on_delta (callable): Called with new code block text, batched to at
+            most one call per flush_interval seconds
+        flush_interval (float): Seconds between on_delta calls
+        on_code (callable): Called with the CodeBlockStream once its block is complete
+
+    Returns:
+        tuple: (CodeBlockStream, seconds until the first content delta or None)
+
+    Raises:
+        RuntimeError: If the agent reports an error event before the code block is complete
+    """
+    block = CodeBlockStream()
+    start_time = time.time()
+    first_delta_seconds = None
+    pending = ""
+    last_flush = start_time
+
+    events = agent.run(prompt, stream=True)
+    try:
+        for event in events:
+            event_type = getattr(event, "event", None)
+            if event_type == ERROR_EVENT:
+                if block.done:
+                    # The code block is complete; only the usage of the run is lost
+                    break
+                raise RuntimeError(event.content or "agent run failed")
+            if block.done or event_type != CONTENT_EVENT or not isinstance(event.content, str):
+                continue
+            if first_delta_seconds is None:
+                first_delta_seconds = time.time() - start_time
+
+            pending += block.feed(event.content)
+            if on_delta and pending and (block.done or time.time() - last_flush >= flush_interval):
+                on_delta(pending)
+                pending, last_flush = "", time.time()
+            if block.done and on_code:
+                on_code(block)
+    finally:
+        # Release the streamed HTTP response right away instead of when the generator is collected
+        close = getattr(events, "close", None)
+        if close:
+            close()
+
+    if on_delta and pending:
+        on_delta(pending)
+    return block, first_delta_seconds
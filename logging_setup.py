@@ -0,0 +1,115 @@
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Set per HTTP request by the logging middleware; copied into job threads
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+# Sampling keys for high-frequency lines; pass extra={"sample_key": key} to a log call
+DEFAULT_SAMPLE_RATES = {"poll": 0.05}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the request id of the context they were logged in"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the records tagged with a sample_key.
+
+    Warnings and errors are never dropped, and untagged records always pass.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        key = getattr(record, "sample_key", None)
+        if key is None or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.rates.get(key, 1.0)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the request id and any exception"""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues records unformatted.
+
+    The stock prepare() merges the arguments into the message and renders the
+    traceback in the logging thread; the queue here never leaves the process,
+    so that work is left to the listener's handlers instead.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def parse_sample_rates(spec):
+    """Parse 'poll=0.05,other=0.5' on top of the default rates"""
+    rates = dict(DEFAULT_SAMPLE_RATES)
+    for item in (spec or "").split(","):
+        if "=" in item:
+            key, _, rate = item.partition("=")
+            rates[key.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(level="INFO", log_file="pipeline_app.log", file_format="json", sample_rates=None):
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Log calls only filter and enqueue the record; message and exception
+    formatting and file/console I/O happen on the listener thread, off the
+    event loop. Arguments are therefore formatted after the call returns, so
+    log calls must not pass objects that are mutated right afterwards.
+
+    Returns:
+        QueueListener: The started listener; it is stopped at exit
+    """
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(JsonFormatter() if file_format == "json" else logging.Formatter(TEXT_FORMAT))
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(SamplingFilter(sample_rates or DEFAULT_SAMPLE_RATES))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -1,32 +1,63 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse
+# Imported first so that cold start is timed from the top of main.py
+from startup import StartupState
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+import asyncio
 import json
+import functools
+import math
+import hashlib
 import os
+import queue
+import random
 import re
 import uuid
 import logging
 import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
 from textwrap import dedent
 
-import faker
+import httpx
 
-from agno.agent import Agent
-from agno.models.openai import OpenAIChat
-from proton_driver import client
+from fastapi.concurrency import run_in_threadpool
 from sqlite_pipeline_manager import SQLitePipelineManager
+from sharding import (
+    budget_rates, ddl_eps, pipeline_eps, pipeline_shards, set_eps, shard_count, shard_ddl, shard_stream_name, split_eps,
+)
+from timeplus_pool import TimeplusConnectionPool
+from write_counter import WriteCountTracker
+from live_stats import LiveStatsSampler
+from preview import PreviewManager
+from process_lock import ProcessLock
+from ddl_validator import DDLValidator, parse_random_stream
+from job_manager import FINAL_EVENTS, JobManager, JobStore, NullProgress
+from llm_streaming import stream_code_block
+from generation_cache import GenerationCache
+from prompt_index import PromptIndex
+from backfill import BackfillError, run_backfill
+from exporter import EXPORT_FORMATS, export_columns, export_rows, parquet_available
+from kafka_admin import KafkaTopicAdmin, retry_with_backoff, topic_config, wait_for_kafka
+from logging_setup import parse_sample_rates, request_id_var, setup_logging
+from metrics import (
+    HTTP_REQUEST_LATENCY, TIMEPLUS_DDL_LATENCY, record_first_token, record_generation_failure, record_llm_call,
+    record_prompt_selection, render_metrics, timed, update_pipeline_gauges,
+)
+from kafka_formats import (
+    OUTPUT_FORMATS, SCHEMA_FORMATS, avro_schema, delete_schema_subject, kafka_columns, producer_properties,
+    protobuf_message_name, protobuf_schema, register_schema,
+)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('pipeline_app.log'),
-        logging.StreamHandler()  # Console output
-    ]
+# Configure logging: log calls only enqueue records, a background thread writes them
+log_listener = setup_logging(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    log_file="pipeline_app.log",
+    file_format=os.getenv("LOG_FORMAT", "json"),
+    sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES")),
 )
 
 # Create specific loggers
@@ -39,63 +70,113 @@ timeplus_host = os.getenv("TIMEPLUS_HOST") or "localhost"
 timeplus_user = os.getenv("TIMEPLUS_USER") or "proton"
 timeplus_password = os.getenv("TIMEPLUS_PASSWORD") or "timeplus@t+"
 timeplus_port = int(os.getenv("TIMEPLUS_PORT", "8463"))
+kafka_brokers = os.getenv("KAFKA_BROKERS", "localhost:9092")
+schema_registry_url = os.getenv("SCHEMA_REGISTRY_URL", "http://localhost:8081")
+# Topics are created with these unless the pipeline's output sets them; no retention means the broker default
+kafka_topic_partitions = int(os.getenv("KAFKA_TOPIC_PARTITIONS", "3"))
+kafka_topic_replication = int(os.getenv("KAFKA_TOPIC_REPLICATION", "1"))
+kafka_topic_retention_ms = int(os.getenv("KAFKA_TOPIC_RETENTION_MS")) if os.getenv("KAFKA_TOPIC_RETENTION_MS") else None
 
-def wait_for_timeplus_connection(max_retries=30, retry_delay=2):
+async def wait_for_timeplus_connection(pool, retry_delay=2):
     """
-    Wait for Timeplus server to be available by pinging it with 'SELECT 1'
+    Ping Timeplus with 'SELECT 1' until it responds, then mark it ready
+    
+    Runs in the background during startup, so the API already answers
+    health checks while Timeplus is still coming up.
     
     Args:
-        max_retries (int): Maximum number of connection attempts
-        retry_delay (int): Delay between retries in seconds
-        
-    Returns:
-        client.Client: Connected client instance
-        
-    Raises:
-        RuntimeError: If connection fails after max_retries
+        pool (TimeplusConnectionPool): Pool whose connection is tested
+        retry_delay (int): Delay between attempts in seconds
     """
     
-    db_logger.info(f"Waiting for Timeplus server at {timeplus_user}@{timeplus_host}:{timeplus_port}")
-    db_logger.info(f"Will attempt connection up to {max_retries} times with {retry_delay}s delay between attempts")
+    db_logger.info("Waiting for Timeplus server at %s@%s:%s", timeplus_user, timeplus_host, timeplus_port)
     
-    for attempt in range(1, max_retries + 1):
+    attempt = 0
+    while True:
+        attempt += 1
         try:
-            db_logger.info(f"Connection attempt {attempt}/{max_retries}")
-            
-            # Create client connection
-            timeplus_client = client.Client(
-                host=timeplus_host,
-                user=timeplus_user,
-                password=timeplus_password,
-                port=timeplus_port,
-            )
-            
-            # Test connection with a simple query
-            db_logger.debug("Testing connection with 'SELECT 1'")
-            result = timeplus_client.execute("SELECT 1")
-            
-            if result and result[0][0] == 1:
+            if await asyncio.to_thread(pool.ping):
+                startup_state.mark_ready("timeplus")
                 db_logger.info("✅ Timeplus server is ready and responding correctly")
-                return timeplus_client
-            else:
-                db_logger.warning(f"Unexpected response from Timeplus: {result}")
-                
+                return
+            error = "unexpected response to SELECT 1"
         except Exception as e:
-            db_logger.warning(f"Connection attempt {attempt} failed: {e}")
-            
-            if attempt < max_retries:
-                db_logger.info(f"Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-            else:
-                db_logger.error(f"Failed to connect to Timeplus after {max_retries} attempts")
-                raise RuntimeError(f"Could not connect to Timeplus server after {max_retries} attempts. Last error: {e}")
-    
-    # This should never be reached, but just in case
-    raise RuntimeError("Unexpected end of connection attempts")
+            error = str(e)
+        
+        startup_state.mark_pending("timeplus", error)
+        db_logger.warning("Connection attempt %s failed: %s, retrying in %s seconds", attempt, error, retry_delay)
+        await asyncio.sleep(retry_delay)
 
 # Pydantic models for request/response
+class PipelineOutput(BaseModel):
+    format: Literal["json", "avro", "protobuf", "csv", "rowbinary"] = "json"
+    compression: Optional[Literal["none", "gzip", "snappy", "lz4", "zstd"]] = None
+    batch_size: Optional[int] = Field(None, gt=0)
+    linger_ms: Optional[int] = Field(None, ge=0)
+    partitions: Optional[int] = Field(None, gt=0, le=1000)
+    retention_ms: Optional[int] = Field(None, ge=-1)
+    # Column whose value is the message key, so events spread over partitions by it
+    key_column: Optional[str] = None
+
+MAX_SHARD_EPS = int(os.getenv("SHARD_MAX_EPS", "50000"))
+MAX_TARGET_EPS = MAX_SHARD_EPS * int(os.getenv("MAX_SHARDS", "32"))
+
 class PipelineCreate(BaseModel):
     question: str
+    use_cache: bool = True
+    output: PipelineOutput = PipelineOutput()
+    target_eps: Optional[int] = Field(None, gt=0, le=MAX_TARGET_EPS)
+
+class PipelineRate(BaseModel):
+    target_eps: int = Field(..., gt=0, le=MAX_TARGET_EPS)
+
+MAX_EXPORT_ROWS = int(os.getenv("EXPORT_MAX_ROWS", "100000000"))
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+
+class PipelineExport(BaseModel):
+    rows: Optional[int] = Field(None, gt=0, le=MAX_EXPORT_ROWS)
+    # Alternatively export the rows the pipeline generates in this many seconds at its eps
+    duration_seconds: Optional[float] = Field(None, gt=0)
+    format: Literal["parquet", "csv"] = "parquet"
+    row_group_size: int = Field(100000, gt=0, le=1000000)
+
+MAX_BACKFILL_ROWS = int(os.getenv("BACKFILL_MAX_ROWS", "1000000000"))
+
+class PipelineBackfill(BaseModel):
+    start_time: datetime
+    # Defaults to now
+    end_time: Optional[datetime] = None
+    # Defaults to the rows the pipeline generates over the time range at its eps
+    rows: Optional[int] = Field(None, gt=0, le=MAX_BACKFILL_ROWS)
+    chunk_rows: int = Field(1000000, gt=0, le=10000000)
+    # Resume the pipeline once the backfill has finished
+    live: bool = False
+
+MAX_PREVIEW_ROWS = int(os.getenv("PREVIEW_MAX_ROWS", "1000"))
+
+class PreviewCreate(BaseModel):
+    # Either a DDL to preview or a question to generate one for
+    ddl: Optional[str] = None
+    question: Optional[str] = None
+    use_cache: bool = True
+    rows: int = Field(100, gt=0, le=MAX_PREVIEW_ROWS)
+    timeout_seconds: float = Field(1.0, gt=0, le=10)
+    # Keep the temporary stream for further samples instead of dropping it
+    keep: bool = False
+
+class PreviewSample(BaseModel):
+    rows: int = Field(100, gt=0, le=MAX_PREVIEW_ROWS)
+    timeout_seconds: float = Field(1.0, gt=0, le=10)
+
+MAX_BATCH_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+class PipelineBatchCreate(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=int(os.getenv("BATCH_MAX_SIZE", "100")))
+    llm_concurrency: int = Field(4, ge=1, le=MAX_BATCH_CONCURRENCY)
+    timeplus_concurrency: int = Field(4, ge=1, le=MAX_BATCH_CONCURRENCY)
+    use_cache: bool = True
+    output: PipelineOutput = PipelineOutput()
+    target_eps: Optional[int] = Field(None, gt=0, le=MAX_TARGET_EPS)
 
 class PipelineResponse(BaseModel):
     id: str
@@ -118,10 +199,10 @@ def extract_code_blocks_with_type(markdown_text):
         list: A list of tuples, each containing (code_type, code_content).
               If no type is specified, code_type will be an empty string.
     """
-    app_logger.debug(f"Extracting code blocks from markdown text (length: {len(markdown_text)})")
+    app_logger.debug("Extracting code blocks from markdown text (length: %s)", len(markdown_text))
     pattern = r"```(\w+)?\n(.*?)```"
     matches = re.findall(pattern, markdown_text, re.DOTALL)
-    app_logger.debug(f"Found {len(matches)} code blocks")
+    app_logger.debug("Found %s code blocks", len(matches))
     
     result = [
         (code_type if code_type else "", code_content.strip())
@@ -129,161 +210,446 @@ def extract_code_blocks_with_type(markdown_text):
     ]
     
     for i, (code_type, code_content) in enumerate(result):
-        app_logger.debug(f"Code block {i}: type='{code_type}', length={len(code_content)}")
+        app_logger.debug("Code block %s: type='%s', length=%s", i, code_type, len(code_content))
     
     return result
 
-def generate_to_kafka_pipeline(input_stream, kafka_settings):
-    app_logger.info(f"Generating Kafka pipeline for stream: {input_stream}")
-    app_logger.debug(f"Kafka settings: {kafka_settings}")
+def generate_to_kafka_pipeline(input_stream, kafka_settings, output_format="json", columns=None, key_column=None):
+    """
+    Build the Kafka external stream and the MV writing the random stream into it.
+
+    Args:
+        input_stream (str): Name of the random stream
+        kafka_settings (dict): SETTINGS of the external stream
+        output_format (str): One of OUTPUT_FORMATS; "json" writes one JSON string per event
+        columns (list): Kafka columns from kafka_columns(), required for every format but "json"
+        key_column (str): Column of the random stream written as the message key; unkeyed if None
+    """
+    app_logger.info("Generating Kafka pipeline for stream: %s (format: %s)", input_stream, output_format)
+    app_logger.debug("Kafka settings: %s", kafka_settings)
     
     kafka_external_stream_name = "kafka_external_" + input_stream
+    kafka_settings = dict(kafka_settings)
+    pipeline = {}
+    
+    if output_format == "json":
+        stream_columns = "value string"
+        select_list = "json_encode(*) as value"
+    else:
+        stream_columns = ", ".join(f"{column['name']} {column['type']}" for column in columns)
+        select_list = ", ".join(
+            column["name"] if column["expression"] == column["name"] else f"{column['expression']} as {column['name']}"
+            for column in columns
+        )
+        kafka_settings["data_format"] = OUTPUT_FORMATS[output_format]
+        kafka_settings["one_message_per_row"] = "true"
+    
+    if key_column:
+        # Timeplus writes the _tp_message_key column as the key instead of encoding it into the value
+        stream_columns += ", _tp_message_key string"
+        select_list += f", to_string(`{key_column}`) as _tp_message_key"
+    
+    if output_format in SCHEMA_FORMATS:
+        schema_type, registry_schema_type = SCHEMA_FORMATS[output_format]
+        schema_name = "schema_" + input_stream
+        if output_format == "avro":
+            schema = avro_schema(input_stream, columns)
+            kafka_settings["format_schema"] = schema_name
+        else:
+            message_name = protobuf_message_name(input_stream)
+            schema = protobuf_schema(message_name, columns)
+            kafka_settings["format_schema"] = f"{schema_name}:{message_name}"
+        escaped_schema = schema.replace("\\", "\\\\").replace("'", "\\'")
+        pipeline["format_schema"] = {
+            "name": schema_name,
+            "ddl": f"CREATE OR REPLACE FORMAT SCHEMA {schema_name} AS '{escaped_schema}' TYPE {schema_type}",
+            "schema": schema,
+            "schema_type": registry_schema_type,
+            "subject": kafka_settings["topic"] + "-value"
+        }
+    
     kafka_external_stream_ddl = f"""
-    CREATE EXTERNAL STREAM {kafka_external_stream_name} (value string)
+    CREATE EXTERNAL STREAM {kafka_external_stream_name} ({stream_columns})
     SETTINGS { ','.join([f'{key} = \'{value}\'' for key, value in kafka_settings.items()]) }
     """
 
-    write_to_kafka_mv_name = "mv_" + kafka_external_stream_name
+    pipeline["kafka_external_stream"] = {
+        "name": kafka_external_stream_name,
+        "ddl": kafka_external_stream_ddl,
+        "brokers": kafka_settings["brokers"],
+        "topic": kafka_settings["topic"],
+        "format": output_format,
+        "key_column": key_column,
+        "select": select_list
+    }
+    pipeline["write_to_kafka_mv"] = generate_write_to_kafka_mv(input_stream, kafka_external_stream_name, select_list)
+    
+    app_logger.info("Generated Kafka pipeline components:")
+    app_logger.info("  - External stream: %s", kafka_external_stream_name)
+    app_logger.info("  - Materialized view: %s", pipeline['write_to_kafka_mv']['name'])
+    
+    return pipeline
+
+def generate_write_to_kafka_mv(input_stream, kafka_external_stream_name, select_list="json_encode(*) as value"):
+    """The materialized view writing one random stream into the Kafka external stream"""
+    write_to_kafka_mv_name = "mv_kafka_external_" + input_stream
     write_to_kafka_mv_ddl = f"""
     CREATE MATERIALIZED VIEW {write_to_kafka_mv_name} 
         INTO {kafka_external_stream_name}
     AS
-        SELECT json_encode(*) as value
+        SELECT {select_list}
         FROM {input_stream}
     """
-    
-    pipeline = {}
-    pipeline["kafka_external_stream"] = {
-        "name": kafka_external_stream_name,
-        "ddl": kafka_external_stream_ddl
-    }
-    pipeline["write_to_kafka_mv"] = {
+    return {
         "name": write_to_kafka_mv_name,
         "ddl": write_to_kafka_mv_ddl
     }
-    
-    app_logger.info(f"Generated Kafka pipeline components:")
-    app_logger.info(f"  - External stream: {kafka_external_stream_name}")
-    app_logger.info(f"  - Materialized view: {write_to_kafka_mv_name}")
-    
-    return pipeline
 
-class RandomNameGenerator:
-    def __init__(self):
-        self.instruction = "use no more than three words to summarize the input description, return snake case result such as word1_word2_word3 as result"
-        # Initialize AI agent
+def generate_shard(pipeline, shard_id, eps):
+    """
+    One shard of a sharded pipeline: a random stream derived from the generated
+    DDL plus the MV writing it into the pipeline's external stream.
+    """
+    shard_name = shard_stream_name(pipeline["random_stream"]["name"], shard_id)
+    kafka_stream = pipeline["kafka_external_stream"]
+    return {
+        "shard_id": shard_id,
+        "eps": eps,
+        "random_stream": {
+            "name": shard_name,
+            "ddl": shard_ddl(pipeline["random_stream"]["ddl"], shard_name, shard_id, eps)
+        },
+        "write_to_kafka_mv": generate_write_to_kafka_mv(
+            shard_name, kafka_stream["name"], kafka_stream.get("select", "json_encode(*) as value")
+        )
+    }
+
+NAME_INSTRUCTION = "use no more than three words to summarize the input description, return snake case result such as word1_word2_word3 as result"
+
+COMBINED_INSTRUCTION = """
+## Response Format
+Return a JSON object with two fields:
+- name: no more than three words summarizing the input description, in snake case such as word1_word2_word3
+- ddl: the random stream DDL, using the name above as the stream name
+"""
+
+RANDOM_STREAM_NAME_PATTERN = re.compile(
+    r"(CREATE\s+RANDOM\s+STREAM\s+(?:IF\s+NOT\s+EXISTS\s+)?)(`?)[\w.]+\2",
+    re.IGNORECASE,
+)
+
+@functools.lru_cache(maxsize=None)
+def load_prompt(path='./prompt/prompt.txt'):
+    """Load the generation prompt once; later calls are served from memory"""
+    try:
+        with open(path, 'r') as f:
+            prompt = f.read()
+        ai_logger.info("Loaded prompt file %s (length: %s)", path, len(prompt))
+        return prompt
+    except Exception as e:
+        ai_logger.error("Failed to load prompt file: %s", e)
+        raise
+
+def prompt_version(path='./prompt/prompt.txt'):
+    """Short content hash of the prompt, used to tell prompt revisions apart"""
+    return hashlib.sha256(load_prompt(path).encode()).hexdigest()[:12]
+
+def select_prompt_context(prompt_index, question):
+    """
+    Retrieve the prompt reference sections and examples for a question.
+
+    Returns:
+        str: Context to send ahead of the question, possibly empty
+    """
+    start_time = time.perf_counter()
+    selection = prompt_index.select(question)
+    record_prompt_selection(selection["full_tokens"], selection["prompt_tokens"])
+    ai_logger.info(
+        "Prompt retrieval in %.1f ms: ~%d instead of ~%d prompt tokens (%.0f%% less), sections %s, examples %s",
+        (time.perf_counter() - start_time) * 1000, selection["prompt_tokens"], selection["full_tokens"],
+        100 * (1 - selection["prompt_tokens"] / selection["full_tokens"]), selection["sections"], selection["examples"],
+    )
+    return selection["context"]
+
+def with_context(context, prompt):
+    return f"{context}\n\n{prompt}" if context else prompt
+
+def rename_random_stream(ddl, name):
+    """Rewrite the stream name of a CREATE RANDOM STREAM statement"""
+    renamed, count = RANDOM_STREAM_NAME_PATTERN.subn(lambda m: m.group(1) + name, ddl, count=1)
+    if not count:
+        raise RuntimeError("DDL does not contain a CREATE RANDOM STREAM statement")
+    return renamed
+
+def to_snake_case(text):
+    return re.sub(r"[^a-z0-9]+", "_", text.strip().lower()).strip("_")
+
+class GeneratedPipeline(BaseModel):
+    name: str
+    ddl: str
+
+class AgentPool:
+    """
+    A fixed set of preloaded AI agents sharing one HTTP client.
+
+    agno agents keep per-run state, so an agent is checked out by one worker
+    at a time instead of being shared concurrently.
+    """
+
+    def __init__(self, instructions, size, http_client, response_model=None):
+        # agno and openai take seconds to import, so they are loaded with the first pool
+        from agno.agent import Agent
+        from agno.models.openai import OpenAIChat
+        
         model_id = os.getenv("OPENAI_MODEL", "gpt-4o")
         api_key = os.getenv("OPENAI_API_KEY")
         base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
         
+        ai_logger.info("Initializing %s OpenAI agents with model: %s", size, model_id)
+        ai_logger.debug("Base URL: %s", base_url)
+        ai_logger.debug("API key configured: %s", 'Yes' if api_key else 'No')
+        
+        self._agents = queue.Queue()
         try:
-            self.agent = Agent(
-                model=OpenAIChat(id=model_id, api_key=api_key, base_url=base_url),
-                instructions=dedent(self.instruction),
-                markdown=False,
-            )
-            ai_logger.info("AI agent initialized successfully")
+            for _ in range(size):
+                self._agents.put(Agent(
+                    model=OpenAIChat(id=model_id, api_key=api_key, base_url=base_url, http_client=http_client),
+                    instructions=dedent(instructions),
+                    response_model=response_model,
+                    markdown=False,
+                ))
+            ai_logger.info("AI agents initialized successfully")
         except Exception as e:
-            ai_logger.error(f"Failed to initialize AI agent for name generation: {e}")
+            ai_logger.error("Failed to initialize AI agents: %s", e)
             raise
+
+    @contextmanager
+    def agent(self):
+        agent = self._agents.get()
+        try:
+            yield agent
+        finally:
+            self._agents.put(agent)
+
+class LLMAgents:
+    """
+    Agent pools for name, DDL and combined generation, created once at startup.
+
+    With a prompt index, the DDL agents are instructed with the core of the
+    prompt only; the rest is retrieved per question.
+    """
+
+    def __init__(self, size, prompt_index=None):
+        self.http_client = httpx.Client(
+            timeout=float(os.getenv("OPENAI_TIMEOUT", "120")),
+            limits=httpx.Limits(max_connections=size * 2, max_keepalive_connections=size * 2),
+        )
+        self.combined_generation = os.getenv("COMBINED_GENERATION", "false").lower() == "true"
+        self.prompt_index = prompt_index
+        prompt = prompt_index.core_prompt if prompt_index else load_prompt()
+        
+        self.name = AgentPool(NAME_INSTRUCTION, size, self.http_client)
+        self.ddl = AgentPool(prompt, size, self.http_client)
+        self.combined = None
+        if self.combined_generation:
+            self.combined = AgentPool(prompt + COMBINED_INSTRUCTION, size, self.http_client,
+                                      response_model=GeneratedPipeline)
+        ai_logger.info(
+            "LLM agents ready (combined generation: %s, prompt retrieval: %s)",
+            self.combined_generation, prompt_index is not None
+        )
+
+    def close(self):
+        self.http_client.close()
+
+class RandomNameGenerator:
+    def __init__(self, agents):
+        self.instruction = NAME_INSTRUCTION
+        self.agents = agents
     
     def get_name(self, description):
         try:
             ai_logger.info("Calling AI agent to generate name")
-            result = self.agent.run(description, stream=False)
+            start_time = time.time()
+            with self.agents.agent() as agent:
+                result = agent.run(description, stream=False)
+            record_llm_call("name", time.time() - start_time, result)
             return result.content.strip()
         except Exception as e:
-            ai_logger.error(f"AI generation name failed: {e}")
+            ai_logger.error("AI generation name failed: %s", e)
+            record_generation_failure("llm_error")
             raise RuntimeError(f"Failed to generate name with AI: {e}")
 
 class SyntheticDataGenerator:
-    def __init__(self, name, question):
-        ai_logger.info(f"Initializing SyntheticDataGenerator with name='{name}', question='{question}'")
-        
-        try:
-            with open('./prompt/prompt.txt', 'r') as f:
-                prompt = f.read()
-            ai_logger.debug(f"Loaded prompt file (length: {len(prompt)})")
-        except Exception as e:
-            ai_logger.error(f"Failed to load prompt file: {e}")
-            raise
-            
-        self.prompt = prompt
-        
-        # Initialize AI agent
-        model_id = os.getenv("OPENAI_MODEL", "gpt-4o")
-        api_key = os.getenv("OPENAI_API_KEY")
-        base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
-        
-        ai_logger.info(f"Initializing OpenAI agent with model: {model_id}")
-        ai_logger.debug(f"Base URL: {base_url}")
-        ai_logger.debug(f"API key configured: {'Yes' if api_key else 'No'}")
+    def __init__(self, name, question, agents, output=None, target_eps=None, prompt_index=None):
+        ai_logger.info("Initializing SyntheticDataGenerator with name='%s', question='%s'", name, question)
         
-        try:
-            self.agent = Agent(
-                model=OpenAIChat(id=model_id, api_key=api_key, base_url=base_url),
-                instructions=dedent(self.prompt),
-                markdown=False,
-            )
-            ai_logger.info("AI agent initialized successfully")
-        except Exception as e:
-            ai_logger.error(f"Failed to initialize AI agent: {e}")
-            raise
+        self.prompt = load_prompt()
+        self.agents = agents
+        self.prompt_index = prompt_index
+        self._context = None
         
         self.name = name
+        self.output = output or PipelineOutput()
+        self.target_eps = target_eps
         self.kafka_settings = {
             "type": "kafka",
-            "brokers": os.getenv("KAFKA_BROKERS", "localhost:9092"),
+            "brokers": kafka_brokers,
             "topic": self.name + "_topic"
         }
+        properties = producer_properties(self.output.compression, self.output.batch_size, self.output.linger_ms)
+        if properties:
+            self.kafka_settings["properties"] = properties
+        retention_ms = self.output.retention_ms if self.output.retention_ms is not None else kafka_topic_retention_ms
+        self.kafka_topic = {
+            "name": self.kafka_settings["topic"],
+            "partitions": self.output.partitions or kafka_topic_partitions,
+            "replication_factor": kafka_topic_replication,
+            "config": topic_config(self.output.compression, retention_ms),
+        }
         self.question = question
         self.user_prompt = f"{question}, ONLY return the random stream DDL, and the stream name is {self.name}"
         
-        ai_logger.debug(f"Kafka settings: {self.kafka_settings}")
-        ai_logger.debug(f"User prompt: {self.user_prompt}")
+        ai_logger.debug("Kafka settings: %s", self.kafka_settings)
+        ai_logger.debug("User prompt: %s", self.user_prompt)
 
-    def generate_pipeline(self):
-        ai_logger.info(f"Starting pipeline generation for '{self.name}'")
+    @property
+    def context(self):
+        """Retrieved prompt context for the question, selected once and reused for repairs"""
+        if self.prompt_index is None:
+            return ""
+        if self._context is None:
+            self._context = select_prompt_context(self.prompt_index, self.question)
+        return self._context
+
+    def _run_agent(self, prompt, stage="ddl", progress=None):
+        """
+        Stream the agent's response and return the DDL of its first code block.
+
+        With a job progress, the DDL is published while it is written as
+        ddl_started, ddl_delta and ddl_generated events; ddl_generated is sent
+        as soon as the code block closes, before the rest of the response and
+        its token usage have arrived.
+        """
         start_time = time.time()
+        prompt_label = "full" if self.prompt_index is None else "retrieved"
+        
+        def on_delta(text):
+            progress.emit("ddl_delta", text=text)
+        
+        def on_code(block):
+            # Shown while the rest of the response, with the token usage, is still read
+            if block.code:
+                progress.emit("ddl_generated", stage=stage, ddl=block.code)
+        
+        if progress is not None:
+            progress.emit("ddl_started", stage=stage)
         
         try:
             ai_logger.info("Calling AI agent to generate DDL...")
-            result = self.agent.run(self.user_prompt, stream=False)
+            with self.agents.agent() as agent:
+                block, first_delta_seconds = stream_code_block(
+                    agent, prompt,
+                    on_delta if progress is not None else None,
+                    on_code=on_code if progress is not None else None,
+                )
+                result = agent.run_response
             
             generation_time = time.time() - start_time
-            ai_logger.info(f"AI generation completed in {generation_time:.2f} seconds")
-            ai_logger.debug(f"AI response length: {len(result.content)}")
-            ai_logger.debug(f"AI response content preview: {result.content[:200]}...")
+            record_llm_call(stage, generation_time, result, prompt_label)
+            if first_delta_seconds is not None:
+                record_first_token(stage, first_delta_seconds, prompt_label)
+                ai_logger.info("AI generation completed in %.2f seconds (first token after %.2f seconds)",
+                               generation_time, first_delta_seconds)
+            ai_logger.debug("AI response length: %d", len(block.text))
             
         except Exception as e:
-            ai_logger.error(f"AI generation failed: {e}")
+            ai_logger.error("AI generation failed: %s", e)
+            record_generation_failure("llm_error")
             raise RuntimeError(f"Failed to generate DDL with AI: {e}")
         
-        try:
-            ai_logger.info("Extracting code blocks from AI response...")
-            d0 = extract_code_blocks_with_type(result.content)
-            
-            if not d0:
-                ai_logger.error("No code blocks found in AI response")
-                ai_logger.debug(f"Full AI response: {result.content}")
-                raise RuntimeError("AI did not return any code blocks")
-            
-            if len(d0[0]) < 2 or not d0[0][1]:
-                ai_logger.error("First code block is empty or malformed")
-                ai_logger.debug(f"Code blocks found: {d0}")
-                raise RuntimeError("AI returned empty or malformed DDL")
-                
-            ddl_content = d0[0][1]
-            ai_logger.info(f"Extracted DDL content (length: {len(ddl_content)})")
-            ai_logger.info(f"DDL preview: {ddl_content}")
+        if not block.done:
+            ai_logger.error("No code blocks found in AI response")
+            ai_logger.debug("Full AI response: %s", block.text)
+            record_generation_failure("no_code_block")
+            raise RuntimeError("AI did not return any code blocks")
+        
+        if not block.code:
+            ai_logger.error("First code block is empty or malformed")
+            record_generation_failure("malformed_ddl")
+            raise RuntimeError("AI returned empty or malformed DDL")
+        
+        ai_logger.info("Extracted DDL content (length: %s)", len(block.code))
+        ai_logger.debug("DDL preview: %s", block.code)
+        return block.code
+
+    def generate_ddl(self, progress=None):
+        ai_logger.info("Starting DDL generation for '%s'", self.name)
+        return self._run_agent(with_context(self.context, self.user_prompt), progress=progress)
+
+    def repair_ddl(self, ddl_content, errors, progress=None):
+        """Ask the agent to fix a DDL, feeding back the concrete validation errors"""
+        ai_logger.info("Asking AI agent to repair DDL for '%s' (%s errors)", self.name, len(errors))
+        error_list = "\n".join(f"- {error}" for error in errors)
+        repair_prompt = (
+            f"The following random stream DDL for '{self.question}' is invalid:\n\n"
+            f"```sql\n{ddl_content}\n```\n\n"
+            f"Validation errors:\n{error_list}\n\n"
+            f"Fix these errors and ONLY return the corrected random stream DDL, the stream name is {self.name}"
+        )
+        return self._run_agent(with_context(self.context, repair_prompt), stage="repair", progress=progress)
+
+    def validate_ddl(self, ddl_content, validator, max_repairs, progress=None):
+        """
+        Validate a DDL and let the agent repair it up to max_repairs times.
+
+        Returns:
+            str: A DDL that passed validation
+
+        Raises:
+            RuntimeError: If the DDL is still invalid after all repair attempts
+        """
+        start_time = time.time()
+        for attempt in range(max_repairs + 1):
+            if progress:
+                progress("validating")
+            errors = validator.validate(ddl_content)
+            if not errors:
+                ai_logger.info(
+                    "DDL passed validation after %s repair attempts (%.2fs)",
+                    attempt, time.time() - start_time
+                )
+                return ddl_content
             
-        except Exception as e:
-            ai_logger.error(f"Failed to extract DDL from AI response: {e}")
-            raise
+            ai_logger.warning("DDL validation failed (attempt %s): %s", attempt + 1, errors)
+            if attempt == max_repairs:
+                break
+            if progress:
+                progress("repairing")
+            ddl_content = self.repair_ddl(ddl_content, errors, progress)
         
+        record_generation_failure("validation")
+        raise RuntimeError(f"Generated DDL is still invalid after {max_repairs} repair attempts: {'; '.join(errors)}")
+
+    def build_pipeline(self, ddl_content):
         try:
             ai_logger.info("Generating Kafka pipeline components...")
-            pipeline = generate_to_kafka_pipeline(self.name, self.kafka_settings)
+            shard_rates = split_eps(self.target_eps, shard_count(self.target_eps, MAX_SHARD_EPS)) if self.target_eps else None
+            
+            # Columns of a sharded pipeline include the shard id column
+            column_ddl = shard_ddl(ddl_content, self.name, 0, 1) if shard_rates else ddl_content
+            columns = None if self.output.format == "json" else kafka_columns(column_ddl)
+            key_column = self.output.key_column
+            if key_column:
+                column_names = [name for name, _, _ in parse_random_stream(column_ddl)["columns"]]
+                if key_column not in column_names:
+                    raise RuntimeError(
+                        f"Key column {key_column} is not a column of the generated stream: {', '.join(column_names)}"
+                    )
+            pipeline = generate_to_kafka_pipeline(
+                self.name, self.kafka_settings, self.output.format, columns, key_column
+            )
+            pipeline["kafka_topic"] = self.kafka_topic
             
             pipeline["random_stream"] = {
                 "name": self.name,
@@ -291,336 +657,1704 @@ class SyntheticDataGenerator:
             }
             pipeline["question"] = self.question
             
+            if shard_rates:
+                # The generated stream is only the template of the shards
+                del pipeline["write_to_kafka_mv"]
+                pipeline["target_eps"] = self.target_eps
+                pipeline["shards"] = [generate_shard(pipeline, shard_id, eps) for shard_id, eps in enumerate(shard_rates)]
+                ai_logger.info("Sharded pipeline into %s random streams for %s eps", len(shard_rates), self.target_eps)
+            
             ai_logger.info("Pipeline generation completed successfully")
-            ai_logger.debug(f"Pipeline structure: {list(pipeline.keys())}")
+            ai_logger.debug("Pipeline structure: %s", list(pipeline.keys()))
             
             return pipeline
             
         except Exception as e:
-            ai_logger.error(f"Failed to generate pipeline structure: {e}")
+            ai_logger.error("Failed to generate pipeline structure: %s", e)
             raise
 
+    def generate_pipeline(self):
+        return self.build_pipeline(self.generate_ddl())
+
+def generate_name_and_ddl(question, agents, prompt_index=None):
+    """
+    Generate the pipeline name and the random stream DDL with one structured
+    LLM call instead of separate name and DDL calls.
+
+    Returns:
+        tuple: (name, ddl) where name is the snake case summary and ddl uses it
+               as the stream name
+    """
+    ai_logger.info("Calling AI agent to generate name and DDL in one call...")
+    context = select_prompt_context(prompt_index, question) if prompt_index else ""
+    start_time = time.time()
+    
+    try:
+        with agents.agent() as agent:
+            result = agent.run(with_context(context, f"{question}, ONLY return the random stream DDL"), stream=False)
+    except Exception as e:
+        ai_logger.error("AI combined generation failed: %s", e)
+        record_generation_failure("llm_error")
+        raise RuntimeError(f"Failed to generate DDL with AI: {e}")
+    
+    generation_time = time.time() - start_time
+    record_llm_call("combined", generation_time, result, "full" if prompt_index is None else "retrieved")
+    ai_logger.info("AI combined generation completed in %.2f seconds", generation_time)
+    
+    generated = result.content
+    if not isinstance(generated, GeneratedPipeline):
+        ai_logger.error("AI response did not match the expected name/ddl structure")
+        ai_logger.debug("Full AI response: %s", generated)
+        record_generation_failure("malformed_ddl")
+        raise RuntimeError("AI returned a malformed name/DDL response")
+    
+    # The DDL may still be wrapped in a markdown code block
+    code_blocks = extract_code_blocks_with_type(generated.ddl)
+    ddl_content = code_blocks[0][1] if code_blocks else generated.ddl.strip()
+    if not ddl_content:
+        record_generation_failure("malformed_ddl")
+        raise RuntimeError("AI returned empty or malformed DDL")
+    
+    return to_snake_case(generated.name), ddl_content
+
+# Seconds between two recorded accesses of the same pipeline
+TOUCH_INTERVAL = 60
+
 class PipelineManager:
     def __init__(self):
         db_logger.info("Initializing PipelineManager with SQLite metadata storage")
-        db_logger.info(f"Connecting to Timeplus: {timeplus_user}@{timeplus_host}:{timeplus_port}")
+        db_logger.info("Connecting to Timeplus: %s@%s:%s", timeplus_user, timeplus_host, timeplus_port)
         
-        # Initialize Timeplus client for stream operations
+        # Initialize Timeplus connection pool for stream operations
         try:
-            self.client = client.Client(
+            self.pool = TimeplusConnectionPool(
                 host=timeplus_host,
                 user=timeplus_user,
                 password=timeplus_password,
                 port=timeplus_port,
+                size=int(os.getenv("TIMEPLUS_POOL_SIZE", "8")),
+                checkout_timeout=int(os.getenv("TIMEPLUS_POOL_TIMEOUT", "30")),
             )
-            db_logger.info("Timeplus connection established")
+            db_logger.info("Timeplus connection pool established")
         except Exception as e:
-            db_logger.error(f"Failed to connect to Timeplus: {e}")
+            db_logger.error("Failed to connect to Timeplus: %s", e)
             raise
         
+        self.kafka_ready_timeout = float(os.getenv("KAFKA_READY_TIMEOUT", "15"))
+        # Without provisioning, topics are left to the broker's auto-create and are kept on delete
+        provisioning = os.getenv("KAFKA_TOPIC_PROVISIONING", "true").lower() == "true"
+        self.topic_admin = KafkaTopicAdmin(timeout=self.kafka_ready_timeout) if provisioning else None
+        # Total eps of all running pipelines; 0 means no limit
+        self.eps_budget = int(os.getenv("EPS_BUDGET", "0"))
+        # Guards every change of pipeline rates and states, across all workers sharing pipelines.db
+        self._rate_lock = ProcessLock("pipelines.db.lock")
+        self._touched = {}
+        
+        self.write_counter = WriteCountTracker(
+            self.pool,
+            db_path="pipelines.db",
+            ttl_seconds=float(os.getenv("WRITE_COUNT_TTL", "2")),
+        )
+        
         # Initialize SQLite manager for metadata
         try:
             self.metadata_manager = SQLitePipelineManager("pipelines.db")
             db_logger.info("SQLite metadata manager initialized")
         except Exception as e:
-            db_logger.error(f"Failed to initialize SQLite manager: {e}")
+            db_logger.error("Failed to initialize SQLite manager: %s", e)
             raise
 
-    def create(self, pipeline, name):
-        pipeline_id = uuid.uuid4().hex
-        db_logger.info(f"Creating pipeline with ID: {pipeline_id}, name: {name}")
-        
-        # Create the pipeline components in Timeplus
-        db_logger.info("Creating pipeline components in timeplus...")
-        try:
-            # Create random stream
-            random_stream_ddl = pipeline["random_stream"]["ddl"]
-            db_logger.debug(f"Creating random stream with DDL: {random_stream_ddl}")
-            self.client.execute(random_stream_ddl)
-            db_logger.info(f"Created random stream: {pipeline['random_stream']['name']}")
-        except Exception as e:
-            db_logger.error(f"Error creating random stream: {e}")
-            db_logger.error(f"Failed DDL might be: {pipeline.get('random_stream', {}).get('ddl', 'N/A')}")
-            raise RuntimeError(f"Failed to create pipeline: {e}")
-        
-        try:
-            # Create Kafka external stream
-            kafka_stream_ddl = pipeline["kafka_external_stream"]["ddl"]
-            db_logger.info(f"Creating Kafka external stream with DDL: {kafka_stream_ddl}")
-            self.client.execute(kafka_stream_ddl)
-            db_logger.info(f"Created Kafka external stream: {pipeline['kafka_external_stream']['name']}")
-        except Exception as e:
-            db_logger.warning(f"Error creating external stream and retry it: {e}")
-            time.sleep(3) # Retry after a short delay
+    def _drop_created(self, created):
+        """Compensate a failed creation by dropping the objects created so far, newest first"""
+        drop_statements = {
+            "view": "DROP VIEW IF EXISTS {}",
+            "stream": "DROP STREAM IF EXISTS {}",
+            "format schema": "DROP FORMAT SCHEMA IF EXISTS {}",
+        }
+        for kind, object_name in reversed(created):
             try:
-                self.client.execute(kafka_stream_ddl)
+                if kind == "schema subject":
+                    delete_schema_subject(schema_registry_url, object_name)
+                elif kind == "topic":
+                    brokers, topic = object_name
+                    self.topic_admin.delete_topic(brokers, topic)
+                else:
+                    self.pool.execute(drop_statements[kind].format(object_name))
+                db_logger.info("Rolled back %s: %s", kind, object_name)
             except Exception as e:
-                db_logger.error(f"Failed to create Kafka external stream: {e}")
-                db_logger.error(f"Failed DDL might be: {pipeline.get('kafka_external_stream', {}).get('ddl', 'N/A')}")
-                raise RuntimeError(f"Failed to create pipeline: {e}")
+                db_logger.error("Failed to roll back %s %s, it must be dropped manually: %s", kind, object_name, e)
+
+    def create(self, pipeline, name):
+        """
+        Create all Timeplus objects of a pipeline as one unit.
+
+        The objects are created in dependency order. If any step fails, the
+        objects created so far are dropped again, and metadata is saved to
+        SQLite only once the whole pipeline is up.
+
+        Returns:
+            str: The pipeline ID
+
+        Raises:
+            RuntimeError: If the pipeline could not be created; nothing is left behind
+        """
+        db_logger.info("Creating pipeline: %s", name)
+        created = []
         
+        db_logger.info("Creating pipeline components in timeplus...")
         try:
-            # Create materialized view
-            mv_ddl = pipeline["write_to_kafka_mv"]["ddl"]
-            db_logger.info(f"Creating materialized view with DDL: {mv_ddl}")
-            self.client.execute(mv_ddl)
-            db_logger.info(f"Created materialized view: {pipeline['write_to_kafka_mv']['name']}")
+            # Check the broker before creating anything, so an unreachable Kafka costs no rollback
+            kafka_stream = pipeline["kafka_external_stream"]
+            brokers = kafka_stream.get("brokers", kafka_brokers)
+            wait_for_kafka(brokers, max_wait=self.kafka_ready_timeout)
             
-        except Exception as e:
-            db_logger.error(f"Error creating materialized view: {e}")
-            db_logger.error(f"Failed DDL might be: {pipeline.get('write_to_kafka_mv', {}).get('ddl', 'N/A')}")
-            raise RuntimeError(f"Failed to create pipeline: {e}")
-        
-        # Save metadata to SQLite
-        try:
+            # Create the topic with its partitions and configuration; a topic
+            # that already exists is used as it is and not rolled back
+            kafka_topic = pipeline.get("kafka_topic")
+            if self.topic_admin is not None and kafka_topic:
+                with timed(TIMEPLUS_DDL_LATENCY, "create", "kafka_topic"):
+                    topic_created = self.topic_admin.create_topic(
+                        brokers, kafka_topic["name"], kafka_topic["partitions"],
+                        kafka_topic["replication_factor"], kafka_topic["config"],
+                    )
+                if topic_created:
+                    created.append(("topic", (brokers, kafka_topic["name"])))
+            
+            # Create the Avro/Protobuf schema in Timeplus for encoding and in the
+            # schema registry for consumers
+            format_schema = pipeline.get("format_schema")
+            if format_schema:
+                with timed(TIMEPLUS_DDL_LATENCY, "create", "format_schema"):
+                    self.pool.execute(format_schema["ddl"], retry=False)
+                created.append(("format schema", format_schema["name"]))
+                register_schema(
+                    schema_registry_url, format_schema["subject"], format_schema["schema"], format_schema["schema_type"]
+                )
+                created.append(("schema subject", format_schema["subject"]))
+                db_logger.info("Created format schema: %s", format_schema['name'])
+            
+            # Create the random stream of every shard
+            for shard in pipeline_shards(pipeline):
+                random_stream_ddl = shard["random_stream"]["ddl"]
+                db_logger.debug("Creating random stream with DDL: %s", random_stream_ddl)
+                with timed(TIMEPLUS_DDL_LATENCY, "create", "random_stream"):
+                    self.pool.execute(random_stream_ddl, retry=False)
+                created.append(("stream", shard["random_stream"]["name"]))
+                db_logger.info("Created random stream: %s", shard['random_stream']['name'])
+            
+            # Create Kafka external stream; the topic may still be propagating
+            # or, without provisioning, be auto-created, so the DDL is retried with backoff
+            db_logger.debug("Creating Kafka external stream with DDL: %s", kafka_stream["ddl"])
+            with timed(TIMEPLUS_DDL_LATENCY, "create", "external_stream"):
+                retry_with_backoff(
+                    lambda: self.pool.execute(kafka_stream["ddl"], retry=False),
+                    f"Creating Kafka external stream {kafka_stream['name']}",
+                    max_wait=self.kafka_ready_timeout,
+                )
+            created.append(("stream", kafka_stream["name"]))
+            db_logger.info("Created Kafka external stream: %s", kafka_stream['name'])
+            
+            # Create the materialized view of every shard, all writing to the same topic
+            for shard in pipeline_shards(pipeline):
+                mv_ddl = shard["write_to_kafka_mv"]["ddl"]
+                db_logger.debug("Creating materialized view with DDL: %s", mv_ddl)
+                with timed(TIMEPLUS_DDL_LATENCY, "create", "materialized_view"):
+                    self.pool.execute(mv_ddl, retry=False)
+                created.append(("view", shard["write_to_kafka_mv"]["name"]))
+                db_logger.info("Created materialized view: %s", shard['write_to_kafka_mv']['name'])
+            
+            # Save metadata to SQLite last, so it never points at a half-built pipeline
             db_logger.info("Saving pipeline metadata to SQLite...")
             saved_id = self.metadata_manager.create(pipeline, name)
             db_logger.info("Pipeline metadata saved successfully")
             
         except Exception as e:
-            db_logger.error(f"Failed to save pipeline metadata: {e}")
-            raise RuntimeError(f"Failed to save pipeline metadata: {e}")
+            db_logger.error("Pipeline creation failed after creating %s components, rolling back: %s", len(created), e)
+            self._drop_created(created)
+            raise RuntimeError(f"Failed to create pipeline: {e}")
         
-        db_logger.info(f"Pipeline creation completed successfully with ID: {saved_id}")
+        db_logger.info("Pipeline creation completed successfully with ID: %s", saved_id)
+        self._try_rebalance()
         return saved_id
     
-    def _get_pipeline_write_count(self, pipeline_data):
-        """Get write count from Timeplus materialized view"""
+    def _live_views(self, pipeline_data):
+        """Materialized views of a pipeline that exist in Timeplus; paused pipelines may have dropped theirs"""
+        dropped = {name for name, mode in pipeline_data.get('paused_views', {}).items() if mode == 'dropped'}
+        return [
+            shard['write_to_kafka_mv']['name'] for shard in pipeline_shards(pipeline_data)
+            if shard['write_to_kafka_mv']['name'] not in dropped
+        ]
+
+    def _aggregate_stats(self, pipeline_data, mv_stats):
+        """Sum the per-MV stats of a pipeline's shards into one write count and rate"""
+        write_count = pipeline_data.get('retired_write_count', 0) + pipeline_data.get('backfilled_rows', 0)
+        eps = 0.0
+        for mv_name in self._live_views(pipeline_data):
+            shard_stats = mv_stats[mv_name]
+            write_count += shard_stats['write_count']
+            eps += shard_stats['eps']
+        return {'write_count': write_count, 'eps': round(eps, 2)}
+
+    def _get_pipeline_stats(self, pipeline_data):
+        """Get the write count and achieved rate of a pipeline from its materialized views"""
         try:
-            mv_name = pipeline_data['write_to_kafka_mv']['name']
-            query_sql = f"SELECT COUNT(*) FROM table({mv_name}) WHERE _tp_time > earliest_ts()"
-            db_logger.debug(f"Executing write count query: {query_sql}")
-            
-            result = self.client.execute(query_sql)
-            db_logger.debug(f"Query result: {len(result) if result else 0} rows")
-            
-            if result:
-                return result[0][0]
-            else:
-                return 0
+            mv_names = self._live_views(pipeline_data)
+            return self._aggregate_stats(pipeline_data, self.write_counter.get_stats(mv_names))
         except Exception as e:
-            db_logger.error(f"Failed to get write count: {e}")
-            return 0
+            db_logger.error("Failed to get write count: %s", e)
+            return {'write_count': 0, 'eps': 0.0}
+
+    async def _aget_pipeline_stats(self, pipeline_data):
+        """Get pipeline stats from Timeplus without blocking the event loop"""
+        return await asyncio.to_thread(self._get_pipeline_stats, pipeline_data)
         
     def get(self, pipeline_id):
-        db_logger.info(f"Retrieving pipeline with ID: {pipeline_id}")
+        db_logger.debug("Retrieving pipeline with ID: %s", pipeline_id)
         
         try:
             # Get pipeline from SQLite
             pipeline_info = self.metadata_manager.get(pipeline_id)
+            self.touch(pipeline_id)
             
-            # Get live write count from Timeplus
-            live_count = self._get_pipeline_write_count(pipeline_info['pipeline'])
+            # Get live write count and rate from Timeplus
+            pipeline_info.update(self._get_pipeline_stats(pipeline_info['pipeline']))
             
-            # Update the write count
-            pipeline_info['write_count'] = live_count
-            
-            db_logger.info(f"Successfully retrieved pipeline: {pipeline_info['name']} (writes: {live_count})")
+            db_logger.debug(
+                "Successfully retrieved pipeline: %s (writes: %s)",
+                pipeline_info['name'], pipeline_info['write_count']
+            )
             return pipeline_info
                 
         except Exception as e:
             if isinstance(e, ValueError):
                 raise
-            db_logger.error(f"Failed to retrieve pipeline: {e}")
+            db_logger.error("Failed to retrieve pipeline: %s", e)
             raise RuntimeError(f"Failed to get pipeline: {e}")
 
-    def list_all(self):
-        db_logger.info("Listing all pipelines")
+    async def aget(self, pipeline_id):
+        """Async variant of get(); the Timeplus query runs on its own pooled connection"""
+        db_logger.debug("Retrieving pipeline with ID: %s", pipeline_id)
         
         try:
-            pipelines = self.metadata_manager.list_all()
-            db_logger.info(f"Successfully listed {len(pipelines)} pipelines")
-            return pipelines
+            pipeline_info = await asyncio.to_thread(self.metadata_manager.get, pipeline_id)
+            if self._touch_due(pipeline_id):
+                await asyncio.to_thread(self.touch, pipeline_id)
+            pipeline_info.update(await self._aget_pipeline_stats(pipeline_info['pipeline']))
             
+            db_logger.debug(
+                "Successfully retrieved pipeline: %s (writes: %s)",
+                pipeline_info['name'], pipeline_info['write_count']
+            )
+            return pipeline_info
+                
         except Exception as e:
-            db_logger.error(f"Failed to list pipelines: {e}")
-            raise RuntimeError(f"Failed to list pipelines: {e}")
+            if isinstance(e, ValueError):
+                raise
+            db_logger.error("Failed to retrieve pipeline: %s", e)
+            raise RuntimeError(f"Failed to get pipeline: {e}")
 
-    def delete(self, pipeline_id):
-        db_logger.info(f"Deleting pipeline with ID: {pipeline_id}")
+    def _touch_due(self, pipeline_id):
+        return time.monotonic() - self._touched.get(pipeline_id, -math.inf) >= TOUCH_INTERVAL
+
+    def touch(self, pipeline_id):
+        """Record that a pipeline was viewed or queried, at most once per TOUCH_INTERVAL seconds"""
+        if not self._touch_due(pipeline_id):
+            return
+        self._touched[pipeline_id] = time.monotonic()
+        self.metadata_manager.touch(pipeline_id)
+
+    def get_stats(self):
+        """Write counts and event rates for all pipelines, keyed by pipeline ID"""
+        db_logger.debug("Collecting stats for all pipelines")
         
-        # Get pipeline info first
         try:
-            pipeline_info = self.metadata_manager.get(pipeline_id)
-            pipeline = pipeline_info["pipeline"]
-            name = pipeline_info["name"]
+            pipelines = {}
+            mv_names = []
+            for summary in self.metadata_manager.list_all():
+                pipeline_data = summary.get('pipeline') or self.metadata_manager.get(summary['id'])['pipeline']
+                pipelines[summary['id']] = pipeline_data
+                mv_names.extend(self._live_views(pipeline_data))
             
-            db_logger.info(f"Deleting pipeline: {name}")
+            # One grouped Timeplus query for every stale pipeline
+            stats = self.write_counter.get_stats(mv_names)
+            return {
+                pipeline_id: self._aggregate_stats(pipeline_data, stats)
+                for pipeline_id, pipeline_data in pipelines.items()
+            }
             
         except Exception as e:
-            db_logger.error(f"Failed to get pipeline info for deletion: {e}")
-            raise
+            db_logger.error("Failed to get pipeline stats: %s", e)
+            raise RuntimeError(f"Failed to get pipeline stats: {e}")
+
+    def list_all(self):
+        db_logger.debug("Listing all pipelines")
         
-        # Delete the pipeline resources from Timeplus
         try:
-            db_logger.info("Deleting pipeline components from Timeplus...")
-            
-            # Delete materialized view
-            mv_name = pipeline['write_to_kafka_mv']['name']
-            db_logger.debug(f"Dropping materialized view: {mv_name}")
-            self.client.execute(f"DROP VIEW IF EXISTS {mv_name}")
-            
-            # Delete Kafka external stream
-            kafka_stream_name = pipeline['kafka_external_stream']['name']
-            db_logger.debug(f"Dropping external stream: {kafka_stream_name}")
-            self.client.execute(f"DROP STREAM IF EXISTS {kafka_stream_name}")
-            
-            # Delete random stream
-            random_stream_name = pipeline['random_stream']['name']
-            db_logger.debug(f"Dropping random stream: {random_stream_name}")
-            self.client.execute(f"DROP STREAM IF EXISTS {random_stream_name}")
-            
-            db_logger.info("Pipeline components deleted successfully")
+            pipelines = self.metadata_manager.list_all()
+            db_logger.debug("Successfully listed %d pipelines", len(pipelines))
+            return pipelines
             
         except Exception as e:
-            db_logger.error(f"Error deleting pipeline resources: {e}")
-            raise RuntimeError(f"Failed to delete pipeline resources: {e}")
-        
-        # TODO: delete Kafka topic
-        
-        # Delete pipeline metadata from SQLite
+            db_logger.error("Failed to list pipelines: %s", e)
+            raise RuntimeError(f"Failed to list pipelines: {e}")
+
+    def _create_shard(self, shard):
+        self.pool.execute(shard['random_stream']['ddl'], retry=False)
         try:
-            db_logger.info("Deleting pipeline metadata from SQLite...")
-            self.metadata_manager.delete(pipeline_id)
-            db_logger.info(f"Pipeline {name} deleted successfully")
-            
+            self.pool.execute(shard['write_to_kafka_mv']['ddl'], retry=False)
+        except Exception:
+            self.pool.execute(f"DROP STREAM IF EXISTS {shard['random_stream']['name']}")
+            raise
+
+    def _drop_shard(self, shard):
+        mv_name = shard['write_to_kafka_mv']['name']
+        self.pool.execute(f"DROP VIEW IF EXISTS {mv_name}")
+        self.write_counter.forget(mv_name)
+        self.pool.execute(f"DROP STREAM IF EXISTS {shard['random_stream']['name']}")
+
+    def _retire_view(self, pipeline, mv_name):
+        """Keep the rows a view already wrote in the pipeline total before it is dropped"""
+        pipeline['retired_write_count'] = pipeline.get('retired_write_count', 0) + self.write_counter.get_count(mv_name)
+
+    def _alter_shard_eps(self, pipeline, shard, eps, rebuilt_shard):
+        """Change the rate of a running shard in place, or replace it by rebuilt_shard if that is not possible"""
+        try:
+            self.pool.execute(f"ALTER STREAM {shard['random_stream']['name']} MODIFY SETTING eps = {int(eps)}", retry=False)
         except Exception as e:
-            db_logger.error(f"Failed to delete pipeline metadata: {e}")
-            raise RuntimeError(f"Failed to delete pipeline metadata: {e}")
+            db_logger.info("Rebuilding shard %s to change its rate: %s", shard['random_stream']['name'], e)
+            self._retire_view(pipeline, shard['write_to_kafka_mv']['name'])
+            self._drop_shard(shard)
+            self._create_shard(rebuilt_shard)
 
-# FastAPI app
-app = FastAPI(title="Synthetic Data Pipeline API", description="API for managing synthetic data pipelines")
+    def _set_shard_eps(self, pipeline, shard, eps):
+        """Change the requested rate of a running shard"""
+        new_shard = generate_shard(pipeline, shard['shard_id'], eps)
+        self._alter_shard_eps(pipeline, shard, eps, new_shard)
+        shard.update(new_shard)
 
-# Mount static files and templates
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+    def _apply_shard_eps(self, pipeline, shard, eps):
+        """Run a shard at eps while keeping its requested rate in the stored DDL"""
+        random_stream = dict(shard['random_stream'], ddl=set_eps(shard['random_stream']['ddl'], eps))
+        self._alter_shard_eps(pipeline, shard, eps, dict(shard, random_stream=random_stream))
 
-# Initialize pipeline manager
-try:
-    wait_for_timeplus_connection()
-    pipeline_manager = PipelineManager()
-    app_logger.info("Application initialized successfully")
-except Exception as e:
-    app_logger.error(f"Failed to initialize application: {e}")
-    raise
+    def set_rate(self, pipeline_id, target_eps):
+        """
+        Change the target rate of a running sharded pipeline.
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    
-    # Log request
-    api_logger.info(f"Request: {request.method} {request.url}")
-    api_logger.debug(f"Headers: {dict(request.headers)}")
-    
-    # Process request
-    response = await call_next(request)
-    
-    # Log response
-    process_time = time.time() - start_time
-    api_logger.info(f"Response: {response.status_code} ({process_time:.3f}s)")
-    
-    return response
+        Existing shards get their new share of the rate, and shards are added
+        or removed as needed. The external stream and topic are kept, so
+        consumers are not interrupted.
 
-@app.post("/pipelines", response_model=dict)
-async def create_pipeline(pipeline_data: PipelineCreate):
-    """Create a new synthetic data pipeline"""
-    api_logger.info("POST /pipelines - Creating new pipeline")
-    api_logger.debug(f"Request data: {pipeline_data.dict()}")
-    
+        Returns:
+            dict: The updated pipeline definition
+
+        Raises:
+            ValueError: If the pipeline does not exist
+            RuntimeError: If the pipeline is not sharded or a shard could not be changed
+        """
+        db_logger.info("Setting target rate of pipeline %s to %s eps", pipeline_id, target_eps)
+        
+        with self._rate_lock:
+            pipeline_info = self.metadata_manager.get(pipeline_id)
+            pipeline = pipeline_info['pipeline']
+            if 'shards' not in pipeline:
+                raise RuntimeError("Only pipelines created with target_eps can change their rate")
+            if pipeline_info['state'] != 'running':
+                raise RuntimeError(f"Pipeline is {pipeline_info['state']}, resume it to change its rate")
+            
+            shards = pipeline['shards']
+            rates = split_eps(target_eps, shard_count(target_eps, MAX_SHARD_EPS))
+            # Shards scaled down for the eps budget are all reset; the budget is applied again below
+            scaled = pipeline.pop('applied_eps', None) is not None
+            try:
+                # Remove surplus shards first so the total rate never overshoots
+                while len(shards) > len(rates):
+                    shard = shards[-1]
+                    self._retire_view(pipeline, shard['write_to_kafka_mv']['name'])
+                    self._drop_shard(shard)
+                    shards.pop()
+                    db_logger.info("Removed shard %s", shard['random_stream']['name'])
+                
+                for shard, eps in zip(shards, rates):
+                    if shard['eps'] != eps or scaled:
+                        self._set_shard_eps(pipeline, shard, eps)
+                
+                for shard_id in range(len(shards), len(rates)):
+                    shard = generate_shard(pipeline, shard_id, rates[shard_id])
+                    self._create_shard(shard)
+                    shards.append(shard)
+                    db_logger.info("Added shard %s", shard['random_stream']['name'])
+                
+                pipeline['target_eps'] = target_eps
+            except Exception as e:
+                db_logger.error("Failed to change rate of pipeline %s: %s", pipeline_id, e)
+                raise RuntimeError(f"Failed to change pipeline rate: {e}")
+            finally:
+                # Record the shards that actually exist, even after a partial change
+                self.metadata_manager.update(pipeline_id, pipeline)
+            self.touch(pipeline_id)
+            self._try_rebalance()
+        
+        db_logger.info("Pipeline %s now runs %s shards for %s eps", pipeline_id, len(shards), target_eps)
+        return pipeline
+
+    def _pause_view(self, pipeline, mv_name):
+        """
+        Stop one materialized view, dropping it if Timeplus cannot pause it.
+
+        Returns:
+            str: "paused" or "dropped", to be passed to _resume_view()
+        """
+        try:
+            with timed(TIMEPLUS_DDL_LATENCY, "pause", "materialized_view"):
+                self.pool.execute(f"SYSTEM PAUSE MATERIALIZED VIEW {mv_name}", retry=False)
+            return "paused"
+        except Exception as e:
+            db_logger.info("Dropping materialized view %s instead of pausing it: %s", mv_name, e)
+            self._retire_view(pipeline, mv_name)
+            with timed(TIMEPLUS_DDL_LATENCY, "drop", "materialized_view"):
+                self.pool.execute(f"DROP VIEW IF EXISTS {mv_name}")
+            self.write_counter.forget(mv_name)
+            return "dropped"
+
+    def _resume_view(self, shard, mode):
+        mv = shard['write_to_kafka_mv']
+        if mode == "dropped":
+            with timed(TIMEPLUS_DDL_LATENCY, "create", "materialized_view"):
+                self.pool.execute(mv['ddl'], retry=False)
+        else:
+            with timed(TIMEPLUS_DDL_LATENCY, "resume", "materialized_view"):
+                self.pool.execute(f"SYSTEM RESUME MATERIALIZED VIEW {mv['name']}", retry=False)
+
+    def pause(self, pipeline_id, state="paused"):
+        """
+        Stop a pipeline from writing to Kafka without dropping its streams or metadata.
+
+        The materialized views are paused in Timeplus; on servers without
+        SYSTEM PAUSE they are dropped and recreated from their DDL on resume.
+
+        Args:
+            state (str): "paused", or "suspended" when an idle pipeline is stopped
+
+        Returns:
+            str: The new state
+
+        Raises:
+            ValueError: If the pipeline does not exist
+            RuntimeError: If a view could not be stopped; the pipeline keeps running
+        """
+        with self._rate_lock:
+            pipeline_info = self.metadata_manager.get(pipeline_id)
+            pipeline = pipeline_info['pipeline']
+            if pipeline_info['state'] != 'running':
+                # Already stopped; an explicit pause still turns a suspension into a pause
+                if state == 'paused':
+                    self.metadata_manager.set_state(pipeline_id, state, pipeline)
+                return 'paused' if state == 'paused' else pipeline_info['state']
+            
+            db_logger.info("Stopping pipeline %s (%s)", pipeline_info['name'], state)
+            paused = {}
+            try:
+                for shard in pipeline_shards(pipeline):
+                    mv_name = shard['write_to_kafka_mv']['name']
+                    paused[mv_name] = self._pause_view(pipeline, mv_name)
+            except Exception as e:
+                db_logger.error("Failed to pause pipeline %s, restarting its views: %s", pipeline_id, e)
+                for shard in pipeline_shards(pipeline):
+                    mode = paused.get(shard['write_to_kafka_mv']['name'])
+                    if mode:
+                        try:
+                            self._resume_view(shard, mode)
+                        except Exception as resume_error:
+                            db_logger.error(
+                                "Failed to restart %s: %s",
+                                shard['write_to_kafka_mv']['name'], resume_error
+                            )
+                # Keep the write count of views that were dropped and recreated
+                self.metadata_manager.update(pipeline_id, pipeline)
+                raise RuntimeError(f"Failed to pause pipeline: {e}")
+            
+            pipeline['paused_views'] = paused
+            self.metadata_manager.set_state(pipeline_id, state, pipeline)
+            self._try_rebalance()
+        db_logger.info("Pipeline %s is %s", pipeline_info['name'], state)
+        return state
+
+    def resume(self, pipeline_id):
+        """
+        Restart the materialized views of a paused or suspended pipeline.
+
+        The rates of all running pipelines are fitted into the eps budget
+        again right after.
+
+        Returns:
+            str: The new state, "running"
+
+        Raises:
+            ValueError: If the pipeline does not exist
+            RuntimeError: If a view could not be restarted; views not yet restarted stay stopped
+        """
+        with self._rate_lock:
+            pipeline_info = self.metadata_manager.get(pipeline_id)
+            pipeline = pipeline_info['pipeline']
+            self.touch(pipeline_id)
+            if pipeline_info['state'] == 'running':
+                return 'running'
+            
+            db_logger.info("Resuming pipeline %s", pipeline_info['name'])
+            paused = pipeline.get('paused_views', {})
+            try:
+                for shard in pipeline_shards(pipeline):
+                    mv_name = shard['write_to_kafka_mv']['name']
+                    if mv_name in paused:
+                        self._resume_view(shard, paused[mv_name])
+                        del paused[mv_name]
+            except Exception as e:
+                db_logger.error("Failed to resume pipeline %s: %s", pipeline_id, e)
+                # Only the views that are still stopped are left to resume
+                self.metadata_manager.update(pipeline_id, pipeline)
+                raise RuntimeError(f"Failed to resume pipeline: {e}")
+            
+            pipeline.pop('paused_views', None)
+            self.metadata_manager.set_state(pipeline_id, 'running', pipeline)
+            self._try_rebalance()
+        db_logger.info("Pipeline %s is running", pipeline_info['name'])
+        return 'running'
+
+    def suspend_idle(self, ttl_seconds):
+        """
+        Suspend running pipelines that were not viewed or queried for ttl_seconds.
+
+        Returns:
+            list: IDs of the suspended pipelines
+        """
+        suspended = []
+        for pipeline_id in self.metadata_manager.list_idle(ttl_seconds):
+            try:
+                self.pause(pipeline_id, state="suspended")
+                suspended.append(pipeline_id)
+            except Exception as e:
+                db_logger.error("Failed to suspend idle pipeline %s: %s", pipeline_id, e)
+        if suspended:
+            db_logger.info("Suspended %s pipelines idle for more than %ss", len(suspended), ttl_seconds)
+        return suspended
+
+    def rebalance(self):
+        """
+        Fit the rates of all running pipelines into the global eps budget.
+
+        While the requested rates (the eps of the stored DDLs) fit, every
+        stream runs at its requested rate. Above the budget, every stream runs
+        at the same fraction of it. Only streams whose rate changes are
+        altered, and the rates they run at are kept as applied_eps.
+
+        Returns:
+            dict: The budget status, see budget_status()
+        """
+        with self._rate_lock:
+            running = self.metadata_manager.list_by_state('running')
+            requested = {
+                info['id']: [ddl_eps(shard['random_stream']['ddl']) for shard in pipeline_shards(info['pipeline'])]
+                for info in running
+            }
+            targets = budget_rates(requested, self.eps_budget)
+            for info in running:
+                pipeline = info['pipeline']
+                shards = pipeline_shards(pipeline)
+                applied = list(pipeline.get('applied_eps') or requested[info['id']])
+                target = targets[info['id']]
+                if len(applied) != len(shards):
+                    # Shard count changed without the budget being applied; set every shard
+                    applied = [None] * len(shards)
+                if applied == target:
+                    continue
+                try:
+                    for index, (shard, eps) in enumerate(zip(shards, target)):
+                        if applied[index] != eps:
+                            self._apply_shard_eps(pipeline, shard, eps)
+                            applied[index] = eps
+                except Exception as e:
+                    db_logger.error("Failed to apply the eps budget to pipeline %s: %s", info['name'], e)
+                finally:
+                    if applied == requested[info['id']]:
+                        pipeline.pop('applied_eps', None)
+                    else:
+                        pipeline['applied_eps'] = applied
+                    self.metadata_manager.update(info['id'], pipeline)
+                db_logger.info(
+                    "Pipeline %s runs at %s eps (requested %s)",
+                    info['name'], sum(eps or 0 for eps in applied), sum(requested[info['id']])
+                )
+            return self._budget_status(requested, targets)
+
+    def _try_rebalance(self):
+        """Rebalance after a change that already succeeded; the scheduler retries if this fails"""
+        try:
+            self.rebalance()
+        except Exception as e:
+            db_logger.error("Failed to apply the eps budget: %s", e)
+
+    def _budget_status(self, requested, applied):
+        requested_eps = sum(sum(rates) for rates in requested.values())
+        applied_eps = sum(sum(rates) for rates in applied.values())
+        return {
+            "eps_budget": self.eps_budget or None,
+            "running_pipelines": len(requested),
+            "requested_eps": requested_eps,
+            "applied_eps": applied_eps,
+            "scale": round(applied_eps / requested_eps, 4) if requested_eps else 1.0,
+        }
+
+    def budget_status(self):
+        """
+        Returns:
+            dict: {"eps_budget", "running_pipelines", "requested_eps", "applied_eps", "scale"}
+        """
+        requested = {}
+        applied = {}
+        for info in self.metadata_manager.list_by_state('running'):
+            requested[info['id']] = [
+                ddl_eps(shard['random_stream']['ddl']) for shard in pipeline_shards(info['pipeline'])
+            ]
+            applied[info['id']] = info['pipeline'].get('applied_eps') or requested[info['id']]
+        return self._budget_status(requested, applied)
+
+    def export(self, pipeline_id, rows, path, file_format="parquet", row_group_size=100000, on_progress=None):
+        """
+        Write rows of a pipeline's random stream to a Parquet or CSV file.
+
+        Rows are generated by the first random stream of the pipeline through
+        a dedicated connection, without the eps limit and without touching
+        the Kafka topic. The shard id column of sharded pipelines is left out.
+
+        Returns:
+            dict: {"rows", "bytes", "seconds"}
+
+        Raises:
+            ValueError: If the pipeline does not exist
+            RuntimeError: If the export failed
+        """
+        pipeline = self.metadata_manager.get(pipeline_id)['pipeline']
+        self.touch(pipeline_id)
+        stream_name = pipeline_shards(pipeline)[0]['random_stream']['name']
+        columns = export_columns(pipeline['random_stream']['ddl'])
+        db_logger.info("Exporting %s rows of %s to %s", rows, stream_name, path)
+        
+        with self.pool.dedicated_client() as timeplus_client:
+            return export_rows(timeplus_client, stream_name, columns, rows, path, file_format, row_group_size,
+                               on_progress)
+
+    def backfill(self, pipeline_id, rows, start_ms, end_ms, chunk_rows=1000000, live=False, on_progress=None):
+        """
+        Write rows with event times in [start_ms, end_ms) to a pipeline's Kafka topic as fast as Timeplus can.
+
+        A running pipeline is paused for the backfill, so that live events do
+        not interleave with the historical ones. Afterwards the pipeline is
+        resumed if live is set; otherwise it is left paused. If the backfill
+        fails, a pipeline that was running is resumed.
+
+        Rows are generated by the first random stream of the pipeline through a
+        dedicated connection and encoded by the select list of its views.
+
+        Returns:
+            dict: {"rows", "seconds", "chunks", "event_time_columns", "state"}
+
+        Raises:
+            ValueError: If the pipeline does not exist
+            RuntimeError: If a backfill of the pipeline is already running, or the backfill failed
+        """
+        with self._rate_lock:
+            pipeline_info = self.metadata_manager.get(pipeline_id)
+            # Claimed in pipelines.db, so no other worker backfills the pipeline at the same time
+            if not self.metadata_manager.claim_backfill(pipeline_id):
+                raise RuntimeError(f"A backfill of pipeline {pipeline_id} is already running")
+        
+        try:
+            self.touch(pipeline_id)
+            pipeline = pipeline_info['pipeline']
+            was_running = pipeline_info['state'] == 'running'
+            if was_running:
+                self.pause(pipeline_id)
+            
+            shard = pipeline_shards(pipeline)[0]
+            kafka_stream = pipeline['kafka_external_stream']
+            db_logger.info("Backfilling %s rows of %s into %s", rows, pipeline_info['name'], kafka_stream['name'])
+            try:
+                with self.pool.dedicated_client() as timeplus_client:
+                    stats = run_backfill(
+                        timeplus_client, shard['random_stream']['name'], kafka_stream['name'],
+                        shard['random_stream']['ddl'], kafka_stream.get('select', 'json_encode(*) as value'),
+                        rows, start_ms, end_ms, chunk_rows, on_progress
+                    )
+            except BackfillError as e:
+                self._add_backfilled_rows(pipeline_id, e.rows_written)
+                if was_running:
+                    self.resume(pipeline_id)
+                raise
+            
+            self._add_backfilled_rows(pipeline_id, stats['rows'])
+            state = self.resume(pipeline_id) if live else self.metadata_manager.get(pipeline_id)['state']
+            db_logger.info("Backfilled %s rows of %s in %ss", stats['rows'], pipeline_info['name'], stats['seconds'])
+            return {**stats, "state": state}
+        finally:
+            self.metadata_manager.release_backfill(pipeline_id)
+
+    def _add_backfilled_rows(self, pipeline_id, rows):
+        """Count backfilled rows in the pipeline's write count"""
+        with self._rate_lock:
+            pipeline = self.metadata_manager.get(pipeline_id)['pipeline']
+            pipeline['backfilled_rows'] = pipeline.get('backfilled_rows', 0) + rows
+            self.metadata_manager.update(pipeline_id, pipeline)
+
+    def delete(self, pipeline_id):
+        db_logger.info("Deleting pipeline with ID: %s", pipeline_id)
+        
+        # Get pipeline info first
+        try:
+            pipeline_info = self.metadata_manager.get(pipeline_id)
+            pipeline = pipeline_info["pipeline"]
+            name = pipeline_info["name"]
+            
+            db_logger.info("Deleting pipeline: %s", name)
+            
+        except Exception as e:
+            db_logger.error("Failed to get pipeline info for deletion: %s", e)
+            raise
+        
+        # Delete the pipeline resources from Timeplus
+        try:
+            db_logger.info("Deleting pipeline components from Timeplus...")
+            
+            # Delete materialized views
+            for shard in pipeline_shards(pipeline):
+                mv_name = shard['write_to_kafka_mv']['name']
+                db_logger.debug("Dropping materialized view: %s", mv_name)
+                with timed(TIMEPLUS_DDL_LATENCY, "drop", "materialized_view"):
+                    self.pool.execute(f"DROP VIEW IF EXISTS {mv_name}")
+                self.write_counter.forget(mv_name)
+            
+            # Delete Kafka external stream
+            kafka_stream_name = pipeline['kafka_external_stream']['name']
+            db_logger.debug("Dropping external stream: %s", kafka_stream_name)
+            with timed(TIMEPLUS_DDL_LATENCY, "drop", "external_stream"):
+                self.pool.execute(f"DROP STREAM IF EXISTS {kafka_stream_name}")
+            
+            # Delete random streams
+            for shard in pipeline_shards(pipeline):
+                random_stream_name = shard['random_stream']['name']
+                db_logger.debug("Dropping random stream: %s", random_stream_name)
+                with timed(TIMEPLUS_DDL_LATENCY, "drop", "random_stream"):
+                    self.pool.execute(f"DROP STREAM IF EXISTS {random_stream_name}")
+            
+            # Delete the format schema of Avro/Protobuf pipelines
+            format_schema = pipeline.get("format_schema")
+            if format_schema:
+                db_logger.debug("Dropping format schema: %s", format_schema['name'])
+                with timed(TIMEPLUS_DDL_LATENCY, "drop", "format_schema"):
+                    self.pool.execute(f"DROP FORMAT SCHEMA IF EXISTS {format_schema['name']}")
+            
+            db_logger.info("Pipeline components deleted successfully")
+            
+        except Exception as e:
+            db_logger.error("Error deleting pipeline resources: %s", e)
+            raise RuntimeError(f"Failed to delete pipeline resources: {e}")
+        
+        # Delete the Kafka topic; a leftover topic only costs broker storage, so failures are not fatal
+        if self.topic_admin is not None:
+            kafka_stream = pipeline['kafka_external_stream']
+            try:
+                with timed(TIMEPLUS_DDL_LATENCY, "drop", "kafka_topic"):
+                    self.topic_admin.delete_topic(kafka_stream.get('brokers', kafka_brokers), kafka_stream['topic'])
+            except Exception as e:
+                db_logger.error(
+                    "Failed to delete Kafka topic %s, it must be deleted manually: %s",
+                    kafka_stream['topic'], e
+                )
+        
+        # Delete the registered schema; like the topic, a leftover subject is not fatal
+        format_schema = pipeline.get("format_schema")
+        if format_schema:
+            try:
+                delete_schema_subject(schema_registry_url, format_schema["subject"])
+            except Exception as e:
+                db_logger.error(
+                    "Failed to delete schema subject %s, it must be deleted manually: %s",
+                    format_schema['subject'], e
+                )
+        
+        # Delete pipeline metadata from SQLite
+        try:
+            db_logger.info("Deleting pipeline metadata from SQLite...")
+            self.metadata_manager.delete(pipeline_id)
+            self._touched.pop(pipeline_id, None)
+            db_logger.info("Pipeline %s deleted successfully", name)
+            
+        except Exception as e:
+            db_logger.error("Failed to delete pipeline metadata: %s", e)
+            raise RuntimeError(f"Failed to delete pipeline metadata: {e}")
+        
+        # Pipelines scaled down for the eps budget get their share back
+        self._try_rebalance()
+
+startup_state = StartupState(["sqlite", "timeplus", "llm"])
+
+# Created by the lifespan handler; llm_agents only once the agents are built
+pipeline_manager = None
+job_manager = None
+llm_agents = None
+ddl_validator = None
+live_stats = None
+generation_cache = None
+preview_manager = None
+max_ddl_repairs = int(os.getenv("DDL_MAX_REPAIRS", "2"))
+
+async def run_pipeline_scheduler(interval_seconds, idle_ttl):
+    """
+    Suspend idle pipelines and re-apply the eps budget every interval_seconds.
+
+    Changes made through the API apply the budget right away; this loop
+    suspends pipelines nobody looked at for idle_ttl seconds (0 disables
+    suspension) and retries budget changes that failed.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        if not startup_state.is_ready("timeplus"):
+            continue
+        try:
+            if idle_ttl:
+                await asyncio.to_thread(pipeline_manager.suspend_idle, idle_ttl)
+            await asyncio.to_thread(pipeline_manager.rebalance)
+        except Exception as e:
+            app_logger.error("Pipeline scheduler run failed: %s", e)
+
+def build_prompt_index():
+    """Index the prompt, the DDLs in samples/ and those of existing pipelines for prompt retrieval"""
+    start_time = time.time()
+    index = PromptIndex(
+        load_prompt(),
+        max_examples=int(os.getenv("PROMPT_MAX_EXAMPLES", "2")),
+        example_chars=int(os.getenv("PROMPT_EXAMPLE_CHARS", "800")),
+    )
+    index.add_samples("./samples")
+    # Oldest first, so that the newest pipelines are kept if there are more than fit
+    for question, ddl in reversed(pipeline_manager.metadata_manager.list_examples(index.max_indexed)):
+        index.add_example("pipeline", question, ddl)
+    ai_logger.info(
+        "Prompt index built in %.2fs: %s reference sections, %s example DDLs",
+        time.time() - start_time, len(index.sections), index.example_count
+    )
+    return index
+
+def load_llm_agents(size):
+    """Build the agent pools in a worker thread; this is where agno is first imported"""
+    global llm_agents
+    
+    if not os.getenv("OPENAI_API_KEY"):
+        ai_logger.error("OPENAI_API_KEY is not set, pipeline generation is unavailable")
+        startup_state.mark_failed("llm", "OPENAI_API_KEY is not set")
+        return
+    try:
+        prompt_index = build_prompt_index() if os.getenv("PROMPT_RETRIEVAL", "true").lower() == "true" else None
+        llm_agents = LLMAgents(size=size, prompt_index=prompt_index)
+        startup_state.mark_ready("llm")
+    except Exception as e:
+        ai_logger.error("Failed to load LLM agents: %s", e)
+        startup_state.mark_failed("llm", str(e))
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Initialize the application without waiting on external services.
+    
+    SQLite metadata, the job pool and the (lazily connecting) Timeplus pool
+    are set up before serving; Timeplus connectivity and the LLM agents are
+    established in the background and reported by /readyz.
+    """
+    global pipeline_manager, job_manager, ddl_validator, live_stats, generation_cache, preview_manager
+    
+    startup_state.record("imports")
+    try:
+        pipeline_manager = PipelineManager()
+        startup_state.mark_ready("sqlite")
+        job_workers = int(os.getenv("PIPELINE_JOB_WORKERS", "4"))
+        # Jobs are saved to SQLite so that any worker can report them
+        job_manager = JobManager(max_workers=job_workers, store=JobStore("pipelines.db"))
+        ddl_validator = DDLValidator(
+            pipeline_manager.pool if os.getenv("DDL_SERVER_CHECK", "true").lower() == "true" else None
+        )
+        live_stats = LiveStatsSampler(
+            pipeline_manager.get_stats,
+            interval_seconds=float(os.getenv("STATS_PUSH_INTERVAL", "3")),
+        )
+        preview_manager = PreviewManager(
+            pipeline_manager.pool, ttl_seconds=int(os.getenv("PREVIEW_TTL", "600")), db_path="pipelines.db"
+        )
+        if os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true":
+            generation_cache = GenerationCache(
+                db_path="pipelines.db",
+                max_entries=int(os.getenv("GENERATION_CACHE_SIZE", "256")),
+                max_db_entries=int(os.getenv("GENERATION_CACHE_DB_SIZE", "5000")),
+                ttl_seconds=int(os.getenv("GENERATION_CACHE_TTL", str(7 * 24 * 3600))),
+                revalidate_seconds=float(os.getenv("GENERATION_CACHE_REVALIDATE", "30")),
+            )
+    except Exception as e:
+        app_logger.error("Failed to initialize application: %s", e)
+        raise
+    
+    background_tasks = [
+        asyncio.create_task(wait_for_timeplus_connection(pipeline_manager.pool)),
+        # Enough agents for every job worker and for the largest batch LLM limit
+        asyncio.create_task(asyncio.to_thread(load_llm_agents, max(job_workers, MAX_BATCH_CONCURRENCY))),
+        asyncio.create_task(run_pipeline_scheduler(
+            float(os.getenv("SCHEDULER_INTERVAL", "60")), float(os.getenv("PIPELINE_IDLE_TTL", "0"))
+        )),
+    ]
+    startup_state.record("serving")
+    app_logger.info("Application initialized, connecting to Timeplus and loading LLM agents in the background")
+    
+    try:
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        await live_stats.stop()
+        job_manager.shutdown()
+        if startup_state.is_ready("timeplus"):
+            await asyncio.to_thread(preview_manager.close)
+
+def require_ready(*components):
+    """Route dependency that answers 503 until the given components are ready"""
+    def check():
+        not_ready = startup_state.not_ready(*components)
+        if not_ready:
+            raise HTTPException(status_code=503, detail={"not_ready": not_ready})
+    return Depends(check)
+
+# FastAPI app
+app = FastAPI(
+    title="Synthetic Data Pipeline API",
+    description="API for managing synthetic data pipelines",
+    lifespan=lifespan,
+)
+
+# Mount static files and templates
+app.mount("/static", StaticFiles(directory="static"), name="static")
+templates = Jinja2Templates(directory="templates")
+
+# High-frequency polling routes whose request lines are sampled
+POLL_PATHS = ("/jobs/", "/pipelines/stats", "/metrics", "/healthz", "/readyz")
+
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    start_time = time.time()
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:12]
+    token = request_id_var.set(request_id)
+    log_extra = {"sample_key": "poll"} if request.url.path.startswith(POLL_PATHS) else None
+    
     try:
+        # Log request
+        api_logger.info("Request: %s %s", request.method, request.url.path, extra=log_extra)
+        if api_logger.isEnabledFor(logging.DEBUG):
+            api_logger.debug("Headers: %s", dict(request.headers))
+        
+        # Process request
+        response = await call_next(request)
+        
+        # Log response
+        process_time = time.time() - start_time
+        api_logger.info("Response: %s (%.3fs)", response.status_code, process_time, extra=log_extra)
+        response.headers["X-Request-ID"] = request_id
+    finally:
+        request_id_var.reset(token)
+    
+    # Label by route template so pipeline IDs do not create a series each
+    route = request.scope.get("route")
+    HTTP_REQUEST_LATENCY.labels(
+        request.method, route.path if route is not None else "unmatched", str(response.status_code)
+    ).observe(process_time)
+    
+    return response
+
+def generate_random_stream(progress, question):
+    """
+    Run the LLM stages for a question.
+
+    Returns:
+        dict: {"name": base name, "ddl": random stream DDL}
+    """
+    if llm_agents.combined_generation:
+        # Name and DDL come back from a single LLM call
+        progress("generating")
+        api_logger.info("Starting combined AI name and DDL generation...")
+        base_name, ddl = generate_name_and_ddl(question, llm_agents.combined, llm_agents.prompt_index)
+        progress.emit("ddl_generated", stage="combined", ddl=ddl)
+        generator = SyntheticDataGenerator(name=base_name, question=question, agents=llm_agents.ddl,
+                                           prompt_index=llm_agents.prompt_index)
+    else:
         # Generate a random name for the pipeline
-        fake = faker.Faker()
-        name_generator = RandomNameGenerator()
-        name = f'rnd_{name_generator.get_name(pipeline_data.question)}_{fake.random_digit()}'
-        api_logger.info(f"Generated pipeline name: {name}")
+        progress("naming")
+        name_generator = RandomNameGenerator(llm_agents.name)
+        base_name = name_generator.get_name(question)
         
         # Generate pipeline using AI
+        progress("generating")
         api_logger.info("Starting AI pipeline generation...")
-        generator = SyntheticDataGenerator(
-            name=name,
-            question=pipeline_data.question
+        generator = SyntheticDataGenerator(name=f'rnd_{base_name}', question=question, agents=llm_agents.ddl,
+                                           prompt_index=llm_agents.prompt_index)
+        ddl = generator.generate_ddl(progress)
+    
+    # Catch bad LLM output before it reaches the pipeline DDLs
+    ddl = generator.validate_ddl(ddl, ddl_validator, max_ddl_repairs, progress)
+    return {"name": base_name, "ddl": ddl}
+
+# Attempts at a free name; suffixes get a digit longer every NAME_ATTEMPTS_PER_DIGIT attempts
+NAME_ATTEMPTS = 20
+NAME_ATTEMPTS_PER_DIGIT = 4
+
+def allocate_pipeline_name(base_name):
+    """
+    Reserve a pipeline name not used by any other pipeline, from any worker.
+
+    Names are rnd_<base name>_<random number>; the number starts at one digit
+    and grows while the names tried are taken.
+
+    Raises:
+        RuntimeError: If no free name was found
+    """
+    for attempt in range(NAME_ATTEMPTS):
+        digits = 1 + attempt // NAME_ATTEMPTS_PER_DIGIT
+        name = f'rnd_{base_name}_{random.randint(0, 10 ** digits - 1)}'
+        if pipeline_manager.metadata_manager.reserve_name(name):
+            return name
+    raise RuntimeError(f"No free pipeline name for {base_name} after {NAME_ATTEMPTS} attempts")
+
+def prepare_pipeline(progress, question, use_cache=True, output=None, target_eps=None):
+    """
+    Run the generation stages (cache lookup or LLM) for a pipeline.
+
+    Returns:
+        dict: The named pipeline definition plus its cache bookkeeping, to be
+              passed to create_prepared_pipeline()
+    """
+    cache_key = None
+    cached = False
+    if use_cache and generation_cache is not None:
+        cache_key, generated, cached = generation_cache.get_or_generate(
+            question, prompt_version(), lambda: generate_random_stream(progress, question)
+        )
+    else:
+        generated = generate_random_stream(progress, question)
+    
+    name = allocate_pipeline_name(generated["name"])
+    api_logger.info("Generated pipeline name: %s (cached: %s)", name, cached)
+    if cached:
+        progress.emit("ddl_generated", stage="cache", ddl=generated["ddl"])
+    try:
+        generator = SyntheticDataGenerator(name=name, question=question, agents=llm_agents.ddl, output=output,
+                                           target_eps=target_eps)
+        pipeline = generator.build_pipeline(rename_random_stream(generated["ddl"], name))
+    except Exception:
+        pipeline_manager.metadata_manager.release_name(name)
+        raise
+    return {
+        "name": name,
+        "question": question,
+        "pipeline": pipeline,
+        "cache_key": cache_key,
+        "cached": cached,
+    }
+
+def create_prepared_pipeline(progress, prepared):
+    """Run the Timeplus DDL stage for a pipeline returned by prepare_pipeline()"""
+    progress("creating")
+    api_logger.info("Creating pipeline in database...")
+    try:
+        pipeline_id = pipeline_manager.create(prepared["pipeline"], prepared["name"])
+    except Exception:
+        record_generation_failure("timeplus")
+        pipeline_manager.metadata_manager.release_name(prepared["name"])
+        # Do not keep serving a DDL that Timeplus rejected
+        if prepared["cache_key"] is not None:
+            generation_cache.invalidate(prepared["cache_key"])
+        raise
+
+    api_logger.info("Pipeline created successfully: %s", pipeline_id)
+    if llm_agents is not None and llm_agents.prompt_index is not None:
+        llm_agents.prompt_index.add_example(
+            "pipeline", prepared["question"], prepared["pipeline"]["random_stream"]["ddl"]
+        )
+    return {
+        "id": pipeline_id,
+        "name": prepared["name"],
+        "question": prepared["question"],
+        "cached": prepared["cached"],
+    }
+
+def run_pipeline_creation(progress, question, use_cache=True, output=None, target_eps=None):
+    """Generate and create a pipeline, reporting each stage to the job manager"""
+    prepared = prepare_pipeline(progress, question, use_cache, output, target_eps)
+    return create_prepared_pipeline(progress, prepared)
+
+@app.post("/pipelines", response_model=dict, status_code=202, dependencies=[require_ready("timeplus", "llm")])
+async def create_pipeline(pipeline_data: PipelineCreate):
+    """Start creating a new synthetic data pipeline in the background"""
+    api_logger.info("POST /pipelines - Creating new pipeline")
+    api_logger.debug("Request data: %s", pipeline_data)
+    
+    try:
+        job_id = job_manager.submit(
+            "create_pipeline", run_pipeline_creation, pipeline_data.question,
+            use_cache=pipeline_data.use_cache, output=pipeline_data.output,
+            target_eps=pipeline_data.target_eps
         )
-        pipeline = generator.generate_pipeline()
-        
-        # Create pipeline in database
-        api_logger.info("Creating pipeline in database...")
-        pipeline_id = pipeline_manager.create(pipeline, name)
         
         response_data = {
-            "id": pipeline_id,
-            "name": name,
+            "job_id": job_id,
+            "status": "queued",
             "question": pipeline_data.question,
-            "message": "Pipeline created successfully"
+            "message": "Pipeline creation started"
         }
         
-        api_logger.info(f"Pipeline created successfully: {pipeline_id}")
-        api_logger.debug(f"Response data: {response_data}")
-        
+        api_logger.info("Pipeline creation job queued: %s", job_id)
         return response_data
         
     except Exception as e:
-        api_logger.error(f"Failed to create pipeline: {e}")
-        api_logger.error(f"Exception type: {type(e).__name__}")
+        api_logger.error("Failed to queue pipeline creation: %s", e)
+        api_logger.error("Exception type: %s", type(e).__name__)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/jobs/{job_id}", response_model=dict)
+async def get_job(job_id: str):
+    """Get the status and stage-by-stage progress of a background job"""
+    api_logger.debug("GET /jobs/%s - Getting job status", job_id)
+    
+    try:
+        return await run_in_threadpool(job_manager.get, job_id)
+    except ValueError as e:
+        api_logger.warning("Job not found: %s", job_id)
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Server-sent events of a job: stage changes, the DDL while the LLM writes
+    it, and finally a completed or failed event, after which the stream ends.
+
+    Events already emitted are replayed first, skipping those up to the
+    Last-Event-ID header of a reconnecting client.
+    """
+    api_logger.debug("GET /jobs/%s/events - Streaming job events", job_id)
+    
+    try:
+        past_events, queue = await job_manager.subscribe(job_id)
+    except ValueError as e:
+        api_logger.warning("Job not found: %s", job_id)
+        raise HTTPException(status_code=404, detail=str(e))
+    last_event_id = request.headers.get("last-event-id", "")
+    last_seq = int(last_event_id) if last_event_id.isdigit() else -1
+    
+    def format_event(event):
+        return f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+    
+    async def event_stream():
+        try:
+            for event in past_events:
+                if event["seq"] > last_seq:
+                    yield format_event(event)
+                if event["type"] in FINAL_EVENTS:
+                    return
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(event)
+                if event["type"] in FINAL_EVENTS:
+                    return
+        finally:
+            job_manager.unsubscribe(job_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/pipelines/batch", dependencies=[require_ready("timeplus", "llm")])
+async def create_pipelines_batch(batch_data: PipelineBatchCreate):
+    """
+    Create several pipelines with bounded parallelism.
+
+    Generation and DDL creation are limited separately, and each item's result
+    is streamed back as one JSON line as soon as it finishes. A failing item
+    does not abort the others.
+    """
+    api_logger.info(
+        "POST /pipelines/batch - Creating %s pipelines (llm: %s, timeplus: %s)",
+        len(batch_data.questions), batch_data.llm_concurrency, batch_data.timeplus_concurrency
+    )
+    
+    llm_limit = asyncio.Semaphore(batch_data.llm_concurrency)
+    timeplus_limit = asyncio.Semaphore(batch_data.timeplus_concurrency)
+    
+    ignore_progress = NullProgress()
+    
+    async def create_item(index, question):
+        start_time = time.time()
+        try:
+            async with llm_limit:
+                prepared = await asyncio.to_thread(
+                    prepare_pipeline, ignore_progress, question, batch_data.use_cache, batch_data.output,
+                    batch_data.target_eps
+                )
+            async with timeplus_limit:
+                result = await asyncio.to_thread(create_prepared_pipeline, ignore_progress, prepared)
+            return {"index": index, "status": "completed", "duration": round(time.time() - start_time, 3), **result}
+        except Exception as e:
+            api_logger.error("Batch item %s failed: %s", index, e)
+            return {"index": index, "status": "failed", "question": question, "error": str(e),
+                    "duration": round(time.time() - start_time, 3)}
+    
+    async def stream_results():
+        tasks = [asyncio.create_task(create_item(i, q)) for i, q in enumerate(batch_data.questions)]
+        completed = 0
+        for finished in asyncio.as_completed(tasks):
+            item = await finished
+            completed += item["status"] == "completed"
+            yield json.dumps(item) + "\n"
+        yield json.dumps({"summary": {"total": len(tasks), "completed": completed,
+                                      "failed": len(tasks) - completed}}) + "\n"
+        api_logger.info("Batch finished: %s/%s pipelines created", completed, len(tasks))
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @app.get("/pipelines", response_model=dict)
 async def list_pipelines():
     """List all pipelines"""
-    api_logger.info("GET /pipelines - Listing all pipelines")
+    api_logger.debug("GET /pipelines - Listing all pipelines")
     
     try:
-        pipelines = pipeline_manager.list_all()
+        pipelines = await run_in_threadpool(pipeline_manager.list_all)
         response_data = {"pipelines": pipelines}
         
-        api_logger.info(f"Listed {len(pipelines)} pipelines")
-        api_logger.debug(f"Pipeline IDs: {[p['id'] for p in pipelines]}")
+        api_logger.info("Listed %d pipelines", len(pipelines))
+        if api_logger.isEnabledFor(logging.DEBUG):
+            api_logger.debug("Pipeline IDs: %s", [p['id'] for p in pipelines])
         
         return response_data
         
     except Exception as e:
-        api_logger.error(f"Failed to list pipelines: {e}")
+        api_logger.error("Failed to list pipelines: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/pipelines/stats", response_model=dict)
+async def get_pipeline_stats():
+    """Get write counts and event rates of all pipelines in one call"""
+    api_logger.debug("GET /pipelines/stats - Getting stats for all pipelines")
+    
+    try:
+        stats = await run_in_threadpool(pipeline_manager.get_stats)
+        return {"timestamp": time.time(), "pipelines": stats}
+    except Exception as e:
+        api_logger.error("Failed to get pipeline stats: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/pipelines/stats/stream")
+async def stream_pipeline_stats(request: Request):
+    """Server-sent events with write counts and event rates of all pipelines"""
+    api_logger.info("GET /pipelines/stats/stream - Subscribing to live stats")
+    return StreamingResponse(
+        live_stats.stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/pipelines/budget", response_model=dict)
+async def get_eps_budget():
+    """Global eps budget and the requested and applied rates of all running pipelines"""
+    try:
+        return await run_in_threadpool(pipeline_manager.budget_status)
+    except Exception as e:
+        api_logger.error("Failed to get eps budget status: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/pipelines/{pipeline_id}", response_model=dict)
 async def get_pipeline(pipeline_id: str):
     """Get a specific pipeline by ID"""
-    api_logger.info(f"GET /pipelines/{pipeline_id} - Getting pipeline details")
+    api_logger.debug("GET /pipelines/%s - Getting pipeline details", pipeline_id)
     
     try:
-        pipeline = pipeline_manager.get(pipeline_id)
+        pipeline = await pipeline_manager.aget(pipeline_id)
         
-        api_logger.info(f"Retrieved pipeline: {pipeline['name']}")
-        api_logger.debug(f"Pipeline components: {list(pipeline['pipeline'].keys())}")
+        api_logger.info("Retrieved pipeline: %s", pipeline["name"])
+        api_logger.debug("Pipeline components: %s", list(pipeline['pipeline']))
         
         return pipeline
         
     except ValueError as e:
-        api_logger.warning(f"Pipeline not found: {pipeline_id}")
+        api_logger.warning("Pipeline not found: %s", pipeline_id)
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        api_logger.error(f"Failed to get pipeline {pipeline_id}: {e}")
+        api_logger.error("Failed to get pipeline %s: %s", pipeline_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.delete("/pipelines/{pipeline_id}")
+@app.put("/pipelines/{pipeline_id}/rate", response_model=dict, dependencies=[require_ready("timeplus")])
+async def set_pipeline_rate(pipeline_id: str, rate_data: PipelineRate):
+    """Change the target events per second of a running sharded pipeline"""
+    api_logger.info("PUT /pipelines/%s/rate - Setting target rate to %s eps", pipeline_id, rate_data.target_eps)
+    
+    try:
+        pipeline_info = await run_in_threadpool(pipeline_manager.metadata_manager.get, pipeline_id)
+        if 'shards' not in pipeline_info['pipeline']:
+            raise HTTPException(status_code=400, detail="Only pipelines created with target_eps can change their rate")
+        if pipeline_info['state'] != 'running':
+            raise HTTPException(status_code=409, detail=f"Pipeline is {pipeline_info['state']}, resume it first")
+        
+        pipeline = await run_in_threadpool(pipeline_manager.set_rate, pipeline_id, rate_data.target_eps)
+        
+        response_data = {
+            "id": pipeline_id,
+            "target_eps": pipeline["target_eps"],
+            "shards": [{"name": shard["random_stream"]["name"], "eps": shard["eps"]} for shard in pipeline["shards"]]
+        }
+        api_logger.info("Pipeline rate updated: %s (%s shards)", pipeline_id, len(pipeline['shards']))
+        return response_data
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        api_logger.warning("Pipeline not found for rate change: %s", pipeline_id)
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        api_logger.error("Failed to set rate of pipeline %s: %s", pipeline_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+EXPORT_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+def export_path(export_id, pipeline_name, file_format):
+    return os.path.join(EXPORT_DIR, f"{export_id}_{pipeline_name}{EXPORT_FORMATS[file_format]}")
+
+def find_export(export_id):
+    """
+    Returns:
+        str: Path of a finished export file
+
+    Raises:
+        ValueError: If there is no finished export with this ID
+    """
+    if EXPORT_ID_PATTERN.match(export_id) and os.path.isdir(EXPORT_DIR):
+        for file_name in os.listdir(EXPORT_DIR):
+            if file_name.startswith(f"{export_id}_") and file_name.endswith(tuple(EXPORT_FORMATS.values())):
+                return os.path.join(EXPORT_DIR, file_name)
+    raise ValueError(f"Export with ID {export_id} not found")
+
+def run_pipeline_export(progress, pipeline_id, pipeline_name, export_id, rows, export_data):
+    """Export rows of a pipeline to a file, reporting progress after every row group"""
+    progress("exporting")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    
+    def on_progress(written):
+        progress.emit("export_progress", rows=written, total=rows)
+    
+    stats = pipeline_manager.export(
+        pipeline_id, rows, export_path(export_id, pipeline_name, export_data.format), export_data.format,
+        export_data.row_group_size, on_progress
+    )
+    api_logger.info("Exported %s rows of pipeline %s in %ss", stats['rows'], pipeline_id, stats['seconds'])
+    return {
+        "export_id": export_id,
+        "pipeline_id": pipeline_id,
+        "format": export_data.format,
+        "download_url": f"/exports/{export_id}",
+        "rows_per_second": round(stats["rows"] / stats["seconds"]) if stats["seconds"] else None,
+        **stats,
+    }
+
+def epoch_ms(value):
+    """Milliseconds since the epoch of a datetime; naive datetimes are taken as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+def run_pipeline_backfill(progress, pipeline_id, rows, start_ms, end_ms, backfill_data):
+    """Backfill a pipeline, reporting progress and throughput after every chunk"""
+    progress("backfilling")
+    
+    def on_progress(written, seconds, event_time_ms):
+        progress.emit(
+            "backfill_progress", rows=written, total=rows,
+            rows_per_second=round(written / seconds) if seconds else None,
+            event_time=datetime.fromtimestamp(event_time_ms / 1000, timezone.utc).isoformat(),
+        )
+    
+    stats = pipeline_manager.backfill(
+        pipeline_id, rows, start_ms, end_ms, backfill_data.chunk_rows, backfill_data.live, on_progress
+    )
+    return {
+        "pipeline_id": pipeline_id,
+        "rows_per_second": round(stats["rows"] / stats["seconds"]) if stats["seconds"] else None,
+        **stats,
+    }
+
+def generate_preview_ddl(question, use_cache=True):
+    """The random stream DDL for a question, from the generation cache or the LLM"""
+    if use_cache and generation_cache is not None:
+        _, generated, _ = generation_cache.get_or_generate(
+            question, prompt_version(), lambda: generate_random_stream(NullProgress(), question)
+        )
+    else:
+        generated = generate_random_stream(NullProgress(), question)
+    return generated["ddl"]
+
+@app.post("/pipelines/{pipeline_id}/pause", response_model=dict, dependencies=[require_ready("timeplus")])
+async def pause_pipeline(pipeline_id: str):
+    """Stop a pipeline's materialized views, keeping its streams and metadata"""
+    api_logger.info("POST /pipelines/%s/pause - Pausing pipeline", pipeline_id)
+    
+    try:
+        state = await run_in_threadpool(pipeline_manager.pause, pipeline_id)
+        return {"id": pipeline_id, "state": state}
+    except ValueError as e:
+        api_logger.warning("Pipeline not found for pause: %s", pipeline_id)
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        api_logger.error("Failed to pause pipeline %s: %s", pipeline_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/pipelines/{pipeline_id}/resume", response_model=dict, dependencies=[require_ready("timeplus")])
+async def resume_pipeline(pipeline_id: str):
+    """Restart a paused or suspended pipeline"""
+    api_logger.info("POST /pipelines/%s/resume - Resuming pipeline", pipeline_id)
+    
+    try:
+        state = await run_in_threadpool(pipeline_manager.resume, pipeline_id)
+        return {"id": pipeline_id, "state": state}
+    except ValueError as e:
+        api_logger.warning("Pipeline not found for resume: %s", pipeline_id)
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        api_logger.error("Failed to resume pipeline %s: %s", pipeline_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/previews", response_model=dict, dependencies=[require_ready("timeplus")])
+async def create_preview(preview_data: PreviewCreate):
+    """
+    Sample rows and per-column stats of a random stream DDL without creating a pipeline.
+
+    With a question instead of a DDL, the DDL is generated first (through the
+    generation cache, so a later POST /pipelines for the same question reuses it).
+    """
+    api_logger.info("POST /previews - Previewing %s rows (keep: %s)", preview_data.rows, preview_data.keep)
+    
+    if (preview_data.ddl is None) == (preview_data.question is None):
+        raise HTTPException(status_code=400, detail="Specify exactly one of ddl and question")
+    
+    try:
+        ddl = preview_data.ddl
+        if ddl is None:
+            not_ready = startup_state.not_ready("llm")
+            if not_ready:
+                raise HTTPException(status_code=503, detail={"not_ready": not_ready})
+            ddl = await run_in_threadpool(generate_preview_ddl, preview_data.question, preview_data.use_cache)
+        
+        return await run_in_threadpool(
+            preview_manager.create, ddl, preview_data.rows, preview_data.timeout_seconds, preview_data.keep
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        api_logger.warning("Preview rejected: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        api_logger.error("Failed to preview DDL: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/previews/{preview_id}/sample", response_model=dict, dependencies=[require_ready("timeplus")])
+async def sample_preview(preview_id: str, sample_data: PreviewSample):
+    """Take a new sample of a kept preview"""
+    api_logger.info("POST /previews/%s/sample - Sampling %s rows", preview_id, sample_data.rows)
+    
+    try:
+        return await run_in_threadpool(
+            preview_manager.sample, preview_id, sample_data.rows, sample_data.timeout_seconds
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        api_logger.error("Failed to sample preview %s: %s", preview_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/previews/{preview_id}", dependencies=[require_ready("timeplus")])
+async def delete_preview(preview_id: str):
+    """Drop the stream of a kept preview"""
+    api_logger.info("DELETE /previews/%s - Deleting preview", preview_id)
+    
+    try:
+        await run_in_threadpool(preview_manager.delete, preview_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"message": f"Preview {preview_id} deleted"}
+
+@app.post("/pipelines/{pipeline_id}/exports", response_model=dict, status_code=202,
+          dependencies=[require_ready("timeplus")])
+async def export_pipeline(pipeline_id: str, export_data: PipelineExport):
+    """Start exporting rows of a pipeline's schema to a Parquet or CSV file in the background"""
+    api_logger.info("POST /pipelines/%s/exports - Exporting to %s", pipeline_id, export_data.format)
+    
+    if (export_data.rows is None) == (export_data.duration_seconds is None):
+        raise HTTPException(status_code=400, detail="Specify exactly one of rows and duration_seconds")
+    if export_data.format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow, install it or use csv")
+    
+    try:
+        pipeline_info = await run_in_threadpool(pipeline_manager.metadata_manager.get, pipeline_id)
+    except ValueError as e:
+        api_logger.warning("Pipeline not found for export: %s", pipeline_id)
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    rows = export_data.rows
+    if rows is None:
+        rows = math.ceil(pipeline_eps(pipeline_info['pipeline']) * export_data.duration_seconds)
+        if rows > MAX_EXPORT_ROWS:
+            raise HTTPException(status_code=400, detail=f"Export of {rows} rows exceeds the limit of {MAX_EXPORT_ROWS}")
+    
+    export_id = uuid.uuid4().hex
+    job_id = job_manager.submit(
+        "export_pipeline", run_pipeline_export, pipeline_id, pipeline_info['name'], export_id, rows, export_data
+    )
+    api_logger.info("Pipeline export job queued: %s", job_id)
+    return {
+        "job_id": job_id,
+        "export_id": export_id,
+        "status": "queued",
+        "rows": rows,
+        "download_url": f"/exports/{export_id}",
+    }
+
+@app.post("/pipelines/{pipeline_id}/backfills", response_model=dict, status_code=202,
+          dependencies=[require_ready("timeplus")])
+async def backfill_pipeline(pipeline_id: str, backfill_data: PipelineBackfill):
+    """Start writing rows with historical event times to a pipeline's topic in the background"""
+    api_logger.info("POST /pipelines/%s/backfills - Backfilling from %s", pipeline_id, backfill_data.start_time)
+    
+    start_ms = epoch_ms(backfill_data.start_time)
+    end_ms = epoch_ms(backfill_data.end_time or datetime.now(timezone.utc))
+    if start_ms >= end_ms:
+        raise HTTPException(status_code=400, detail="start_time must be before end_time")
+    
+    try:
+        pipeline_info = await run_in_threadpool(pipeline_manager.metadata_manager.get, pipeline_id)
+    except ValueError as e:
+        api_logger.warning("Pipeline not found for backfill: %s", pipeline_id)
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    rows = backfill_data.rows
+    if rows is None:
+        rows = math.ceil(pipeline_eps(pipeline_info['pipeline']) * (end_ms - start_ms) / 1000)
+        if rows > MAX_BACKFILL_ROWS:
+            raise HTTPException(status_code=400, detail=f"Backfill of {rows} rows exceeds the limit of {MAX_BACKFILL_ROWS}")
+    
+    job_id = job_manager.submit(
+        "backfill_pipeline", run_pipeline_backfill, pipeline_id, rows, start_ms, end_ms, backfill_data
+    )
+    api_logger.info("Pipeline backfill job queued: %s", job_id)
+    return {"job_id": job_id, "status": "queued", "rows": rows}
+
+@app.get("/exports/{export_id}")
+async def download_export(export_id: str):
+    """Download a finished export file"""
+    api_logger.info("GET /exports/%s - Downloading export", export_id)
+    
+    try:
+        path = find_export(export_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    # Offer the file under the pipeline name
+    return FileResponse(path, filename=os.path.basename(path)[len(export_id) + 1:])
+
+@app.delete("/exports/{export_id}")
+async def delete_export(export_id: str):
+    """Delete a finished export file"""
+    api_logger.info("DELETE /exports/%s - Deleting export", export_id)
+    
+    try:
+        path = find_export(export_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    await asyncio.to_thread(os.remove, path)
+    return {"message": f"Export {export_id} deleted"}
+
+@app.delete("/pipelines/{pipeline_id}", dependencies=[require_ready("timeplus")])
 async def delete_pipeline(pipeline_id: str):
     """Delete a pipeline by ID"""
-    api_logger.info(f"DELETE /pipelines/{pipeline_id} - Deleting pipeline")
+    api_logger.info("DELETE /pipelines/%s - Deleting pipeline", pipeline_id)
     
     try:
-        pipeline_manager.delete(pipeline_id)
+        await run_in_threadpool(pipeline_manager.delete, pipeline_id)
         
         response_data = {"message": f"Pipeline {pipeline_id} deleted successfully"}
-        api_logger.info(f"Pipeline deleted successfully: {pipeline_id}")
+        api_logger.info("Pipeline deleted successfully: %s", pipeline_id)
         
         return response_data
         
     except ValueError as e:
-        api_logger.warning(f"Pipeline not found for deletion: {pipeline_id}")
+        api_logger.warning("Pipeline not found for deletion: %s", pipeline_id)
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        api_logger.error(f"Failed to delete pipeline {pipeline_id}: {e}")
+        api_logger.error("Failed to delete pipeline %s: %s", pipeline_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics; per-pipeline gauges are refreshed on every scrape"""
+    try:
+        stats = await asyncio.to_thread(pipeline_manager.get_stats)
+        names = {summary["id"]: summary["name"] for summary in await asyncio.to_thread(pipeline_manager.list_all)}
+        update_pipeline_gauges(stats, names)
+    except Exception as e:
+        # Still expose the process-level metrics when Timeplus is unavailable
+        api_logger.error("Failed to refresh pipeline metrics: %s", e)
+    
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+READY_CHECK_TIMEOUT = float(os.getenv("READY_CHECK_TIMEOUT", "2"))
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop responds; dependencies are not checked"""
+    return {"status": "ok", "uptime_seconds": round(startup_state.elapsed(), 3)}
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness of SQLite, Timeplus and the LLM configuration.
+    
+    Components that finished starting are checked again live, with a short
+    timeout. Answers 503 until every component is ready, and reports the
+    cold start timings.
+    """
+    state = startup_state.snapshot()
+    components = state["components"]
+    
+    live_checks = {"sqlite": pipeline_manager.metadata_manager.ping}
+    if components["timeplus"]["status"] == "ready":
+        live_checks["timeplus"] = pipeline_manager.pool.ping
+    for component, check in live_checks.items():
+        try:
+            if not await asyncio.wait_for(asyncio.to_thread(check), timeout=READY_CHECK_TIMEOUT):
+                raise RuntimeError("unexpected response")
+        except asyncio.TimeoutError:
+            components[component].update(status="failed", error=f"no response within {READY_CHECK_TIMEOUT}s")
+        except Exception as e:
+            components[component].update(status="failed", error=str(e))
+    
+    ready = all(component["status"] == "ready" for component in components.values())
+    state["status"] = "ready" if ready else "not_ready"
+    return JSONResponse(state, status_code=200 if ready else 503)
+
 @app.get("/", response_class=HTMLResponse)
 async def get_manager_page(request: Request):
     """Serve the pipeline management HTML page"""
@@ -629,5 +2363,8 @@ async def get_manager_page(request: Request):
 
 if __name__ == "__main__":
     import uvicorn
-    app_logger.info("Starting application server on port 5002")
-    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "5002")))
+    port = int(os.getenv("PORT", "5002"))
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    app_logger.info("Starting application server on port %s with %s worker(s)", port, workers)
+    # Every worker process imports the app on its own and shares pipelines.db with the others
+    uvicorn.run("main:app" if workers > 1 else app, host="0.0.0.0", port=port, workers=workers)
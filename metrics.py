@@ -0,0 +1,120 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+app_logger = logging.getLogger("pipeline_app")
+
+LLM_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+FIRST_TOKEN_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+QUERY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LLM_LATENCY = Histogram(
+    "llm_generation_seconds", "Latency of LLM calls by generation stage and prompt", ["stage", "prompt"],
+    buckets=LLM_BUCKETS,
+)
+LLM_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Time until a streamed LLM call returned its first content",
+    ["stage", "prompt"], buckets=FIRST_TOKEN_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "LLM tokens used, by generation stage, prompt and direction", ["stage", "prompt", "direction"]
+)
+LLM_TOKENS_PER_CALL = Histogram(
+    "llm_tokens_per_call", "LLM tokens per call, by generation stage, prompt and direction",
+    ["stage", "prompt", "direction"], buckets=TOKEN_BUCKETS,
+)
+PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens_estimate", "Estimated instruction and context tokens of a generation, full prompt vs retrieved",
+    ["prompt"], buckets=TOKEN_BUCKETS,
+)
+GENERATION_FAILURES = Counter("generation_failures_total", "Failed pipeline generations by cause", ["cause"])
+
+TIMEPLUS_DDL_LATENCY = Histogram(
+    "timeplus_ddl_seconds", "Latency of pipeline DDL statements", ["operation", "object"], buckets=QUERY_BUCKETS
+)
+WRITE_COUNT_QUERY_LATENCY = Histogram(
+    "write_count_query_seconds", "Latency of write count queries", ["mode"], buckets=QUERY_BUCKETS
+)
+
+HTTP_REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"],
+    buckets=QUERY_BUCKETS,
+)
+
+STARTUP_SECONDS = Gauge("app_startup_seconds", "Seconds from process start until a startup phase was reached", ["phase"])
+
+PIPELINE_EPS = Gauge("pipeline_events_per_second", "Achieved events per second of a pipeline", ["pipeline_id", "name"])
+PIPELINE_EVENTS = Gauge("pipeline_events_total", "Events written by a pipeline", ["pipeline_id", "name"])
+
+
+@contextmanager
+def timed(histogram, *labels):
+    """Observe the duration of the with-block, whether it succeeds or raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - start)
+
+
+def token_count(value):
+    # agno reports per-message token lists; older versions report plain numbers
+    if isinstance(value, (list, tuple)):
+        return sum(v or 0 for v in value)
+    return value or 0
+
+
+def record_llm_call(stage, seconds, result, prompt="full"):
+    """
+    Record latency and token usage of one agent run.
+
+    prompt is "retrieved" for runs whose instructions were slimmed by prompt
+    retrieval, so both prompt variants can be compared.
+    """
+    LLM_LATENCY.labels(stage, prompt).observe(seconds)
+    run_metrics = getattr(result, "metrics", None) or {}
+    for direction in ("input", "output"):
+        tokens = token_count(run_metrics.get(f"{direction}_tokens"))
+        if tokens:
+            LLM_TOKENS.labels(stage, prompt, direction).inc(tokens)
+            LLM_TOKENS_PER_CALL.labels(stage, prompt, direction).observe(tokens)
+
+
+def record_prompt_selection(full_tokens, prompt_tokens):
+    PROMPT_TOKENS.labels("full").observe(full_tokens)
+    PROMPT_TOKENS.labels("retrieved").observe(prompt_tokens)
+
+
+def record_first_token(stage, seconds, prompt="full"):
+    LLM_FIRST_TOKEN.labels(stage, prompt).observe(seconds)
+
+
+def record_generation_failure(cause):
+    GENERATION_FAILURES.labels(cause).inc()
+
+
+def update_pipeline_gauges(stats, names):
+    """
+    Replace the per-pipeline gauges with fresh stats.
+
+    Args:
+        stats (dict): pipeline id -> {"write_count", "eps"}
+        names (dict): pipeline id -> pipeline name
+    """
+    PIPELINE_EPS.clear()
+    PIPELINE_EVENTS.clear()
+    for pipeline_id, pipeline_stats in stats.items():
+        name = names.get(pipeline_id, "")
+        PIPELINE_EPS.labels(pipeline_id, name).set(pipeline_stats["eps"])
+        PIPELINE_EVENTS.labels(pipeline_id, name).set(pipeline_stats["write_count"])
+
+
+def render_metrics():
+    """
+    Returns:
+        tuple: (body, content type) of the Prometheus text exposition
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
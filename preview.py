@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+import uuid
+
+from proton_driver import errors
+
+from ddl_validator import CREATE_RANDOM_STREAM, lint_random_stream_ddl
+from sqlite_pipeline_manager import connect, enable_wal
+
+db_logger = logging.getLogger("database")
+
+
+def column_stats(column_types, rows):
+    """
+    Summary statistics of every column of a sample.
+
+    Args:
+        column_types (list): (name, type) pairs as returned by execute_iter(with_column_types=True)
+        rows (list): Sampled rows
+
+    Returns:
+        list: {"name", "type", "null_rate", "distinct", "min", "max"} per column;
+              min and max are None for values that cannot be ordered
+    """
+    stats = []
+    for index, (name, column_type) in enumerate(column_types):
+        values = [row[index] for row in rows]
+        present = [value for value in values if value is not None]
+        try:
+            distinct = len(set(present))
+        except TypeError:
+            # Arrays and maps are not hashable
+            distinct = len({repr(value) for value in present})
+        try:
+            low, high = (min(present), max(present)) if present else (None, None)
+        except TypeError:
+            low, high = None, None
+        stats.append({
+            "name": name,
+            "type": column_type,
+            "null_rate": round(1 - len(present) / len(values), 4) if values else None,
+            "distinct": distinct,
+            "min": low,
+            "max": high,
+        })
+    return stats
+
+
+class PreviewManager:
+    """
+    Sample previews of random stream DDLs before a pipeline is created.
+
+    A preview creates the stream under a temporary name and reads a bounded
+    sample from it; no external stream, MV or Kafka topic is involved. The
+    stream is dropped right away unless the preview is kept, in which case it
+    can be sampled again until it is deleted or expires after ttl_seconds.
+    Kept previews are recorded in SQLite, so any worker can sample or delete them.
+    """
+
+    def __init__(self, pool, ttl_seconds=600, db_path="pipelines.db"):
+        self.pool = pool
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        # Kept previews created by this process, dropped on close()
+        self._owned = set()
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def _init_db(self):
+        enable_wal(self.db_path)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS previews (
+                    id TEXT PRIMARY KEY,
+                    stream TEXT NOT NULL,
+                    ddl TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def create(self, ddl, rows, timeout_seconds, keep=False):
+        """
+        Returns:
+            dict: The sample (see sample()) plus the preview id and stream name
+
+        Raises:
+            ValueError: If the DDL is invalid or rejected by Timeplus
+        """
+        self.drop_expired()
+        lint_errors, _ = lint_random_stream_ddl(ddl)
+        if lint_errors:
+            raise ValueError("; ".join(lint_errors))
+
+        preview_id = uuid.uuid4().hex
+        stream_name = f"preview_{preview_id[:12]}"
+        preview_ddl = CREATE_RANDOM_STREAM.sub(lambda m: f"CREATE RANDOM STREAM {stream_name}", ddl, count=1)
+        try:
+            self.pool.execute(preview_ddl, retry=False)
+        except errors.ServerException as e:
+            raise ValueError(f"Timeplus rejected the DDL: {e}")
+
+        try:
+            result = self._sample(stream_name, rows, timeout_seconds)
+        except Exception:
+            self._drop_stream(stream_name)
+            raise
+
+        if keep:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO previews (id, stream, ddl, expires_at) VALUES (?, ?, ?, ?)",
+                    (preview_id, stream_name, ddl, time.time() + self.ttl_seconds),
+                )
+            with self._lock:
+                self._owned.add(preview_id)
+        else:
+            self._drop_stream(stream_name)
+        return {"preview_id": preview_id if keep else None, "stream": stream_name, "kept": keep, "ddl": ddl, **result}
+
+    def sample(self, preview_id, rows, timeout_seconds):
+        """
+        Sample a kept preview again and extend its expiry.
+
+        Raises:
+            ValueError: If there is no kept preview with this ID
+        """
+        with self._connect() as conn:
+            preview = conn.execute("SELECT stream, ddl FROM previews WHERE id = ?", (preview_id,)).fetchone()
+            if preview is None:
+                raise ValueError(f"Preview with ID {preview_id} not found")
+            conn.execute(
+                "UPDATE previews SET expires_at = ? WHERE id = ?", (time.time() + self.ttl_seconds, preview_id)
+            )
+        stream_name, ddl = preview
+        result = self._sample(stream_name, rows, timeout_seconds)
+        return {"preview_id": preview_id, "stream": stream_name, "kept": True, "ddl": ddl, **result}
+
+    def _sample(self, stream_name, rows, timeout_seconds):
+        """
+        Read at most rows rows within timeout_seconds.
+
+        The server stops the query at the time limit and returns what it has
+        generated so far, so the iterator is always read to its end.
+        """
+        start_time = time.time()
+        settings = {
+            "max_block_size": rows,
+            "max_execution_time": timeout_seconds,
+            "timeout_overflow_mode": "break",
+        }
+        with self.pool.connection() as timeplus_client:
+            result = timeplus_client.execute_iter(
+                f"SELECT * FROM table({stream_name}) LIMIT {int(rows)}", with_column_types=True, settings=settings
+            )
+            column_types = next(result)
+            sample = list(result)
+
+        elapsed = time.time() - start_time
+        db_logger.info(f"Sampled {len(sample)} rows of {stream_name} in {elapsed:.3f}s")
+        return {
+            "rows_sampled": len(sample),
+            "elapsed_seconds": round(elapsed, 3),
+            "columns": column_stats(column_types, sample),
+            "sample": [dict(zip((name for name, _ in column_types), row)) for row in sample],
+        }
+
+    def delete(self, preview_id):
+        """
+        Raises:
+            ValueError: If there is no kept preview with this ID
+        """
+        streams = self._forget("id = ?", (preview_id,))
+        if not streams:
+            raise ValueError(f"Preview with ID {preview_id} not found")
+        self._drop_stream(streams[0])
+
+    def drop_expired(self):
+        for stream_name in self._forget("expires_at < ?", (time.time(),)):
+            db_logger.info(f"Preview stream {stream_name} expired")
+            self._drop_stream(stream_name)
+
+    def close(self):
+        """Drop the kept preview streams created by this process"""
+        with self._lock:
+            owned = list(self._owned)
+            self._owned.clear()
+        if owned:
+            for stream_name in self._forget(f"id IN ({','.join('?' * len(owned))})", owned):
+                self._drop_stream(stream_name)
+
+    def _forget(self, condition, params):
+        """
+        Remove the kept previews matching a WHERE condition.
+
+        Returns:
+            list: Their stream names
+        """
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT id, stream FROM previews WHERE {condition}", params).fetchall()
+            conn.execute(f"DELETE FROM previews WHERE {condition}", params)
+        with self._lock:
+            self._owned.difference_update(preview_id for preview_id, _ in rows)
+        return [stream_name for _, stream_name in rows]
+
+    def _drop_stream(self, stream_name):
+        try:
+            self.pool.execute(f"DROP STREAM IF EXISTS {stream_name}")
+        except Exception as e:
+            db_logger.warning(f"Failed to drop preview stream {stream_name}: {e}")
@@ -0,0 +1,46 @@
+import fcntl
+import threading
+
+
+class ProcessLock:
+    """
+    Reentrant lock held across the threads of this process and every other
+    process locking the same file, e.g. the workers of one deployment.
+
+    The file lock is taken when the outermost holder enters and released when
+    it leaves, so nested use within a thread costs nothing extra.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                lock_file = open(self.path, "a")
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                except BaseException:
+                    lock_file.close()
+                    raise
+            except BaseException:
+                self._lock.release()
+                raise
+            self._file = lock_file
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._depth -= 1
+        if self._depth == 0:
+            lock_file, self._file = self._file, None
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            finally:
+                lock_file.close()
+        self._lock.release()
+        return False
@@ -0,0 +1,308 @@
+import glob
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from ddl_validator import lint_random_stream_ddl, parse_random_stream
+
+ai_logger = logging.getLogger("ai_generator")
+
+SECTION_HEADING = re.compile(r"^### (.+)$", re.MULTILINE)
+PATTERN_ITEM = re.compile(r"^(?=\d+\. )", re.MULTILINE)
+FUNCTION_CALL = re.compile(r"\b([a-z_][a-z0-9_]*)\(")
+
+# Sections sent with every generation, matched by heading prefix; all other
+# sections are reference material that is only sent when it is relevant
+CORE_SECTIONS = (
+    "What is Timeplus Random Stream",
+    "Basic Syntax",
+    "CRITICAL COMPATIBILITY NOTE",
+    "Supported Data Types",
+    "Random Number Functions",
+    "Best Practices",
+)
+# Reference sections made of numbered entries, which are selected one by one
+PATTERN_SECTIONS = ("Essential Patterns",)
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by create data default for from generate i in is it me of on or random stream "
+    "that the this to use want we which with".split()
+)
+
+
+def stem(word):
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("sses"):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Lowercase word stems; snake_case identifiers are split into their words"""
+    return [stem(word) for word in re.findall(r"[a-z][a-z0-9]*", text.lower()) if word not in STOP_WORDS]
+
+
+def estimate_tokens(text):
+    """Rough token count of English and SQL text, at about four characters per token"""
+    return math.ceil(len(text) / 4)
+
+
+class TfidfIndex:
+    """Cosine similarity search over a small set of tokenized documents"""
+
+    def __init__(self, documents):
+        document_frequency = Counter(token for document in documents for token in set(document))
+        count = len(documents)
+        self.idf = {token: math.log((1 + count) / (1 + df)) + 1 for token, df in document_frequency.items()}
+        self.vectors = [self.vector(document) for document in documents]
+
+    def vector(self, tokens):
+        counts = Counter(token for token in tokens if token in self.idf)
+        weights = {token: (1 + math.log(n)) * self.idf[token] for token, n in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {token: weight / norm for token, weight in weights.items()} if norm else {}
+
+    def similarity(self, query, vector):
+        return sum(weight * vector.get(token, 0.0) for token, weight in query.items())
+
+    def search(self, tokens):
+        """
+        Returns:
+            list: (score, document index) of the documents sharing a token with the query, best first
+        """
+        query = self.vector(tokens)
+        scores = [(self.similarity(query, vector), index) for index, vector in enumerate(self.vectors)]
+        return sorted((hit for hit in scores if hit[0] > 0), key=lambda hit: -hit[0])
+
+
+def split_prompt(prompt):
+    """
+    Split the prompt into the part sent with every generation and its reference sections.
+
+    Returns:
+        tuple: (core prompt, list of {"heading", "text", "kind", "functions"}),
+               kind being "reference" or "pattern"
+    """
+    parts = SECTION_HEADING.split(prompt)
+    core = [parts[0]]
+    sections = []
+    for heading, body in zip(parts[1::2], parts[2::2]):
+        title = heading.strip().rstrip(":")
+        if title.startswith(CORE_SECTIONS):
+            core.append(f"### {heading}{body}")
+        elif title.startswith(PATTERN_SECTIONS):
+            for item in PATTERN_ITEM.split(body):
+                if item.strip():
+                    sections.append({"heading": title, "text": item.strip(), "kind": "pattern", "functions": set()})
+        else:
+            sections.append({
+                "heading": title,
+                "text": body.strip(),
+                "kind": "reference",
+                "functions": set(FUNCTION_CALL.findall(body)),
+            })
+    core_prompt = "".join(core)
+    # Only functions that the core prompt does not already explain make a section relevant
+    core_functions = set(FUNCTION_CALL.findall(core_prompt))
+    for section in sections:
+        section["functions"] -= core_functions
+    return core_prompt, sections
+
+
+def render_sections(sections):
+    blocks = []
+    heading = None
+    for section in sections:
+        if section["heading"] != heading:
+            heading = section["heading"]
+            blocks.append(f"### {heading}")
+        blocks.append(section["text"])
+    return "\n".join(blocks)
+
+
+class PromptIndex:
+    """
+    Pick the parts of the generation prompt that matter for a question.
+
+    The prompt is split into core sections, which become the agent
+    instructions, and reference sections (the function lists and the
+    numbered patterns). Example DDLs come from samples/ and from pipelines
+    that were created successfully. For every question, the reference
+    sections and the examples closest to it by TF-IDF similarity are sent
+    along with the question; examples are abridged to the columns that match
+    the question best, within example_chars characters.
+    """
+
+    def __init__(self, prompt, max_sections=3, max_examples=2, example_chars=800, max_indexed=500,
+                 min_score=0.05):
+        self.full_prompt = prompt
+        self.core_prompt, self.sections = split_prompt(prompt)
+        self.max_sections = max_sections
+        self.max_examples = max_examples
+        self.example_chars = example_chars
+        self.max_indexed = max_indexed
+        self.min_score = min_score
+        self._section_index = TfidfIndex([tokenize(f"{s['heading']} {s['text']}") for s in self.sections])
+        self._examples = []
+        self._example_keys = set()
+        self._example_index = TfidfIndex([])
+        self._lock = threading.Lock()
+
+    def add_samples(self, samples_dir="./samples"):
+        """Index every random stream DDL file of samples_dir; other files are skipped"""
+        for path in sorted(glob.glob(os.path.join(samples_dir, "*.sql"))):
+            with open(path, "r") as f:
+                ddl = f.read()
+            name = os.path.splitext(os.path.basename(path))[0]
+            self.add_example(os.path.basename(path), name.replace("_", " "), ddl, sample=True)
+
+    def add_example(self, source, description, ddl, sample=False):
+        """
+        Index a random stream DDL; DDLs with the same columns as an indexed one and
+        DDLs breaking the rules of the prompt are skipped, so they are never shown as examples.
+
+        Args:
+            source (str): Label of the example in prompts and logs
+            description (str): The question the DDL answers, or a title
+            ddl (str): CREATE RANDOM STREAM statement
+            sample (bool): Samples are never evicted to stay within max_indexed
+
+        Returns:
+            bool: True if the example was added
+        """
+        try:
+            stream = parse_random_stream(ddl)
+        except ValueError:
+            return False
+        lint_errors, _ = lint_random_stream_ddl(ddl)
+        if lint_errors:
+            ai_logger.info(f"Not using {source} as a prompt example: {lint_errors[0]}")
+            return False
+        key = tuple(stream["columns"])
+        columns = [
+            {
+                "definition": " ".join(f"`{name}` {column_type} DEFAULT {expression}".split()),
+                # The column name says more about what a column is than its expression
+                "tokens": tokenize(name) * 3 + tokenize(expression),
+                "functions": set(FUNCTION_CALL.findall(expression.lower())),
+            }
+            for name, column_type, expression in stream["columns"]
+        ]
+        example = {
+            "source": source,
+            "name": stream["name"],
+            "settings": " ".join(stream["settings"].split()).rstrip(";"),
+            "columns": columns,
+            "tokens": tokenize(f"{description} {ddl}"),
+            "sample": sample,
+            "key": key,
+        }
+        with self._lock:
+            if key in self._example_keys:
+                return False
+            self._examples.append(example)
+            self._example_keys.add(key)
+            while len(self._examples) > self.max_indexed:
+                evicted = next((e for e in self._examples if not e["sample"]), None)
+                if evicted is None:
+                    break
+                self._examples.remove(evicted)
+                self._example_keys.discard(evicted["key"])
+            self._example_index = TfidfIndex([e["tokens"] for e in self._examples])
+        return True
+
+    @property
+    def example_count(self):
+        return len(self._examples)
+
+    def select(self, question):
+        """
+        Returns:
+            dict: {"context": text to send ahead of the question, "sections": selected
+                   section headings, "examples": example sources, "full_tokens",
+                   "prompt_tokens": estimated tokens of the full and of the core prompt
+                   plus context}
+        """
+        tokens = tokenize(question)
+        with self._lock:
+            example_index = self._example_index
+            examples = [
+                self._examples[index] for score, index in example_index.search(tokens)[:self.max_examples]
+                if score >= self.min_score
+            ]
+
+        # The closest example gets first pick of the character budget
+        query = example_index.vector(tokens)
+        budget = self.example_chars
+        rendered = []
+        used_functions = set()
+        for example in examples:
+            text, functions = self._render_example(example, query, example_index, budget)
+            if text:
+                rendered.append((example, text))
+                used_functions |= functions
+                budget -= len(text)
+
+        chosen = {
+            index for score, index in self._section_index.search(tokens)[:self.max_sections]
+            if score >= self.min_score
+        }
+        # Function references the shown example columns rely on are sent along with them
+        chosen.update(
+            index for index, section in enumerate(self.sections) if section["functions"] & used_functions
+        )
+        sections = [self.sections[index] for index in sorted(chosen)]
+
+        blocks = []
+        if sections:
+            blocks.append("## Reference\n" + render_sections(sections))
+        if rendered:
+            blocks.append("## Examples\n" + "\n\n".join(text for _, text in rendered))
+        context = "\n\n".join(blocks)
+        return {
+            "context": context,
+            "sections": sorted({section["heading"] for section in sections}),
+            "examples": [example["source"] for example, _ in rendered],
+            "full_tokens": estimate_tokens(self.full_prompt),
+            "prompt_tokens": estimate_tokens(self.core_prompt) + estimate_tokens(context),
+        }
+
+    def _render_example(self, example, query, example_index, budget):
+        """
+        The example DDL with the columns matching the query, best first, that fit in budget characters.
+
+        An example retrieved for its description alone has no matching column;
+        it is shown with its first columns that fit instead.
+
+        Returns:
+            tuple: (text or "" if no column fits, functions called by the kept columns)
+        """
+        scores = [
+            (example_index.similarity(query, example_index.vector(column["tokens"])), index)
+            for index, column in enumerate(example["columns"])
+        ]
+        ranked = [index for score, index in sorted(scores, key=lambda hit: -hit[0]) if score > 0]
+        header = f"CREATE RANDOM STREAM {example['name']} (\n"
+        footer = f"\n) {example['settings']};" if example["settings"] else "\n);"
+        used = len(header) + len(footer)
+        kept = []
+        for index in ranked or range(len(example["columns"])):
+            length = len(example["columns"][index]["definition"]) + 4
+            if used + length <= budget:
+                kept.append(index)
+                used += length
+        if not kept:
+            return "", set()
+        kept.sort()
+        definitions = ",\n".join(f"  {example['columns'][index]['definition']}" for index in kept)
+        text = (
+            f"-- {example['source']}, {len(kept)} of {len(example['columns'])} columns\n"
+            f"```sql\n{header}{definitions}{footer}\n```"
+        )
+        return text, set().union(*(example["columns"][index]["functions"] for index in kept))
@@ -1,15 +1,126 @@
-CREATE OR REPLACE FUNCTION generate(data string, seed uint32) RETURNS string LANGUAGE PYTHON AS 
+CREATE OR REPLACE FUNCTION generate(data string, seed uint32) RETURNS string LANGUAGE PYTHON AS
 $$
-from faker import Faker
-fake = Faker()
+import threading
+import time
+import zlib
+from operator import itemgetter
+
+from faker import Factory, Faker
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+# Each provider has a pool of pre-generated values and a row gets
+# pool[seed % pool size], so the same seed always gives the same value.
+POOL_SIZE = 4096
+# Providers with many more plausible values get larger pools
+POOL_SIZES = {
+  'name': 65536, 'first_name': 16384, 'last_name': 16384, 'address': 65536, 'street_address': 65536,
+  'city': 16384, 'company': 65536, 'sentence': 65536, 'text': 16384, 'url': 65536, 'domain_name': 16384,
+}
+# Providers whose values are meant to be (nearly) unique are not pooled: every
+# row gets its own value from a generator seeded with the row's seed
+UNIQUE_PROVIDERS = frozenset((
+  'uuid4', 'email', 'safe_email', 'free_email', 'company_email', 'ascii_email', 'user_name', 'ssn',
+  'credit_card_number', 'iban', 'bban', 'ipv4', 'ipv6', 'mac_address', 'md5', 'sha1', 'sha256',
+  'isbn10', 'isbn13', 'ean13', 'license_plate', 'phone_number',
+))
+# Rebuild the pools with fresh values every REFRESH_SECONDS in a background
+# thread. 0 keeps the pools fixed so that runs are fully reproducible; with
+# refreshing, the same seed gives a different value after every refresh.
+REFRESH_SECONDS = 0
+
+_pools = {}
+_epoch = 0
+_lock = threading.Lock()
+_local = threading.local()
+
+def _format(fake, provider):
+  try:
+    return str(fake.format(provider))
+  except Exception:
+    # Unknown provider or a provider failing for this value
+    return ''
+
+def _build_pool(provider, epoch):
+  fake = Faker()
+  fake.seed_instance(zlib.crc32(provider.encode()) ^ epoch)
+  values = [_format(fake, provider) for _ in range(POOL_SIZES.get(provider, POOL_SIZE))]
+  if np is not None:
+    return np.array(values, dtype=object)
+  return tuple(values)
+
+def _generate_unique(provider, seeds):
+  # A bare generator, whose random state can be reseeded without the locale proxy of Faker()
+  fake = getattr(_local, 'fake', None)
+  if fake is None:
+    fake = _local.fake = Factory.create()
+    fake.seed_instance(0)
+  rng = fake.random
+  salt = zlib.crc32(provider.encode())
+  values = []
+  for s in seeds:
+    rng.seed(int(s) ^ salt)
+    values.append(_format(fake, provider))
+  return values
+
+def _get_pool(provider):
+  pool = _pools.get(provider)
+  if pool is None:
+    with _lock:
+      pool = _pools.get(provider)
+      if pool is None:
+        pool = _build_pool(provider, _epoch)
+        _pools[provider] = pool
+  return pool
+
+def _refresh_pools():
+  global _epoch
+  while True:
+    time.sleep(REFRESH_SECONDS)
+    epoch = _epoch + 1
+    fresh = {provider: _build_pool(provider, epoch) for provider in list(_pools)}
+    with _lock:
+      _pools.update(fresh)
+      _epoch = epoch
+
+if REFRESH_SECONDS > 0:
+  threading.Thread(target=_refresh_pools, daemon=True).start()
+
+def _pick(pool, seeds):
+  size = len(pool)
+  if np is not None:
+    return pool[np.asarray(seeds, dtype=np.uint64) % size].tolist()
+  if len(seeds) == 1:
+    return [pool[seeds[0] % size]]
+  return list(itemgetter(*[s % size for s in seeds])(pool))
 
 def generate(data, seed):
-  result = []
-  for d , s in zip(data, seed):
-    try:
-      r = fake.format(d)
-      result.append(r)
-    except:
-      result.append('')
+  n = len(data)
+  if n == 0:
+    return []
+
+  # Fast path: one provider for the whole block, which is what
+  # generate('name', rand()) in a DEFAULT expression produces
+  if data.count(data[0]) == n:
+    if data[0] in UNIQUE_PROVIDERS:
+      return _generate_unique(data[0], seed)
+    return _pick(_get_pool(data[0]), seed)
+
+  groups = {}
+  for i, d in enumerate(data):
+    groups.setdefault(d, []).append(i)
+
+  result = [''] * n
+  for provider, positions in groups.items():
+    seeds = [seed[i] for i in positions]
+    if provider in UNIQUE_PROVIDERS:
+      values = _generate_unique(provider, seeds)
+    else:
+      values = _pick(_get_pool(provider), seeds)
+    for i, value in zip(positions, values):
+      result[i] = value
   return result
 $$;
@@ -0,0 +1,143 @@
+import math
+import re
+
+from ddl_validator import CREATE_RANDOM_STREAM, find_closing_paren, strip_sql_comments
+
+EPS_SETTING = re.compile(r"\beps\s*=\s*\d+", re.IGNORECASE)
+SETTINGS_CLAUSE = re.compile(r"\bSETTINGS\b", re.IGNORECASE)
+
+SHARD_COLUMN = "shard_id"
+
+# Rate of a random stream without an eps setting
+DEFAULT_EPS = 1000
+
+
+def shard_count(target_eps, max_shard_eps):
+    return max(1, math.ceil(target_eps / max_shard_eps))
+
+
+def split_eps(target_eps, count):
+    """Spread target_eps over count shards; the first shards take the remainder"""
+    base, remainder = divmod(target_eps, count)
+    return [base + (1 if shard_id < remainder else 0) for shard_id in range(count)]
+
+
+def shard_stream_name(name, shard_id):
+    return f"{name}_s{shard_id}"
+
+
+def blank_sql_comments(sql):
+    """Replace -- comments outside string literals with spaces, keeping every other character in place"""
+    result = []
+    in_string = False
+    i = 0
+    while i < len(sql):
+        ch = sql[i]
+        if ch == "'" and (i == 0 or sql[i - 1] != "\\"):
+            in_string = not in_string
+        elif not in_string and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = len(sql) if end == -1 else end
+            result.append(" " * (end - i))
+            i = end
+            continue
+        result.append(ch)
+        i += 1
+    return "".join(result)
+
+
+def find_eps_setting(ddl):
+    """
+    Match of the eps setting in the SETTINGS clause after the column list;
+    eps inside column definitions or comments is ignored.
+
+    Returns:
+        tuple: (match or None, index where the text after the column list starts)
+    """
+    code = blank_sql_comments(ddl)
+    settings_start = 0
+    match = CREATE_RANDOM_STREAM.search(code)
+    if match:
+        open_index = code.find("(", match.end())
+        close_index = find_closing_paren(code, open_index) if open_index != -1 else -1
+        if close_index != -1:
+            settings_start = close_index + 1
+    clause = SETTINGS_CLAUSE.search(code, settings_start)
+    if not clause:
+        return None, settings_start
+    return EPS_SETTING.search(code, clause.end()), settings_start
+
+
+def set_eps(ddl, eps):
+    """Set the eps setting of a random stream DDL, adding it if missing"""
+    match, _ = find_eps_setting(ddl)
+    if match:
+        return f"{ddl[:match.start()]}eps = {int(eps)}{ddl[match.end():]}"
+    ddl = strip_sql_comments(ddl).rstrip().rstrip(";")
+    _, settings_start = find_eps_setting(ddl)
+    if SETTINGS_CLAUSE.search(ddl, settings_start):
+        return f"{ddl}, eps = {int(eps)}"
+    return f"{ddl} SETTINGS eps = {int(eps)}"
+
+
+def shard_ddl(ddl, shard_name, shard_id, eps):
+    """
+    Derive one shard's random stream DDL from the generated one: renamed, with
+    a constant shard id column and its share of the target rate.
+
+    Raises:
+        ValueError: If the DDL has no random stream column list
+    """
+    ddl = strip_sql_comments(ddl)
+    match = CREATE_RANDOM_STREAM.search(ddl)
+    if not match:
+        raise ValueError("DDL does not contain a CREATE RANDOM STREAM statement")
+    open_index = ddl.find("(", match.end())
+    if open_index == -1:
+        raise ValueError("Column list of the random stream is missing")
+
+    ddl = (
+        f"{ddl[:match.start()]}CREATE RANDOM STREAM {shard_name} "
+        f"({SHARD_COLUMN} uint16 DEFAULT {int(shard_id)}, {ddl[open_index + 1:].lstrip()}"
+    )
+    return set_eps(ddl, eps)
+
+
+def pipeline_shards(pipeline):
+    """
+    The (random stream, materialized view) pairs of a pipeline. Unsharded
+    pipelines have a single pair.
+    """
+    if "shards" in pipeline:
+        return pipeline["shards"]
+    return [{"random_stream": pipeline["random_stream"], "write_to_kafka_mv": pipeline["write_to_kafka_mv"]}]
+
+
+def ddl_eps(ddl):
+    match, _ = find_eps_setting(ddl)
+    return int(match.group(0).split("=")[1]) if match else DEFAULT_EPS
+
+
+def pipeline_eps(pipeline):
+    """Requested events per second of a pipeline over all its shards"""
+    return sum(ddl_eps(shard["random_stream"]["ddl"]) for shard in pipeline_shards(pipeline))
+
+
+def budget_rates(requested, budget):
+    """
+    Scale requested stream rates down to fit a total events-per-second budget.
+
+    Args:
+        requested (dict): Key -> list of requested eps, one per random stream
+        budget (int): Total eps allowed; 0 or None for no limit
+
+    Returns:
+        dict: Key -> list of eps to run the streams at. Over budget, every
+              stream gets the same fraction of its requested rate, and at
+              least 1 eps.
+    """
+    total = sum(sum(rates) for rates in requested.values())
+    if not budget or total <= budget:
+        return {key: list(rates) for key, rates in requested.items()}
+    scale = budget / total
+    return {key: [max(1, math.floor(eps * scale)) for eps in rates] for key, rates in requested.items()}
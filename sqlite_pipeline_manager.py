@@ -0,0 +1,298 @@
+import json
+import logging
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+
+db_logger = logging.getLogger("database")
+
+# Seconds a connection waits for another worker's write transaction
+BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "10"))
+
+
+@contextmanager
+def connect(db_path, row_factory=None):
+    """
+    A short-lived connection to a SQLite file shared by all workers.
+
+    The block runs in one transaction that is committed on success, and the
+    connection is closed right after, so no worker holds locks longer than
+    its statements need.
+    """
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    if row_factory is not None:
+        conn.row_factory = row_factory
+    try:
+        # Durable at checkpoints in WAL mode, without an fsync per commit
+        conn.execute("PRAGMA synchronous = NORMAL")
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def process_alive(pid):
+    """Whether a process with this ID runs on this host, which all workers sharing a database file do"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def enable_wal(db_path):
+    """Switch a database to write-ahead logging so readers never block on a writer; the mode is persistent"""
+    with connect(db_path) as conn:
+        conn.execute("PRAGMA journal_mode = WAL")
+
+
+class SQLitePipelineManager:
+    """Pipeline metadata stored as JSON documents in a SQLite table"""
+
+    def __init__(self, db_path="pipelines.db"):
+        self.db_path = db_path
+        self._init_db()
+        db_logger.info(f"SQLite pipeline metadata stored in {db_path}")
+
+    def _connect(self):
+        return connect(self.db_path, sqlite3.Row)
+
+    def _init_db(self):
+        enable_wal(self.db_path)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pipelines (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    question TEXT,
+                    pipeline TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    -- running, paused (on request) or suspended (after being idle)
+                    state TEXT NOT NULL DEFAULT 'running',
+                    last_accessed TIMESTAMP
+                )
+            """)
+            # Databases created before pipelines could be paused lack the state columns
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(pipelines)")}
+            if "state" not in columns:
+                conn.execute("ALTER TABLE pipelines ADD COLUMN state TEXT NOT NULL DEFAULT 'running'")
+            if "last_accessed" not in columns:
+                conn.execute("ALTER TABLE pipelines ADD COLUMN last_accessed TIMESTAMP")
+            # Names in use or being created; a name is reserved before its Timeplus objects are
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pipeline_names (
+                    name TEXT PRIMARY KEY,
+                    reserved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO pipeline_names (name) SELECT name FROM pipelines")
+            # Backfills in progress, with the process running them
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pipeline_backfills (
+                    pipeline_id TEXT PRIMARY KEY,
+                    pid INTEGER NOT NULL,
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            try:
+                conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_pipelines_name ON pipelines(name)")
+            except sqlite3.IntegrityError:
+                db_logger.warning("Pipeline names are not unique, names are only checked for new pipelines")
+
+    def ping(self):
+        """Check that the metadata table can be read"""
+        with self._connect() as conn:
+            conn.execute("SELECT 1 FROM pipelines LIMIT 1").fetchall()
+        return True
+
+    def reserve_name(self, name):
+        """
+        Returns:
+            bool: True if the name was free and is now reserved for a new pipeline
+        """
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT INTO pipeline_names (name) VALUES (?)", (name,))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def release_name(self, name):
+        """Free a reserved name whose pipeline was never created"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pipeline_names WHERE name = ? AND name NOT IN (SELECT name FROM pipelines)",
+                         (name,))
+
+    def claim_backfill(self, pipeline_id):
+        """
+        Record that this process starts a backfill of a pipeline.
+
+        A claim left behind by a process that no longer runs, e.g. a worker
+        that was killed mid-backfill, is taken over.
+
+        Returns:
+            bool: True if the claim was taken, False if another live process holds it
+        """
+        pid = os.getpid()
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT INTO pipeline_backfills (pipeline_id, pid) VALUES (?, ?)", (pipeline_id, pid))
+            return True
+        except sqlite3.IntegrityError:
+            pass
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT pid FROM pipeline_backfills WHERE pipeline_id = ?", (pipeline_id,)).fetchone()
+            if row is None:
+                conn.execute("INSERT INTO pipeline_backfills (pipeline_id, pid) VALUES (?, ?)", (pipeline_id, pid))
+                return True
+            holder = row["pid"]
+            if holder == pid or process_alive(holder):
+                return False
+            cursor = conn.execute(
+                "UPDATE pipeline_backfills SET pid = ?, started_at = CURRENT_TIMESTAMP WHERE pipeline_id = ? AND pid = ?",
+                (pid, pipeline_id, holder),
+            )
+        if cursor.rowcount:
+            db_logger.warning(f"Took over the backfill claim of pipeline {pipeline_id} from exited process {holder}")
+        return cursor.rowcount == 1
+
+    def release_backfill(self, pipeline_id):
+        """Remove this process's backfill claim of a pipeline"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pipeline_backfills WHERE pipeline_id = ? AND pid = ?", (pipeline_id, os.getpid()))
+
+    def create(self, pipeline, name):
+        """
+        Returns:
+            str: The new pipeline ID
+        """
+        pipeline_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO pipelines (id, name, question, pipeline) VALUES (?, ?, ?, ?)",
+                (pipeline_id, name, pipeline.get("question"), json.dumps(pipeline)),
+            )
+        db_logger.debug(f"Saved metadata of pipeline {name} with ID {pipeline_id}")
+        return pipeline_id
+
+    def get(self, pipeline_id):
+        """
+        Returns:
+            dict: id, name, question, created_at, state, last_accessed and the pipeline definition
+
+        Raises:
+            ValueError: If the pipeline does not exist
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, name, question, pipeline, created_at, state, last_accessed FROM pipelines WHERE id = ?",
+                (pipeline_id,),
+            ).fetchone()
+        if row is None:
+            raise ValueError(f"Pipeline with ID {pipeline_id} not found")
+        pipeline_info = dict(row)
+        pipeline_info["pipeline"] = json.loads(pipeline_info["pipeline"])
+        return pipeline_info
+
+    def list_all(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, name, question, created_at, state, last_accessed FROM pipelines ORDER BY created_at DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_by_state(self, state):
+        """
+        Returns:
+            list: {"id", "name", "pipeline"} of every pipeline in the given state
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, name, pipeline FROM pipelines WHERE state = ?", (state,)).fetchall()
+        return [{"id": row["id"], "name": row["name"], "pipeline": json.loads(row["pipeline"])} for row in rows]
+
+    def list_idle(self, ttl_seconds):
+        """
+        Returns:
+            list: IDs of running pipelines not accessed (or, if never accessed, created) within ttl_seconds
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM pipelines WHERE state = 'running' "
+                "AND COALESCE(last_accessed, created_at) < datetime('now', ?)",
+                (f"-{int(ttl_seconds)} seconds",),
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def touch(self, pipeline_id):
+        """Record that a pipeline was viewed or queried"""
+        with self._connect() as conn:
+            conn.execute("UPDATE pipelines SET last_accessed = CURRENT_TIMESTAMP WHERE id = ?", (pipeline_id,))
+
+    def set_state(self, pipeline_id, state, pipeline):
+        """
+        Change the state of a pipeline together with its stored definition
+
+        Raises:
+            ValueError: If the pipeline does not exist
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE pipelines SET state = ?, pipeline = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (state, json.dumps(pipeline), pipeline_id),
+            )
+        if cursor.rowcount == 0:
+            raise ValueError(f"Pipeline with ID {pipeline_id} not found")
+
+    def list_examples(self, limit):
+        """
+        Question and random stream DDL of the most recently created pipelines.
+
+        Pipelines are only saved once they were created in Timeplus, so every
+        DDL returned here is one that Timeplus accepted.
+
+        Returns:
+            list: (question, ddl) tuples, newest first
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT question, pipeline FROM pipelines ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        examples = []
+        for row in rows:
+            random_stream = json.loads(row["pipeline"]).get("random_stream") or {}
+            if random_stream.get("ddl"):
+                examples.append((row["question"] or "", random_stream["ddl"]))
+        return examples
+
+    def update(self, pipeline_id, pipeline):
+        """
+        Replace the stored definition of a pipeline
+
+        Raises:
+            ValueError: If the pipeline does not exist
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE pipelines SET pipeline = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (json.dumps(pipeline), pipeline_id),
+            )
+        if cursor.rowcount == 0:
+            raise ValueError(f"Pipeline with ID {pipeline_id} not found")
+
+    def delete(self, pipeline_id):
+        """
+        Raises:
+            ValueError: If the pipeline does not exist
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pipeline_names WHERE name = (SELECT name FROM pipelines WHERE id = ?)",
+                         (pipeline_id,))
+            conn.execute("DELETE FROM pipeline_backfills WHERE pipeline_id = ?", (pipeline_id,))
+            cursor = conn.execute("DELETE FROM pipelines WHERE id = ?", (pipeline_id,))
+        if cursor.rowcount == 0:
+            raise ValueError(f"Pipeline with ID {pipeline_id} not found")
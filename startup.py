@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+
+from metrics import STARTUP_SECONDS
+
+app_logger = logging.getLogger("pipeline_app")
+
+# main.py imports this module first, so cold start is timed from the top of main.py
+PROCESS_START = time.perf_counter()
+
+
+class StartupState:
+    """
+    Readiness of the components the API depends on, and cold start timings.
+
+    Components start out "pending" and become "ready" or "failed"; a pending
+    component may carry the error of its last connection attempt. Timings are
+    seconds since PROCESS_START.
+    """
+
+    def __init__(self, components):
+        self._lock = threading.Lock()
+        self._components = {
+            name: {"status": "pending", "error": None, "ready_after_s": None} for name in components
+        }
+        self._timings = {}
+
+    def elapsed(self):
+        return time.perf_counter() - PROCESS_START
+
+    def record(self, phase):
+        """Record how long after process start a startup phase was reached"""
+        seconds = self.elapsed()
+        with self._lock:
+            self._timings[phase] = round(seconds, 3)
+        STARTUP_SECONDS.labels(phase).set(seconds)
+        app_logger.info("Startup phase '%s' reached after %.2fs", phase, seconds)
+
+    def _update(self, component, status, error=None):
+        with self._lock:
+            state = self._components[component]
+            state["status"] = status
+            state["error"] = error
+            if status == "ready":
+                state["ready_after_s"] = round(self.elapsed(), 3)
+            all_ready = all(c["status"] == "ready" for c in self._components.values())
+            first_ready = all_ready and "ready" not in self._timings
+        if first_ready:
+            self.record("ready")
+
+    def mark_ready(self, component):
+        self._update(component, "ready")
+
+    def mark_pending(self, component, error):
+        self._update(component, "pending", error)
+
+    def mark_failed(self, component, error):
+        self._update(component, "failed", error)
+
+    def is_ready(self, *components):
+        with self._lock:
+            return all(self._components[name]["status"] == "ready" for name in components or self._components)
+
+    def not_ready(self, *components):
+        """
+        Returns:
+            dict: component -> status or last error, for components that are not ready
+        """
+        with self._lock:
+            return {
+                name: self._components[name]["error"] or self._components[name]["status"]
+                for name in components or self._components
+                if self._components[name]["status"] != "ready"
+            }
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "components": {name: dict(state) for name, state in self._components.items()},
+                "cold_start": dict(self._timings),
+            }
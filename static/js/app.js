@@ -1,6 +1,6 @@
 let currentPipelineId = null;
 let pipelines = [];
-let refreshInterval = null; // Store the interval ID for cleanup
+let statsSource = null; // Live stats EventSource
 
 // Toast notification system
 function showToast(message, type = 'success') {
@@ -30,9 +30,6 @@ function showCreateForm() {
     document.getElementById('welcomeScreen').style.display = 'none';
     document.getElementById('createForm').style.display = 'flex';
     document.getElementById('pipelineDetails').style.display = 'none';
-    
-    // Clear refresh interval when leaving pipeline details
-    clearRefreshInterval();
 }
 
 function hideCreateForm() {
@@ -40,9 +37,6 @@ function hideCreateForm() {
     document.getElementById('welcomeScreen').style.display = 'flex';
     document.getElementById('pipelineDetails').style.display = 'none';
     document.getElementById('pipelineForm').reset();
-    
-    // Clear refresh interval when leaving pipeline details
-    clearRefreshInterval();
 }
 
 function showPipelineDetails(pipelineId) {
@@ -51,9 +45,6 @@ function showPipelineDetails(pipelineId) {
     document.getElementById('createForm').style.display = 'none';
     document.getElementById('pipelineDetails').style.display = 'block';
     loadPipelineDetails(pipelineId);
-    
-    // Start auto-refresh for write count
-    startAutoRefresh();
 }
 
 function hidePipelineDetails() {
@@ -62,64 +53,62 @@ function hidePipelineDetails() {
     document.getElementById('createForm').style.display = 'none';
     currentPipelineId = null;
     updateSidebarActive();
-    
-    // Clear refresh interval when leaving pipeline details
-    clearRefreshInterval();
 }
 
-// Auto-refresh functionality
-function startAutoRefresh() {
-    // Clear any existing interval
-    clearRefreshInterval();
-    
-    // Set up new interval to refresh every 3 seconds
-    refreshInterval = setInterval(() => {
-        if (currentPipelineId && document.getElementById('pipelineDetails').style.display !== 'none') {
-            refreshWriteCount();
-        } else {
-            // Clear interval if we're no longer on pipeline details page
-            clearRefreshInterval();
+// Live stats functionality
+function startLiveStats() {
+    if (statsSource) return;
+    
+    // One shared server-side sampler pushes counts for all pipelines;
+    // EventSource reconnects on its own if the connection drops
+    statsSource = new EventSource('/pipelines/stats/stream');
+    statsSource.onmessage = (event) => {
+        try {
+            const sample = JSON.parse(event.data);
+            applyLiveStats(sample.pipelines || {});
+        } catch (error) {
+            console.error('Error applying live stats:', error);
         }
-    }, 3000);
+    };
+    statsSource.onerror = () => {
+        console.error('Live stats connection lost, reconnecting...');
+    };
 }
 
-function clearRefreshInterval() {
-    if (refreshInterval) {
-        clearInterval(refreshInterval);
-        refreshInterval = null;
+function stopLiveStats() {
+    if (statsSource) {
+        statsSource.close();
+        statsSource = null;
     }
 }
 
-async function refreshWriteCount() {
-    if (!currentPipelineId) return;
-    
-    try {
-        const response = await fetch(`/pipelines/${currentPipelineId}`);
-        
-        if (!response.ok) {
-            console.error('Failed to refresh write count');
-            return;
-        }
-        
-        const pipeline = await response.json();
-        
-        // Update only the write count display
-        const writeCountElement = document.getElementById('detailsWriteCount');
-        if (writeCountElement && pipeline.write_count !== undefined) {
-            const newCount = pipeline.write_count || 0;
-            const formattedCount = formatNumber(newCount);
-            writeCountElement.textContent = formattedCount;
-            
-            // Add a subtle animation to indicate refresh
-            writeCountElement.style.opacity = '0.7';
-            setTimeout(() => {
-                writeCountElement.style.opacity = '1';
-            }, 150);
+function applyLiveStats(stats) {
+    pipelines.forEach(pipeline => {
+        const pipelineStats = stats[pipeline.id];
+        if (pipelineStats) {
+            pipeline.write_count = pipelineStats.write_count || 0;
+            pipeline.eps = pipelineStats.eps || 0;
         }
+    });
+    updateSidebar();
+    
+    if (!currentPipelineId || !stats[currentPipelineId]) return;
+    
+    // Update only the stats display of the open pipeline
+    const pipelineStats = stats[currentPipelineId];
+    const writeCountElement = document.getElementById('detailsWriteCount');
+    const epsElement = document.getElementById('detailsEps');
+    if (writeCountElement) {
+        writeCountElement.textContent = formatNumber(pipelineStats.write_count || 0);
         
-    } catch (error) {
-        console.error('Error refreshing write count:', error);
-        // Don't show toast for refresh errors to avoid spamming user
+        // Add a subtle animation to indicate refresh
+        writeCountElement.style.opacity = '0.7';
+        setTimeout(() => {
+            writeCountElement.style.opacity = '1';
+        }, 150);
+    }
+    if (epsElement) {
+        epsElement.textContent = formatNumber(Math.round(pipelineStats.eps || 0));
     }
 }
 
@@ -159,24 +148,22 @@ async function loadPipelines() {
     }
 }
 
-// Load write counts for all pipelines
+// Load write counts for all pipelines with a single request
 async function loadPipelineWriteCounts() {
-    const promises = pipelines.map(async (pipeline) => {
-        try {
-            const response = await fetch(`/pipelines/${pipeline.id}`);
-            if (response.ok) {
-                const data = await response.json();
-                pipeline.write_count = data.write_count || 0;
-            } else {
-                pipeline.write_count = 0;
-            }
-        } catch (error) {
-            console.error(`Failed to load write count for pipeline ${pipeline.id}:`, error);
+    try {
+        const response = await fetch('/pipelines/stats');
+        const stats = response.ok ? (await response.json()).pipelines || {} : {};
+        pipelines.forEach(pipeline => {
+            const pipelineStats = stats[pipeline.id] || {};
+            pipeline.write_count = pipelineStats.write_count || 0;
+            pipeline.eps = pipelineStats.eps || 0;
+        });
+    } catch (error) {
+        console.error('Failed to load pipeline write counts:', error);
+        pipelines.forEach(pipeline => {
             pipeline.write_count = 0;
-        }
-    });
-    
-    await Promise.all(promises);
+        });
+    }
 }
 
 // Update sidebar with pipelines
@@ -198,6 +185,7 @@ function updateSidebar() {
                  data-pipeline-id="${pipeline.id}">
                 <div class="pipeline-header">
                     <div class="pipeline-name">${escapeHtml(pipeline.name)}</div>
+                    ${pipeline.state && pipeline.state !== 'running' ? `<div class="pipeline-state-badge">${pipeline.state}</div>` : ''}
                     ${showBadge ? `<div class="pipeline-count-badge">${formattedCount}</div>` : ''}
                 </div>
                 <div class="pipeline-preview">${escapeHtml(pipeline.question || '')}</div>
@@ -268,24 +256,40 @@ function displayPipelineDetails(pipeline) {
         
         if (nameElement) nameElement.textContent = pipeline.name || 'Unknown Pipeline';
         if (idElement) idElement.textContent = pipeline.id || 'Unknown ID';
+        displayPipelineState(pipeline.state || 'running');
         if (descElement) descElement.textContent = (pipeline.pipeline && pipeline.pipeline.question) || 'No description available';
         if (writeCountElement) {
             const writeCount = pipeline.write_count || 0;
             writeCountElement.textContent = formatNumber(writeCount);
         }
+        const epsElement = document.getElementById('detailsEps');
+        if (epsElement) {
+            const cached = pipelines.find(p => p.id === pipeline.id);
+            epsElement.textContent = formatNumber(Math.round((cached && cached.eps) || 0));
+        }
         
         // Components section - with null checks
         const componentsContainer = document.getElementById('detailsComponents');
         if (componentsContainer && pipeline.pipeline) {
             const components = [];
             
-            if (pipeline.pipeline.random_stream && pipeline.pipeline.random_stream.name) {
+            const shards = pipeline.pipeline.shards;
+            
+            if (shards) {
+                shards.forEach(shard => {
+                    components.push({ name: shard.random_stream.name, type: `Random Stream (${formatNumber(shard.eps)} eps)` });
+                });
+            } else if (pipeline.pipeline.random_stream && pipeline.pipeline.random_stream.name) {
                 components.push({ name: pipeline.pipeline.random_stream.name, type: 'Random Stream' });
             }
             if (pipeline.pipeline.kafka_external_stream && pipeline.pipeline.kafka_external_stream.name) {
                 components.push({ name: pipeline.pipeline.kafka_external_stream.name, type: 'Kafka Stream' });
             }
-            if (pipeline.pipeline.write_to_kafka_mv && pipeline.pipeline.write_to_kafka_mv.name) {
+            if (shards) {
+                shards.forEach(shard => {
+                    components.push({ name: shard.write_to_kafka_mv.name, type: 'Materialized View' });
+                });
+            } else if (pipeline.pipeline.write_to_kafka_mv && pipeline.pipeline.write_to_kafka_mv.name) {
                 components.push({ name: pipeline.pipeline.write_to_kafka_mv.name, type: 'Materialized View' });
             }
             
@@ -311,6 +315,12 @@ function displayPipelineDetails(pipeline) {
             if (pipeline.pipeline.write_to_kafka_mv && pipeline.pipeline.write_to_kafka_mv.ddl) {
                 ddlItems.push({ title: 'Materialized View DDL', content: pipeline.pipeline.write_to_kafka_mv.ddl });
             }
+            if (pipeline.pipeline.shards && pipeline.pipeline.shards.length) {
+                // All shards share the same shape; show the first one
+                const shard = pipeline.pipeline.shards[0];
+                ddlItems.push({ title: 'Shard Random Stream DDL', content: shard.random_stream.ddl });
+                ddlItems.push({ title: 'Shard Materialized View DDL', content: shard.write_to_kafka_mv.ddl });
+            }
             
             ddlContainer.innerHTML = ddlItems.map((item, index) => `
                 <div class="ddl-item" id="ddl-${index}">
@@ -341,6 +351,47 @@ function displayPipelineDetails(pipeline) {
     }
 }
 
+// Show whether a pipeline is running, paused or suspended (idle)
+function displayPipelineState(state) {
+    const stateElement = document.getElementById('detailsPipelineState');
+    const pauseBtn = document.getElementById('pausePipelineBtn');
+    if (stateElement) {
+        stateElement.textContent = state;
+        stateElement.style.display = state === 'running' ? 'none' : '';
+    }
+    if (pauseBtn) {
+        pauseBtn.textContent = state === 'running' ? 'Pause' : 'Resume';
+        pauseBtn.dataset.action = state === 'running' ? 'pause' : 'resume';
+    }
+}
+
+// Pause or resume the current pipeline
+async function togglePipelinePause() {
+    if (!currentPipelineId) return;
+    
+    const pauseBtn = document.getElementById('pausePipelineBtn');
+    const action = pauseBtn.dataset.action || 'pause';
+    pauseBtn.disabled = true;
+    try {
+        const response = await fetch(`/pipelines/${currentPipelineId}/${action}`, {
+            method: 'POST'
+        });
+        const result = await response.json();
+        
+        if (response.ok) {
+            displayPipelineState(result.state);
+            showToast(`Pipeline ${result.state}`);
+            await loadPipelines();
+        } else {
+            showToast(`Error: ${result.detail}`, 'error');
+        }
+    } catch (error) {
+        showToast(`Error changing pipeline state: ${error.message}`, 'error');
+    } finally {
+        pauseBtn.disabled = false;
+    }
+}
+
 // Toggle DDL section
 function toggleDDL(index) {
     const item = document.getElementById(`ddl-${index}`);
@@ -415,8 +466,9 @@ window.addEventListener('DOMContentLoaded', () => {
     // Set up event listeners first
     setupEventListeners();
     
-    // Then load pipelines
+    // Then load pipelines and subscribe to live stats
     loadPipelines();
+    startLiveStats();
     
     // Add click outside to close mobile sidebar
     document.addEventListener('click', (e) => {
@@ -431,7 +483,7 @@ window.addEventListener('DOMContentLoaded', () => {
 
 // Cleanup on page unload
 window.addEventListener('beforeunload', () => {
-    clearRefreshInterval();
+    stopLiveStats();
 });
 
 // Setup all event listeners
@@ -459,6 +511,12 @@ function setupEventListeners() {
         backBtn.addEventListener('click', hidePipelineDetails);
     }
     
+    // Pause/resume pipeline button
+    const pausePipelineBtn = document.getElementById('pausePipelineBtn');
+    if (pausePipelineBtn) {
+        pausePipelineBtn.addEventListener('click', togglePipelinePause);
+    }
+    
     // Delete pipeline button
     const deletePipelineBtn = document.getElementById('deletePipelineBtn');
     if (deletePipelineBtn) {
@@ -500,6 +558,8 @@ async function handleFormSubmit(e) {
     const submitBtn = e.target.querySelector('button[type="submit"]');
     const btnText = submitBtn.querySelector('.btn-text');
     const btnSpinner = submitBtn.querySelector('.btn-spinner');
+    const btnStage = submitBtn.querySelector('.btn-stage');
+    const ddlPreview = document.getElementById('ddlPreview');
     
     // Show loading state
     submitBtn.disabled = true;
@@ -516,8 +576,9 @@ async function handleFormSubmit(e) {
         });
         
         if (response.ok) {
-            const result = await response.json();
-            console.log('Pipeline created:', result); // Debug log
+            const job = await response.json();
+            console.log('Pipeline creation job queued:', job); // Debug log
+            const result = await waitForJob(job.job_id, btnStage, ddlPreview);
             showToast(`Pipeline "${result.name}" created successfully!`);
             e.target.reset();
             hideCreateForm();
@@ -540,5 +601,98 @@ async function handleFormSubmit(e) {
         submitBtn.disabled = false;
         btnText.style.display = 'block';
         btnSpinner.style.display = 'none';
+        if (btnStage) btnStage.textContent = '';
+        if (ddlPreview) {
+            ddlPreview.textContent = '';
+            ddlPreview.style.display = 'none';
+        }
+    }
+}
+
+// Human readable labels for pipeline creation stages
+const JOB_STAGE_LABELS = {
+    queued: 'Queued',
+    running: 'Starting',
+    naming: 'Naming',
+    generating: 'Generating DDL',
+    validating: 'Validating DDL',
+    repairing: 'Repairing DDL',
+    creating: 'Creating streams'
+};
+
+// Follow a background job over server-sent events, showing the current stage
+// and the DDL while it is being generated; falls back to polling
+function waitForJob(jobId, stageElement, previewElement) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`/jobs/${jobId}/events`);
+        
+        source.onmessage = (message) => {
+            const event = JSON.parse(message.data);
+            switch (event.type) {
+                case 'stage':
+                    if (stageElement) {
+                        stageElement.textContent = JOB_STAGE_LABELS[event.stage] || event.stage;
+                    }
+                    break;
+                case 'ddl_started':
+                    if (previewElement) {
+                        previewElement.textContent = '';
+                        previewElement.style.display = 'block';
+                    }
+                    break;
+                case 'ddl_delta':
+                    if (previewElement) {
+                        previewElement.textContent += event.text;
+                        previewElement.scrollTop = previewElement.scrollHeight;
+                    }
+                    break;
+                case 'ddl_generated':
+                    if (previewElement) {
+                        previewElement.textContent = event.ddl;
+                        previewElement.style.display = 'block';
+                    }
+                    break;
+                case 'completed':
+                    source.close();
+                    resolve(event.result);
+                    break;
+                case 'failed':
+                    source.close();
+                    reject(new Error(event.error || 'Pipeline creation failed'));
+                    break;
+            }
+        };
+        
+        // EventSource reconnects on its own; it only gives up on an error response
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                pollJob(jobId, stageElement).then(resolve, reject);
+            }
+        };
+    });
+}
+
+// Poll a background job until it completes, showing the current stage
+async function pollJob(jobId, stageElement, intervalMs = 1000) {
+    while (true) {
+        const response = await fetch(`/jobs/${jobId}`);
+        const job = await response.json();
+        
+        if (!response.ok) {
+            throw new Error(job.detail || 'Failed to get job status');
+        }
+        
+        if (job.status === 'completed') {
+            return job.result;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Pipeline creation failed');
+        }
+        
+        if (stageElement) {
+            stageElement.textContent = JOB_STAGE_LABELS[job.stage] || job.stage;
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
     }
 }
\ No newline at end of file
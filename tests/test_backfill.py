@@ -0,0 +1,23 @@
+from backfill import EVENT_TIME_COLUMN, backfill_columns
+
+DDL = """CREATE RANDOM STREAM orders (
+    id uint64 DEFAULT rand(),
+    order_time datetime64(3) DEFAULT now64() - interval rand() % 60 second,
+    shipped_at datetime64(3) DEFAULT order_time + interval 2 day,
+    delivered_at datetime64(3) DEFAULT shipped_at + interval 1 day,
+    updated_at datetime DEFAULT now(),
+    note string DEFAULT 'order_time unknown'
+) SETTINGS eps = 10"""
+
+
+def test_every_wall_clock_default_follows_the_event_time():
+    expressions = {column["name"]: column["expression"] for column in backfill_columns(DDL)}
+
+    assert expressions["order_time"] == f"{EVENT_TIME_COLUMN} - interval rand() % 60 second"
+    assert expressions["updated_at"] == f"to_datetime({EVENT_TIME_COLUMN})"
+    # Derived from a rewritten column, directly or through another one
+    assert expressions["shipped_at"] == "order_time + interval 2 day"
+    assert expressions["delivered_at"] == "shipped_at + interval 1 day"
+    # Copied as generated
+    assert expressions["id"] is None
+    assert expressions["note"] is None
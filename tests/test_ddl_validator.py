@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from ddl_validator import DDLValidator, lint_random_stream_ddl
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "samples")
+
+
+def read_sample(name):
+    with open(os.path.join(SAMPLES, name)) as f:
+        return f.read()
+
+
+def stream(*columns, settings="SETTINGS eps = 10"):
+    return "CREATE RANDOM STREAM s\n(\n  " + ",\n  ".join(columns) + "\n) " + settings
+
+
+@pytest.mark.parametrize("name", ["ecommerce.sql", "network_flows.sql"])
+def test_clean_samples_pass(name):
+    errors, warnings = lint_random_stream_ddl(read_sample(name))
+    assert errors == []
+    assert warnings == []
+
+
+def test_financial_trading_sample_is_rejected():
+    errors, warnings = lint_random_stream_ddl(read_sample("financial_trading.sql"))
+
+    assert len(errors) == 1
+    assert "'var_95'" in errors[0] and "'price * 0.05'" in errors[0] and "rand_normal()" in errors[0]
+    assert warnings == ["Column 'tick_direction' uses CASE; prefer multi_if()"]
+
+
+def test_missing_eps_setting():
+    errors, _ = lint_random_stream_ddl(stream("`a` int32 DEFAULT rand()", settings=""))
+    assert errors == ["Missing 'SETTINGS eps = <events per second>' after the column list"]
+
+
+def test_eps_in_a_default_expression_does_not_count():
+    errors, _ = lint_random_stream_ddl(stream("`eps` int32 DEFAULT 5", settings=""))
+    assert errors == ["Missing 'SETTINGS eps = <events per second>' after the column list"]
+
+
+def test_unsupported_type():
+    errors, _ = lint_random_stream_ddl(stream("`a` varchar(10) DEFAULT 'x'"))
+    assert errors == ["Column 'a' has unsupported type 'varchar(10)'"]
+
+
+def test_camel_case_function():
+    errors, _ = lint_random_stream_ddl(stream("`a` string DEFAULT toString(rand())"))
+    assert len(errors) == 1
+    assert "camelCase function 'toString'" in errors[0] and "'to_string'" in errors[0]
+
+
+def test_camel_case_inside_string_literal_is_ignored():
+    errors, _ = lint_random_stream_ddl(stream("`a` string DEFAULT 'toString(x)'"))
+    assert errors == []
+
+
+def test_random_function_parameters_must_be_constants():
+    errors, _ = lint_random_stream_ddl(stream(
+        "`a` float64 DEFAULT rand_normal(0, 1.5 * 2)",
+        "`b` float64 DEFAULT rand_uniform(a, 10)",
+    ))
+    assert len(errors) == 1
+    assert "Column 'b' passes non-constant parameter 'a' to rand_uniform()" in errors[0]
+
+
+def test_missing_default_and_case_are_warnings():
+    errors, warnings = lint_random_stream_ddl(stream(
+        "`a` int32",
+        "`b` string DEFAULT CASE WHEN rand() % 2 = 0 THEN 'x' ELSE 'y' END",
+    ))
+    assert errors == []
+    assert warnings == ["Column 'a' has no DEFAULT expression", "Column 'b' uses CASE; prefer multi_if()"]
+
+
+def test_unparseable_ddl():
+    errors, _ = lint_random_stream_ddl("CREATE STREAM s (a int32)")
+    assert errors == ["DDL does not contain a CREATE RANDOM STREAM statement"]
+
+
+class FailingPool:
+    def __init__(self, error=None):
+        self.error = error
+        self.queries = []
+
+    def execute(self, query, params=None, **kwargs):
+        self.queries.append(query)
+        if self.error and query.startswith("CREATE"):
+            raise RuntimeError(self.error)
+
+
+def test_validator_skips_the_server_when_lint_fails():
+    pool = FailingPool()
+    errors = DDLValidator(pool).validate(stream("`a` varchar DEFAULT 'x'"))
+    assert errors and pool.queries == []
+
+
+def test_validator_reports_server_errors_and_drops_the_temporary_stream():
+    pool = FailingPool("Code: 46. Unknown function foo\nstack trace")
+    errors = DDLValidator(pool).validate(stream("`a` int32 DEFAULT rand()"))
+
+    assert errors == ["Timeplus rejected the DDL: Code: 46. Unknown function foo"]
+    assert pool.queries[0].startswith("CREATE RANDOM STREAM validate_")
+    assert pool.queries[1].startswith("DROP STREAM IF EXISTS validate_")
@@ -0,0 +1,91 @@
+import csv
+import os
+
+import pytest
+
+import exporter
+from exporter import export_columns, export_rows
+
+DDL = """CREATE RANDOM STREAM orders
+(
+  `id` uint64 DEFAULT rand(),
+  `price` float DEFAULT rand_uniform(1, 100)
+) SETTINGS eps = 10"""
+
+
+class FakeClient:
+    def __init__(self, rows, fail_after=None):
+        self.rows = rows
+        self.fail_after = fail_after
+        self.queries = []
+
+    def execute_iter(self, query, settings=None):
+        self.queries.append(query)
+        for i, row in enumerate(self.rows):
+            if self.fail_after is not None and i == self.fail_after:
+                raise RuntimeError("connection reset")
+            yield row
+
+
+def make_rows(count):
+    return [(i, i / 2) for i in range(count)]
+
+
+def test_parquet_export_writes_one_row_group_per_batch(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "orders.parquet")
+    progress = []
+
+    stats = export_rows(FakeClient(make_rows(7)), "orders", export_columns(DDL), 7, path,
+                        row_group_size=3, on_progress=progress.append)
+
+    assert stats["rows"] == 7
+    assert progress == [3, 6, 7]
+    metadata = pq.ParquetFile(path).metadata
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [3, 3, 1]
+    table = pq.read_table(path)
+    assert str(table.schema.field("price").type) == "float"
+    assert table.column("id").to_pylist() == list(range(7))
+    assert not os.path.exists(path + ".part")
+
+
+def test_csv_export_is_renamed_once_complete(tmp_path):
+    path = str(tmp_path / "orders.csv")
+
+    export_rows(FakeClient(make_rows(5)), "orders", export_columns(DDL), 5, path, file_format="csv", row_group_size=2)
+
+    with open(path, newline="") as f:
+        assert list(csv.reader(f)) == [["id", "price"]] + [[str(i), str(i / 2)] for i in range(5)]
+    assert not os.path.exists(path + ".part")
+
+
+def test_failed_export_removes_the_partial_file(tmp_path):
+    path = str(tmp_path / "orders.csv")
+    progress = []
+
+    with pytest.raises(RuntimeError, match="after 2 rows"):
+        export_rows(FakeClient(make_rows(5), fail_after=3), "orders", export_columns(DDL), 5, path,
+                    file_format="csv", row_group_size=2, on_progress=progress.append)
+
+    assert progress == [2]
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".part")
+
+
+def test_sink_is_closed_once_when_closing_fails(tmp_path, monkeypatch):
+    closes = []
+
+    class FailingCloseSink(exporter.CsvSink):
+        def close(self):
+            closes.append(True)
+            super().close()
+            raise OSError("disk full")
+
+    monkeypatch.setattr(exporter, "CsvSink", FailingCloseSink)
+    path = str(tmp_path / "orders.csv")
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        export_rows(FakeClient(make_rows(2)), "orders", export_columns(DDL), 2, path, file_format="csv")
+
+    assert closes == [True]
+    assert not os.path.exists(path + ".part")
@@ -0,0 +1,32 @@
+import sqlite3
+
+from generation_cache import GenerationCache
+
+
+def test_generation_survives_failed_cache_write(tmp_path, monkeypatch):
+    cache = GenerationCache(db_path=str(tmp_path / "pipelines.db"))
+
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cache, "put", locked)
+    entry = {"name": "orders", "ddl": "CREATE RANDOM STREAM orders (id uint64 DEFAULT rand())"}
+
+    key, result, cached = cache.get_or_generate("orders", "v1", lambda: entry)
+
+    assert result == entry
+    assert cached is False
+    assert key not in cache._inflight
+
+
+def test_entry_stored_after_a_miss_is_used_instead_of_generating(tmp_path, monkeypatch):
+    cache = GenerationCache(db_path=str(tmp_path / "pipelines.db"))
+    entry = {"name": "orders", "ddl": "CREATE RANDOM STREAM orders (id uint64 DEFAULT rand())"}
+    key = cache.make_key("orders", "v1")
+    # The leader of a concurrent request finishes between this caller's miss and its leader check
+    monkeypatch.setattr(cache, "get", lambda key: cache.put(key, "orders", "v1", entry))
+
+    def generate():
+        raise AssertionError("generated again")
+
+    assert cache.get_or_generate("orders", "v1", generate) == (key, entry, True)
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from job_manager import FINAL_EVENTS, JobManager, JobStore
+
+
+def wait_finished(manager, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job["finished_at"] is not None:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_stages_and_events_are_recorded_in_order():
+    manager = JobManager(max_workers=1)
+
+    def work(progress):
+        progress("generating")
+        progress.emit("ddl_delta", text="CREATE")
+        progress("creating")
+        return {"id": "p1"}
+
+    job_id = manager.submit("create_pipeline", work)
+    job = wait_finished(manager, job_id)
+
+    assert job["status"] == "completed"
+    assert job["result"] == {"id": "p1"}
+    assert [stage["name"] for stage in job["stages"]] == ["queued", "running", "generating", "creating"]
+    assert all(stage["finished_at"] is not None for stage in job["stages"])
+
+    async def replay():
+        events, _ = await manager.subscribe(job_id)
+        return events
+
+    events = asyncio.run(replay())
+    assert [event["seq"] for event in events] == list(range(len(events)))
+    assert [(event["type"], event.get("stage")) for event in events] == [
+        ("stage", "queued"), ("stage", "running"), ("stage", "generating"),
+        ("ddl_delta", None), ("stage", "creating"), ("completed", None),
+    ]
+    manager.shutdown()
+
+
+def test_failed_job_reports_error():
+    manager = JobManager(max_workers=1)
+
+    def work(progress):
+        raise RuntimeError("LLM unavailable")
+
+    job = wait_finished(manager, manager.submit("create_pipeline", work))
+
+    assert job["status"] == "failed"
+    assert job["error"] == "LLM unavailable"
+    manager.shutdown()
+
+
+def test_unknown_job_raises_value_error(tmp_path):
+    manager = JobManager(max_workers=1, store=JobStore(str(tmp_path / "pipelines.db")))
+
+    with pytest.raises(ValueError):
+        manager.get("missing")
+    manager.shutdown()
+
+
+def test_other_worker_follows_job_through_the_store(tmp_path):
+    db_path = str(tmp_path / "pipelines.db")
+    runner = JobManager(max_workers=1, store=JobStore(db_path), persist_interval=0)
+    follower = JobManager(max_workers=1, store=JobStore(db_path), poll_interval=0.02)
+    release = threading.Event()
+
+    def work(progress):
+        progress("generating")
+        release.wait(5)
+        progress.emit("ddl_generated", ddl="CREATE RANDOM STREAM s")
+        return {"id": "p1"}
+
+    job_id = runner.submit("create_pipeline", work)
+
+    async def follow():
+        events, queue = await follower.subscribe(job_id)
+        release.set()
+        received = list(events)
+        while received[-1]["type"] not in FINAL_EVENTS:
+            received.append(await asyncio.wait_for(queue.get(), 5))
+        follower.unsubscribe(job_id, queue)
+        return received
+
+    events = asyncio.run(follow())
+
+    assert [event["seq"] for event in events] == list(range(len(events)))
+    assert [event["type"] for event in events][-2:] == ["ddl_generated", "completed"]
+    assert events[-1]["result"] == {"id": "p1"}
+    assert follower.get(job_id)["status"] == "completed"
+    runner.shutdown()
+    follower.shutdown()
@@ -0,0 +1,25 @@
+import threading
+import time
+
+import confluent_kafka.admin
+
+from kafka_admin import KafkaTopicAdmin
+
+
+def test_one_admin_client_per_broker_list(monkeypatch):
+    created = []
+
+    class SlowAdminClient:
+        def __init__(self, config):
+            time.sleep(0.01)
+            created.append(config["bootstrap.servers"])
+
+    monkeypatch.setattr(confluent_kafka.admin, "AdminClient", SlowAdminClient)
+    admin = KafkaTopicAdmin()
+    threads = [threading.Thread(target=admin._client, args=("kafka:9092",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert created == ["kafka:9092"]
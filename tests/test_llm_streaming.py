@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+
+from llm_streaming import CONTENT_EVENT, stream_code_block
+from metrics import record_llm_call
+
+
+class StreamingAgent:
+    """Fills run_response.metrics only once the stream is read to its end, like agno"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.run_response = None
+        self.closed = False
+
+    def run(self, prompt, stream=False):
+        return self._stream()
+
+    def _stream(self):
+        self.run_response = SimpleNamespace(content="".join(self.chunks), metrics={})
+        try:
+            for chunk in self.chunks:
+                yield SimpleNamespace(event=CONTENT_EVENT, content=chunk)
+            self.run_response.metrics = {"input_tokens": [1200], "output_tokens": [80]}
+        finally:
+            self.closed = True
+
+
+def tokens(direction):
+    return REGISTRY.get_sample_value(
+        "llm_tokens_total", {"stage": "test", "prompt": "full", "direction": direction}
+    ) or 0
+
+
+def test_tokens_recorded_after_code_block_hand_off():
+    agent = StreamingAgent(["```sql\nCREATE RANDOM STREAM s (", "id int DEFAULT 1)\n``", "`\n\nSome prose."])
+    handed_off = []
+
+    block, _ = stream_code_block(agent, "q", on_code=lambda b: handed_off.append(b.code))
+
+    assert handed_off == ["CREATE RANDOM STREAM s (id int DEFAULT 1)"]
+    assert block.code == handed_off[0]
+    assert agent.closed
+    before = tokens("input"), tokens("output")
+    record_llm_call("test", 1.0, agent.run_response)
+    assert (tokens("input") - before[0], tokens("output") - before[1]) == (1200, 80)
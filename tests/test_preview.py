@@ -0,0 +1,38 @@
+import pytest
+from proton_driver import errors
+
+from preview import PreviewManager
+
+DDL = """CREATE RANDOM STREAM orders (
+    id uint64 DEFAULT rand(),
+    amount float64 DEFAULT round(rand_uniform(1, 500), 2)
+) SETTINGS eps = 10"""
+
+
+class RejectingPool:
+    """Pool whose server rejects every CREATE statement"""
+
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, query, params=None, retry=True, **kwargs):
+        self.queries.append(query)
+        if query.lstrip().startswith("CREATE"):
+            raise errors.ServerException("Unknown function rand_uniformm", code=46)
+        return []
+
+
+def test_create_reports_ddl_rejected_by_server(tmp_path):
+    pool = RejectingPool()
+    previews = PreviewManager(pool, db_path=str(tmp_path / "pipelines.db"))
+
+    with pytest.raises(ValueError, match="Timeplus rejected the DDL"):
+        previews.create(DDL, rows=10, timeout_seconds=1)
+    assert any(query.lstrip().startswith("CREATE RANDOM STREAM preview_") for query in pool.queries)
+
+
+def test_create_reports_lint_errors(tmp_path):
+    previews = PreviewManager(RejectingPool(), db_path=str(tmp_path / "pipelines.db"))
+
+    with pytest.raises(ValueError):
+        previews.create("CREATE STREAM orders (id uint64)", rows=10, timeout_seconds=1)
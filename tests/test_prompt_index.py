@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from prompt_index import PromptIndex
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture(scope="module")
+def index():
+    with open(os.path.join(REPO_DIR, "prompt", "prompt.txt"), "r") as f:
+        index = PromptIndex(f.read())
+    index.add_samples(os.path.join(REPO_DIR, "samples"))
+    return index
+
+
+def test_example_without_matching_columns_is_kept(index):
+    selection = index.select("ecommerce clickstream")
+
+    assert selection["examples"] == ["ecommerce.sql"]
+    assert "CREATE RANDOM STREAM" in selection["context"]
+
+
+def test_examples_breaking_prompt_rules_are_not_indexed(index):
+    assert index.add_example("bad", "prices", """CREATE RANDOM STREAM prices (
+        price float64 DEFAULT rand_uniform(1, 100),
+        var_95 float64 DEFAULT rand_normal(0, price * 0.05)
+    ) SETTINGS eps = 10""") is False
+    assert "financial_trading.sql" not in index.select("stock trades with prices")["examples"]
@@ -0,0 +1,64 @@
+from ddl_validator import parse_random_stream
+from sharding import DEFAULT_EPS, budget_rates, ddl_eps, set_eps, shard_count, shard_ddl, split_eps
+
+DDL = """CREATE RANDOM STREAM orders
+(
+  `id` uint64 DEFAULT rand(), -- eps = 5 in a comment
+  `eps` uint32 DEFAULT 7,
+  `note` string DEFAULT 'eps = 9'
+) SETTINGS eps = 1000"""
+
+
+def test_shard_count_rounds_up():
+    assert shard_count(1000, 1000) == 1
+    assert shard_count(1001, 1000) == 2
+    assert shard_count(10, 1000) == 1
+
+
+def test_split_eps_spreads_the_remainder_over_the_first_shards():
+    assert split_eps(10, 3) == [4, 3, 3]
+    assert split_eps(9, 3) == [3, 3, 3]
+    assert sum(split_eps(1_000_003, 4)) == 1_000_003
+
+
+def test_eps_is_read_from_the_settings_clause_only():
+    assert ddl_eps(DDL) == 1000
+    assert ddl_eps(DDL.replace(" SETTINGS eps = 1000", "")) == DEFAULT_EPS
+
+
+def test_set_eps_leaves_column_definitions_alone():
+    ddl = set_eps(DDL, 250)
+    assert ddl_eps(ddl) == 250
+    assert "`eps` uint32 DEFAULT 7" in ddl
+    assert "'eps = 9'" in ddl
+    assert "-- eps = 5 in a comment" in ddl
+
+
+def test_set_eps_adds_a_missing_setting():
+    ddl = DDL.replace(" SETTINGS eps = 1000", "")
+    assert set_eps(ddl, 10).endswith(") SETTINGS eps = 10")
+    assert set_eps(ddl + " SETTINGS interval_time = 5;", 10).endswith("SETTINGS interval_time = 5, eps = 10")
+
+
+def test_shard_ddl_renames_adds_the_shard_column_and_sets_the_rate():
+    ddl = shard_ddl(DDL, "orders_s1", 1, 333)
+    stream = parse_random_stream(ddl)
+
+    assert stream["name"] == "orders_s1"
+    assert stream["columns"][0] == ("shard_id", "uint16", "1")
+    assert [column[0] for column in stream["columns"][1:]] == ["id", "eps", "note"]
+    assert ddl_eps(ddl) == 333
+
+
+def test_budget_rates_under_budget_keeps_the_requested_rates():
+    requested = {"a": [100, 100], "b": [50]}
+    assert budget_rates(requested, 1000) == requested
+    assert budget_rates(requested, 0) == requested
+    assert budget_rates(requested, None) == requested
+
+
+def test_budget_rates_scales_every_stream_by_the_same_fraction():
+    rates = budget_rates({"a": [600, 300], "b": [100], "c": [1]}, 500)
+
+    assert rates == {"a": [299, 149], "b": [49], "c": [1]}
+    assert sum(sum(r) for r in rates.values()) <= 500
@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+from sqlite_pipeline_manager import SQLitePipelineManager, connect
+
+
+def test_backfill_claim_is_shared_through_the_database(tmp_path):
+    db_path = str(tmp_path / "pipelines.db")
+    first = SQLitePipelineManager(db_path)
+    second = SQLitePipelineManager(db_path)
+
+    assert first.claim_backfill("p1")
+    assert not second.claim_backfill("p1")
+    assert second.claim_backfill("p2")
+
+    first.release_backfill("p1")
+    assert second.claim_backfill("p1")
+
+
+def test_backfill_claim_of_exited_process_is_taken_over(tmp_path):
+    db_path = str(tmp_path / "pipelines.db")
+    manager = SQLitePipelineManager(db_path)
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    with connect(db_path) as conn:
+        conn.execute("INSERT INTO pipeline_backfills (pipeline_id, pid) VALUES (?, ?)", ("p1", exited.pid))
+
+    assert manager.claim_backfill("p1")
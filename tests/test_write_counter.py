@@ -0,0 +1,97 @@
+import re
+
+from write_counter import WriteCountTracker
+
+DELTA = re.compile(
+    r"SELECT '(\w+)', count\(\), .* FROM table\(\w+\) "
+    r"WHERE _tp_time > (?:earliest_ts\(\)|from_unix_timestamp64_milli\((\d+)\))"
+)
+
+
+class FakePool:
+    """Answers write count delta queries from per-view lists of row times (ms)"""
+
+    def __init__(self):
+        self.rows = {}
+        self.queries = []
+
+    def execute(self, query, params=None, **kwargs):
+        self.queries.append(query)
+        result = []
+        for part in query.split(" UNION ALL "):
+            mv_name, checkpoint_ms = DELTA.search(part).groups()
+            new = [ts for ts in self.rows.get(mv_name, []) if checkpoint_ms is None or ts > int(checkpoint_ms)]
+            result.append((mv_name, len(new), max(new) if new else None))
+        return result
+
+
+def test_counts_continue_from_the_checkpoint_of_another_worker(tmp_path):
+    db_path = str(tmp_path / "pipelines.db")
+    pool = FakePool()
+    first = WriteCountTracker(pool, db_path=db_path, ttl_seconds=0)
+    second = WriteCountTracker(pool, db_path=db_path, ttl_seconds=0)
+
+    pool.rows["mv_a"] = [1000, 2000, 3000]
+    assert first.get_count("mv_a") == 3
+
+    pool.rows["mv_a"] += [4000, 5000]
+    assert second.get_count("mv_a") == 5
+    # Only the rows after the first worker's checkpoint were counted
+    assert "from_unix_timestamp64_milli(3000)" in pool.queries[-1]
+
+    pool.rows["mv_a"].append(6000)
+    assert first.get_stats(["mv_a"])["mv_a"]["write_count"] == 6
+    assert "from_unix_timestamp64_milli(5000)" in pool.queries[-1]
+
+
+def test_forgotten_view_starts_over(tmp_path):
+    pool = FakePool()
+    tracker = WriteCountTracker(pool, db_path=str(tmp_path / "pipelines.db"), ttl_seconds=0)
+    pool.rows["mv_a"] = [1000, 2000]
+    assert tracker.get_count("mv_a") == 2
+
+    tracker.forget("mv_a")
+    pool.rows["mv_a"] = [7000]
+    assert tracker.get_count("mv_a") == 1
+    assert "earliest_ts()" in pool.queries[-1]
+
+
+def test_cached_counts_are_not_refreshed_within_ttl(tmp_path):
+    pool = FakePool()
+    tracker = WriteCountTracker(pool, db_path=str(tmp_path / "pipelines.db"), ttl_seconds=60)
+    pool.rows["mv_a"] = [1000]
+    tracker.get_stats(["mv_a"])
+    pool.rows["mv_a"].append(2000)
+
+    assert tracker.get_stats(["mv_a"])["mv_a"]["write_count"] == 1
+    assert len(pool.queries) == 1
+
+
+class MissingViewPool(FakePool):
+    def __init__(self, missing):
+        super().__init__()
+        self.missing = set(missing)
+
+    def execute(self, query, params=None, **kwargs):
+        for mv_name in self.missing:
+            if f"table({mv_name})" in query:
+                self.queries.append(query)
+                raise RuntimeError(f"Stream {mv_name} doesn't exist")
+        return super().execute(query, params, **kwargs)
+
+
+def test_missing_view_does_not_fail_the_other_counts(tmp_path):
+    pool = MissingViewPool([])
+    tracker = WriteCountTracker(pool, db_path=str(tmp_path / "pipelines.db"), ttl_seconds=0)
+    pool.rows = {"mv_a": [1000, 2000], "mv_b": [1000], "mv_c": [3000]}
+    tracker.get_stats(["mv_a", "mv_b", "mv_c"])
+
+    # mv_b is dropped, e.g. by a pipeline deletion in progress
+    pool.missing.add("mv_b")
+    pool.rows["mv_a"].append(4000)
+    pool.rows["mv_c"].append(5000)
+    stats = tracker.get_stats(["mv_a", "mv_b", "mv_c"])
+
+    assert stats["mv_a"]["write_count"] == 3
+    assert stats["mv_c"]["write_count"] == 2
+    assert stats["mv_b"]["write_count"] == 1
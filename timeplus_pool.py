@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from proton_driver import client, errors
+
+db_logger = logging.getLogger("database")
+
+# Errors after which a client's socket can no longer be trusted
+CONNECTION_ERRORS = (errors.NetworkError, errors.SocketTimeoutError, EOFError, OSError)
+
+
+def ping_timeplus(timeplus_client):
+    """
+    Check that a client can talk to Timeplus with 'SELECT 1'
+
+    Returns:
+        bool: True if the server responded correctly
+    """
+    db_logger.debug("Testing connection with 'SELECT 1'")
+    result = timeplus_client.execute("SELECT 1")
+    if result and result[0][0] == 1:
+        return True
+    db_logger.warning(f"Unexpected response from Timeplus: {result}")
+    return False
+
+
+class TimeplusConnectionPool:
+    """
+    A fixed-size pool of proton_driver clients.
+
+    proton_driver clients are not safe for concurrent use, so each query checks
+    a client out for its exclusive use. Clients idle for longer than
+    ping_interval are pinged before reuse, and clients that hit a connection
+    error are replaced with fresh ones.
+    """
+
+    def __init__(self, host, user, password, port, size=8, checkout_timeout=30, ping_interval=30):
+        self.host = host
+        self.user = user
+        self.password = password
+        self.port = port
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+
+        # Entries are [client, last_used_at]; clients connect lazily on first query
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put([self._new_client(), 0.0])
+
+        self._stats_lock = threading.Lock()
+        self._in_use = 0
+        self._reconnects = 0
+        db_logger.info(f"Timeplus connection pool created with {size} connections to {user}@{host}:{port}")
+
+    def _new_client(self):
+        return client.Client(
+            host=self.host,
+            user=self.user,
+            password=self.password,
+            port=self.port,
+        )
+
+    def _replace(self, entry):
+        try:
+            entry[0].disconnect()
+        except Exception as e:
+            db_logger.debug(f"Error disconnecting broken Timeplus client: {e}")
+        entry[0] = self._new_client()
+        with self._stats_lock:
+            self._reconnects += 1
+
+    def _checkout(self):
+        try:
+            entry = self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            raise RuntimeError(f"Timed out after {self.checkout_timeout}s waiting for a Timeplus connection")
+
+        if entry[1] and time.time() - entry[1] > self.ping_interval:
+            try:
+                if not ping_timeplus(entry[0]):
+                    self._replace(entry)
+            except Exception as e:
+                db_logger.warning(f"Idle Timeplus connection failed liveness ping, reconnecting: {e}")
+                self._replace(entry)
+
+        with self._stats_lock:
+            self._in_use += 1
+        return entry
+
+    def _return(self, entry):
+        entry[1] = time.time()
+        with self._stats_lock:
+            self._in_use -= 1
+        self._idle.put(entry)
+
+    @contextmanager
+    def connection(self):
+        """Check out a client for exclusive use"""
+        entry = self._checkout()
+        try:
+            yield entry[0]
+        except CONNECTION_ERRORS as e:
+            db_logger.warning(f"Timeplus connection broken, replacing it: {e}")
+            self._replace(entry)
+            raise
+        finally:
+            self._return(entry)
+
+    @contextmanager
+    def dedicated_client(self):
+        """A client outside the pool, for long reads that should not hold a pooled connection"""
+        timeplus_client = self._new_client()
+        try:
+            yield timeplus_client
+        finally:
+            try:
+                timeplus_client.disconnect()
+            except Exception as e:
+                db_logger.debug(f"Error disconnecting dedicated Timeplus client: {e}")
+
+    def execute(self, query, params=None, retry=True, **kwargs):
+        """
+        Execute a query on a pooled client.
+
+        With retry, a query that fails because of a broken socket is retried
+        once on a fresh connection. Pass retry=False for statements that must
+        not run twice.
+        """
+        try:
+            with self.connection() as timeplus_client:
+                return timeplus_client.execute(query, params, **kwargs)
+        except CONNECTION_ERRORS as e:
+            if not retry:
+                raise
+            db_logger.info(f"Retrying query on a new connection after: {e}")
+            with self.connection() as timeplus_client:
+                return timeplus_client.execute(query, params, **kwargs)
+
+    async def aexecute(self, query, params=None, retry=True, **kwargs):
+        """Awaitable execute for FastAPI handlers; runs the query off the event loop"""
+        return await asyncio.to_thread(self.execute, query, params, retry, **kwargs)
+
+    def ping(self):
+        with self.connection() as timeplus_client:
+            return ping_timeplus(timeplus_client)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": self.size - self._in_use,
+                "reconnects": self._reconnects,
+            }
+
+    def close(self):
+        db_logger.info("Closing Timeplus connection pool")
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                entry[0].disconnect()
+            except Exception as e:
+                db_logger.debug(f"Error disconnecting Timeplus client: {e}")
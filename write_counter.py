@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+
+from metrics import WRITE_COUNT_QUERY_LATENCY, timed
+from sqlite_pipeline_manager import connect, enable_wal
+
+db_logger = logging.getLogger("database")
+
+
+class WriteCountTracker:
+    """
+    Incremental write counts for pipeline materialized views.
+
+    Instead of counting the whole MV history on every poll, each MV keeps a
+    running total and a checkpoint (the newest _tp_time already counted).
+    A refresh only counts rows written after the checkpoint, so its cost
+    depends on the time since the last refresh rather than the pipeline age.
+
+    Rows from the last lag_seconds are left for the next refresh so that rows
+    still being written are never skipped. Results are cached for ttl_seconds
+    and concurrent pollers of the same MV share a single refresh. Checkpoints
+    are persisted in SQLite so a restart does not trigger a full scan.
+
+    Every refresh starts from the checkpoint in SQLite rather than the one in
+    memory, so workers sharing the database continue each other's counts and
+    see views that another worker dropped and recreated start over.
+    """
+
+    def __init__(self, pool, db_path="pipelines.db", ttl_seconds=2.0, lag_seconds=1):
+        self.pool = pool
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.lag_seconds = lag_seconds
+
+        self._states = {}
+        self._lock = threading.Lock()
+
+        self._init_db()
+        db_logger.info(f"WriteCountTracker initialized (ttl: {ttl_seconds}s, lag: {lag_seconds}s)")
+
+    def _connect(self):
+        return connect(self.db_path)
+
+    def _init_db(self):
+        enable_wal(self.db_path)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS write_counters (
+                    mv_name TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    checkpoint_ms INTEGER
+                )
+            """)
+
+    def _state_for(self, mv_name):
+        with self._lock:
+            state = self._states.get(mv_name)
+            if state is None:
+                state = {"count": 0, "checkpoint_ms": None, "fetched_at": 0.0, "eps": 0.0, "seen_count": 0,
+                         "lock": threading.Lock()}
+                self._states[mv_name] = state
+            return state
+
+    def _load(self, mv_names):
+        """
+        Returns:
+            dict: mv name -> (count, checkpoint_ms) as last saved by any worker, (0, None) if never saved
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT mv_name, count, checkpoint_ms FROM write_counters "
+                f"WHERE mv_name IN ({','.join('?' * len(mv_names))})",
+                list(mv_names),
+            ).fetchall()
+        saved = {mv_name: (count, checkpoint_ms) for mv_name, count, checkpoint_ms in rows}
+        return {mv_name: saved.get(mv_name, (0, None)) for mv_name in mv_names}
+
+    def _save(self, mv_name, state):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO write_counters (mv_name, count, checkpoint_ms) VALUES (?, ?, ?)",
+                (mv_name, state["count"], state["checkpoint_ms"]),
+            )
+
+    def delta_query(self, mv_name, checkpoint_ms):
+        """SQL returning (mv name, new rows, newest counted _tp_time in ms) since a checkpoint"""
+        if checkpoint_ms is None:
+            since = "earliest_ts()"
+        else:
+            since = f"from_unix_timestamp64_milli({int(checkpoint_ms)})"
+        return (
+            f"SELECT '{mv_name}', count(), to_unix_timestamp64_milli(max(_tp_time)) FROM table({mv_name}) "
+            f"WHERE _tp_time > {since} AND _tp_time <= now64(3) - interval {self.lag_seconds} second"
+        )
+
+    def _apply(self, mv_name, state, delta, checkpoint_ms):
+        now = time.time()
+        if delta:
+            state["count"] += delta
+            state["checkpoint_ms"] = checkpoint_ms
+            self._save(mv_name, state)
+        if state["fetched_at"]:
+            elapsed = now - state["fetched_at"]
+            # Rows other workers counted since our last refresh are part of the rate too
+            growth = state["count"] - state["seen_count"]
+            if elapsed > 0:
+                state["eps"] = round((growth if growth >= 0 else delta) / elapsed, 2)
+        state["fetched_at"] = now
+        state["seen_count"] = state["count"]
+
+    def get_count(self, mv_name):
+        state = self._state_for(mv_name)
+        if time.time() - state["fetched_at"] < self.ttl_seconds:
+            return state["count"]
+
+        with state["lock"]:
+            # Another poller may have refreshed while we waited for the lock
+            if time.time() - state["fetched_at"] < self.ttl_seconds:
+                return state["count"]
+
+            state["count"], state["checkpoint_ms"] = self._load([mv_name])[mv_name]
+
+            query_sql = self.delta_query(mv_name, state["checkpoint_ms"])
+            db_logger.debug("Executing write count delta query: %s", query_sql, extra={"sample_key": "poll"})
+            with timed(WRITE_COUNT_QUERY_LATENCY, "single"):
+                result = self.pool.execute(query_sql)
+            _, delta, checkpoint_ms = result[0] if result else (mv_name, 0, None)
+            self._apply(mv_name, state, delta, checkpoint_ms)
+            return state["count"]
+
+    def _query_deltas(self, stale):
+        """
+        New rows of every stale MV, with one UNION ALL query.
+
+        If the batch fails, e.g. because a view was dropped while its pipeline
+        is deleted or rebuilt, every view is queried on its own, so only the
+        broken ones keep their previous counts.
+
+        Returns:
+            list: (mv name, new rows, checkpoint_ms) of the views that could be queried
+        """
+        query_sql = " UNION ALL ".join(
+            self.delta_query(mv_name, checkpoint_ms) for mv_name, checkpoint_ms in stale.items()
+        )
+        db_logger.debug("Executing batch write count query for %d views", len(stale), extra={"sample_key": "poll"})
+        try:
+            with timed(WRITE_COUNT_QUERY_LATENCY, "batch"):
+                return self.pool.execute(query_sql)
+        except Exception as e:
+            if len(stale) == 1:
+                db_logger.warning("Write count query failed for %s: %s", next(iter(stale)), e)
+                return []
+            db_logger.warning("Batch write count query failed, querying %d views one by one: %s", len(stale), e)
+
+        rows = []
+        for mv_name, checkpoint_ms in stale.items():
+            try:
+                with timed(WRITE_COUNT_QUERY_LATENCY, "single"):
+                    rows.extend(self.pool.execute(self.delta_query(mv_name, checkpoint_ms)))
+            except Exception as e:
+                db_logger.warning("Write count query failed for %s: %s", mv_name, e)
+        return rows
+
+    def get_stats(self, mv_names):
+        """
+        Refresh all stale MVs with one UNION ALL query; a view that cannot be
+        queried keeps its previous count.
+
+        Returns:
+            dict: mv name -> {"write_count": total rows, "eps": recent rows per second}
+        """
+        now = time.time()
+        stale_names = [
+            mv_name for mv_name in mv_names if now - self._state_for(mv_name)["fetched_at"] >= self.ttl_seconds
+        ]
+        stale = {}
+        if stale_names:
+            for mv_name, saved in self._load(stale_names).items():
+                state = self._state_for(mv_name)
+                with state["lock"]:
+                    state["count"], state["checkpoint_ms"] = saved
+                    stale[mv_name] = state["checkpoint_ms"]
+
+        if stale:
+            for mv_name, delta, checkpoint_ms in self._query_deltas(stale):
+                state = self._state_for(mv_name)
+                with state["lock"]:
+                    # Skip views refreshed by a single poller since the query was built
+                    if state["checkpoint_ms"] != stale.get(mv_name):
+                        continue
+                    self._apply(mv_name, state, delta, checkpoint_ms)
+
+        stats = {}
+        for mv_name in mv_names:
+            state = self._state_for(mv_name)
+            stats[mv_name] = {"write_count": state["count"], "eps": state["eps"]}
+        return stats
+
+    def forget(self, mv_name):
+        with self._lock:
+            self._states.pop(mv_name, None)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM write_counters WHERE mv_name = ?", (mv_name,))